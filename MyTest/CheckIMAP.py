@@ -1,45 +1,40 @@
-import configparser
 import email
 import imaplib
 import logging
+import os
+import sys
 from email.header import decode_header
-from email.mime.text import MIMEText
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,  # 设置日志级别
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(),  # 输出到控制台
-        logging.FileHandler("imap_client_check.log", encoding="utf-8"),  # 输出到文件
-    ],
-)
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+from utils.config import ConfigError, get_config
 
-def load_config(config_file):
-    """从配置文件加载 IMAP 配置"""
-    try:
-        config = configparser.ConfigParser()
-        config.read(config_file, encoding="utf-8")
-        conf = {
-            "imap_server": config.get("email", "imap_server"),
-            "imap_ssl_port": config.getint("email", "imap_ssl_port"),
-            "imap_user": config.get("email", "imap_user"),
-            "imap_pwd": config.get("email", "imap_pwd"),
-        }
-        logging.info("成功加载配置文件")
-        return conf
-    except Exception as e:
-        logging.error(f"加载配置文件失败: {e}")
-        raise
+
+# 配置日志（仅在作为脚本运行时调用，导入本模块不会创建日志文件）
+def setup_logging():
+    logging.basicConfig(
+        level=logging.INFO,  # 设置日志级别
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[
+            logging.StreamHandler(),  # 输出到控制台
+            logging.FileHandler(
+                "imap_client_check.log", encoding="utf-8"
+            ),  # 输出到文件
+        ],
+    )
 
 
-def check_imap_client(config):
-    """检查 IMAP 客户端的配置"""
+def check_imap_client(account):
+    """
+    检查 IMAP 客户端的配置
+
+    :param account: utils.config.AccountConfig
+    """
     try:
         # 连接到 IMAP 服务器
-        conn = imaplib.IMAP4_SSL(config["imap_server"], config["imap_ssl_port"])
-        conn.login(config["imap_user"], config["imap_pwd"])
+        conn = imaplib.IMAP4_SSL(account.imap_server, account.imap_port)
+        conn.login(account.username, account.password)
         logging.info("成功连接到 IMAP 服务器")
 
         # 发送IMAP ID命令（126邮箱可能需要）
@@ -109,9 +104,14 @@ def check_imap_paging(conn):
 
 # 主逻辑
 if __name__ == "__main__":
-    # 加载配置文件
-    config_file = "config.ini"  # 配置文件路径
-    config = load_config(config_file)
+    setup_logging()
+    # 账户配置统一来自 config.json / 环境变量（utils.config）
+    account_name = sys.argv[1] if len(sys.argv) > 1 else "126"
+    try:
+        account = get_config().get_account(account_name)
+    except ConfigError as e:
+        logging.error(f"读取账户配置失败: {e}")
+        sys.exit(1)
 
     # 检查 IMAP 客户端配置
-    check_imap_client(config)
+    check_imap_client(account)
@@ -2,59 +2,118 @@ import configparser
 import email
 import imaplib
 import logging
+import os
 import smtplib
+import sys
+import time
 from email.header import decode_header
 from email.mime.text import MIMEText
 
-import chardet
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,  # 设置日志级别
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(),  # 输出到控制台
-        logging.FileHandler("process_emails.log", encoding="utf-8"),  # 输出到文件
-    ],
-)
+from database.db_init import create_session_factory, session_scope
+from database.db_operations import add_tags_by_message_id
+from parsers.parse_cache import parse_cached
+from parsers.rules import FIELDS, Rule, RuleEngine
+from utils.config import ConfigError, get_config
+from utils.diagnostics import run_diagnostics
+from utils.ratelimit import RateLimiter
+
+
+# 配置日志（仅在作为脚本运行时调用，导入本模块不会创建日志文件）
+def setup_logging():
+    logging.basicConfig(
+        level=logging.INFO,  # 设置日志级别
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[
+            logging.StreamHandler(),  # 输出到控制台
+            logging.FileHandler("process_emails.log", encoding="utf-8"),  # 输出到文件
+        ],
+    )
+
+
+def split_list(value):
+    """逗号分隔的配置项 -> 元组"""
+    return tuple(item.strip() for item in (value or "").split(",") if item.strip())
 
 
 class EmailForwarder:
-    def __init__(self, config_file, keyword):
-        self.config_file = config_file
-        self.keyword = keyword  # 搜索关键词
-        self.conf = self.load_config()
+    """
+    :param account: utils.config.AccountConfig，IMAP/SMTP 连接信息和发信速率限制
+    :param rules_file: 转发规则文件（ini 格式），见 load_rules
+    :param keyword: 没有配置规则时使用的单个关键词
+    :param db_url: 命中规则的标签按 Message-ID 写入该数据库中的邮件，为 None 时只记录日志
+    :param slow_tracker: utils.diagnostics.SlowMessageTracker，记录解析最慢的邮件
+    """
+
+    def __init__(
+        self, account, rules_file, keyword=None, db_url=None, slow_tracker=None
+    ):
+        self.account = account
+        self.rules_file = rules_file
+        self.keyword = keyword
+        self.target_email = None
+        self.rules = self.load_rules()
+        # 所有规则的关键词编译为一个自动机，每封邮件只扫描一遍
+        self.engine = RuleEngine(self.rules)
+        # 按账户的 smtp_rate_limit 控制发信频率
+        self.limiter = RateLimiter(account.smtp_rate_limit)
+        self.session_factory = create_session_factory(db_url) if db_url else None
+        self.slow_tracker = slow_tracker
         self.conn = None
 
-    # 从配置文件加载配置
-    def load_config(self):
-        try:
-            config = configparser.ConfigParser()
-            config.read(self.config_file, encoding="utf-8")
-            conf = {
-                "imap_server": config.get("email", "imap_server"),
-                "imap_ssl_port": config.getint("email", "imap_ssl_port"),
-                "imap_user": config.get("email", "imap_user"),
-                "imap_pwd": config.get("email", "imap_pwd"),
-                "smtp_server": config.get("email", "smtp_server"),
-                "smtp_ssl_port": config.getint("email", "smtp_ssl_port"),
-                "smtp_user": config.get("email", "smtp_user"),
-                "smtp_pwd": config.get("email", "smtp_pwd"),
-                "target_email": config.get("email", "target_email"),
-            }
-            logging.info("成功加载配置文件")
-            return conf
-        except Exception as e:
-            logging.error(f"加载配置文件失败: {e}")
-            raise
+    # 从规则文件加载转发/打标签规则，例如：
+    #   [forward]
+    #   target_email = me@example.com
+    #
+    #   [rule:icbc]
+    #   keywords = 工商, ICBC, @icbc.com.cn
+    #   fields = subject, sender
+    #   target = me@example.com
+    #   tags = 工商银行, 信用卡
+    # fields 默认为 subject, sender, body；没有 target 的规则只打标签不转发。
+    # [forward] 中的 target_email 是按单个关键词转发时的目标邮箱
+    # （旧版配置文件写在 [email] 段中，同样可以读取）
+    def load_rules(self):
+        config = configparser.ConfigParser()
+        config.read(self.rules_file, encoding="utf-8")
+        for section in ("forward", "email"):
+            if config.has_option(section, "target_email"):
+                self.target_email = config.get(section, "target_email")
+                break
+        rules = []
+        for section in config.sections():
+            if not section.startswith("rule:"):
+                continue
+            values = config[section]
+            rules.append(
+                Rule(
+                    name=section[len("rule:") :],
+                    keywords=split_list(values.get("keywords")),
+                    fields=split_list(values.get("fields")) or FIELDS,
+                    target=values.get("target") or None,
+                    tags=split_list(values.get("tags")),
+                )
+            )
+        if not rules and self.keyword:
+            rules.append(
+                Rule(
+                    name=self.keyword,
+                    keywords=(self.keyword,),
+                    target=self.target_email,
+                )
+            )
+        logging.info(f"成功加载 {len(rules)} 条规则")
+        return rules
 
     # 连接到IMAP服务器
     def connect_to_imap(self):
         try:
             self.conn = imaplib.IMAP4_SSL(
-                self.conf["imap_server"], self.conf["imap_ssl_port"]
+                self.account.imap_server, self.account.imap_port
             )
-            self.conn.login(self.conf["imap_user"], self.conf["imap_pwd"])
+            self.conn.login(self.account.username, self.account.password)
             logging.info("成功连接到IMAP服务器")
 
             # 发送IMAP ID命令（126邮箱可能需要）
@@ -101,70 +160,43 @@ class EmailForwarder:
             logging.error(f"连接IMAP服务器失败: {e}")
             raise
 
-    # 检测并解码邮件内容
-    def decode_email_body(self, body):
-        try:
-            # 使用 chardet 检测编码
-            detected = chardet.detect(body)
-            encoding = detected.get("encoding", "utf-8")
-            logging.info(f"检测到邮件内容编码: {encoding}")
-
-            # 尝试解码
-            return body.decode(
-                encoding, errors="replace"
-            )  # 使用 errors='replace' 替换无法解码的字符
-        except Exception as e:
-            logging.warning(f"解码邮件内容失败: {e}")
-            # 如果检测失败，尝试使用常见编码
-            for enc in ["gbk", "iso-8859-1", "utf-8", "ascii"]:
-                try:
-                    return body.decode(enc, errors="replace")
-                except Exception:
-                    continue
-            raise ValueError("无法解码邮件内容")
-
-    # 获取邮件内容
+    # 获取收件箱中全部邮件的 ID，是否转发由规则引擎在本地匹配
+    def search_emails(self):
+        status, data = self.conn.search(None, "ALL")
+        if status != "OK":
+            logging.warning("搜索邮件失败")
+            return []
+        return data[0].split()
+
+    # 规则匹配用的字段：主题、发件人和正文（没有纯文本正文时使用 HTML）
+    @staticmethod
+    def message_fields(parsed):
+        return {
+            "subject": parsed["subject"],
+            "sender": parsed["sender"],
+            "body": parsed["text_content"] or parsed["html_content"] or "",
+        }
+
+    # 获取邮件内容，与其他工具共用解析结果缓存（parsers.parse_cache），同一封邮件只解析一次
     def fetch_email(self, email_id):
         try:
             status, msg_data = self.conn.fetch(email_id, "(RFC822)")
             if status == "OK":
-                email_msg = email.message_from_bytes(msg_data[0][1])
-                subject, encoding = decode_header(email_msg["Subject"])[0]
-                if isinstance(subject, bytes):
-                    subject = subject.decode(encoding if encoding else "utf-8")
-                logging.info(f"成功获取邮件: {subject}")
-
-                # 提取邮件正文
-                body = None
-                if email_msg.is_multipart():
-                    # 如果是多部分邮件，遍历所有部分
-                    for part in email_msg.walk():
-                        content_type = part.get_content_type()
-                        if content_type == "text/plain" or content_type == "text/html":
-                            body = part.get_payload(decode=True)
-                            if body:
-                                try:
-                                    body = self.decode_email_body(body)
-                                except ValueError as e:
-                                    logging.error(f"无法解码邮件内容: {e}")
-                                    body = None
-                            break
-                else:
-                    # 如果是单部分邮件，直接提取内容
-                    body = email_msg.get_payload(decode=True)
-                    if body:
-                        try:
-                            body = self.decode_email_body(body)
-                        except ValueError as e:
-                            logging.error(f"无法解码邮件内容: {e}")
-                            body = None
-
-                if body:
-                    email_msg._payload = body  # 将解码后的内容保存到邮件对象中
-                else:
+                started = time.perf_counter()
+                parsed = parse_cached(msg_data[0][1])
+                if self.slow_tracker is not None:
+                    content_type = parsed["headers"].get("Content-Type") or ""
+                    self.slow_tracker.record(
+                        time.perf_counter() - started,
+                        uid=email_id.decode(),
+                        size=len(msg_data[0][1]),
+                        content_type=content_type.split(";")[0].strip() or None,
+                        subject=parsed["subject"],
+                    )
+                logging.info(f"成功获取邮件: {parsed['subject']}")
+                if not (parsed["text_content"] or parsed["html_content"]):
                     logging.warning(f"邮件内容为空: {email_id}")
-
-                return email_msg
+                return parsed
             else:
                 logging.warning(f"无法获取邮件内容: {email_id}")
                 return None
@@ -172,48 +204,75 @@ class EmailForwarder:
             logging.error(f"获取邮件内容失败: {e}")
             raise
 
-    # 发送邮件到目标邮箱
-    def send_to_target(self, email_msg):
+    # 发送邮件到目标邮箱（默认为规则文件中的 target_email）
+    def send_to_target(self, parsed, target=None):
+        target = target or self.target_email
         try:
             # 检查邮件内容是否为空
-            body = email_msg.get_payload(decode=True)
+            body = parsed["text_content"] or parsed["html_content"]
             if not body:
-                logging.warning(f"邮件内容为空，跳过发送: {email_msg['Subject']}")
+                logging.warning(f"邮件内容为空，跳过发送: {parsed['subject']}")
                 return
 
             # 创建 MIMEText 对象
-            msg = MIMEText(body, "plain", "utf-8")
-            msg["Subject"] = email_msg["Subject"]
-            msg["From"] = self.conf["imap_user"]
-            msg["To"] = self.conf["target_email"]
+            subtype = "plain" if parsed["text_content"] else "html"
+            msg = MIMEText(body, subtype, "utf-8")
+            msg["Subject"] = parsed["subject"]
+            msg["From"] = self.account.username
+            msg["To"] = target
 
             # 发送邮件
+            self.limiter.wait()
             with smtplib.SMTP_SSL(
-                self.conf["smtp_server"], self.conf["smtp_ssl_port"]
+                self.account.smtp_server, self.account.smtp_port
             ) as server:
-                server.login(self.conf["smtp_user"], self.conf["smtp_pwd"])
-                server.sendmail(
-                    self.conf["imap_user"], self.conf["target_email"], msg.as_string()
-                )
-                logging.info(f"已发送邮件: {email_msg['Subject']}")
+                server.login(self.account.username, self.account.password)
+                server.sendmail(self.account.username, target, msg.as_string())
+                logging.info(f"已发送邮件到 {target}: {parsed['subject']}")
         except Exception as e:
             logging.error(f"发送邮件失败: {e}")
             raise
 
+    # 把标签追加到数据库中 Message-ID 相同的邮件（需要先用 main.py sync 同步到本地）
+    def save_tags(self, parsed, tags):
+        if not tags or self.session_factory is None:
+            return 0
+        if not parsed.get("message_id"):
+            logging.warning(f"邮件没有 Message-ID，无法保存标签: {parsed['subject']}")
+            return 0
+        with session_scope(self.session_factory) as session:
+            count = add_tags_by_message_id(session, parsed["message_id"], tags)
+        if not count:
+            logging.info(f"数据库中没有该邮件，标签未保存: {parsed['subject']}")
+        return count
+
+    # 一次扫描匹配全部规则，保存标签并转发（同一目标只转发一次）
+    def apply_rules(self, parsed):
+        rules = self.engine.match(self.message_fields(parsed))
+        if not rules:
+            return []
+        tags = sorted({tag for rule in rules for tag in rule.tags})
+        logging.info(
+            f"邮件 {parsed['subject']} 命中规则: "
+            f"{', '.join(rule.name for rule in rules)}，标签: {tags}"
+        )
+        self.save_tags(parsed, tags)
+        for target in dict.fromkeys(rule.target for rule in rules if rule.target):
+            self.send_to_target(parsed, target)
+        return rules
+
     # 主逻辑
     def run(self):
         try:
             # 连接到IMAP服务器
             self.connect_to_imap()
 
-            # 搜索符合条件的邮件
+            # 获取邮件，按规则转发到各自的目标邮箱
             email_ids = self.search_emails()
-
-            # 遍历邮件并发送到目标邮箱
             for email_id in email_ids:
-                email_msg = self.fetch_email(email_id)
-                if email_msg:
-                    self.send_to_target(email_msg)
+                parsed = self.fetch_email(email_id)
+                if parsed:
+                    self.apply_rules(parsed)
 
         except Exception as e:
             logging.error(f"程序运行出错: {e}")
@@ -226,7 +285,25 @@ class EmailForwarder:
 
 # 运行程序
 if __name__ == "__main__":
-    # 从命令行参数或直接传入关键词
+    setup_logging()
+    # 账户连接信息统一来自 config.json / 环境变量（utils.config）；--profile 启用采样分析
+    args = [arg for arg in sys.argv[1:] if arg != "--profile"]
+    account_name = args[0] if args else "126"
+    try:
+        config = get_config()
+        account = config.get_account(account_name)
+    except ConfigError as e:
+        logging.error(f"读取账户配置失败: {e}")
+        sys.exit(1)
+    # 规则文件中没有 [rule:...] 段时按单个关键词转发
     keyword = "工商"  # 可以修改为从命令行参数获取
-    forwarder = EmailForwarder("config.ini", keyword)
-    forwarder.run()
+    # SIGUSR1 打印调用栈，结束时记录解析最慢的邮件
+    with run_diagnostics("copy_email", profile="--profile" in sys.argv) as tracker:
+        forwarder = EmailForwarder(
+            account,
+            "config.ini",
+            keyword,
+            db_url=config.database_url,
+            slow_tracker=tracker,
+        )
+        forwarder.run()
@@ -1,37 +1,32 @@
 import imaplib
 import logging
 import os
+import sys
 from email.header import decode_header
 
-import pyzmail
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-)
+from parsers.parse_cache import parse_cached
+from utils.config import ConfigError, get_config
 
 
-# 从本地txt文件读取邮箱配置
-def read_config(file_path="./qqconfig.txt"):
-    config = {}
-    try:
-        with open(file_path, "r") as f:
-            for line in f:
-                key, value = line.strip().split("=")
-                config[key] = value
-        logging.info("配置文件读取成功")
-    except Exception as e:
-        logging.error("读取配置文件失败: %s", e)
-    return config
+# 配置日志（仅在作为脚本运行时调用，导入本模块不会创建日志文件）
+def setup_logging():
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
 
 
-# 登录 QQ 邮箱
-def login_to_email(username, password):
-    imap_server = "imap.qq.com"
+# 登录邮箱
+def login_to_email(account):
+    """
+    :param account: utils.config.AccountConfig
+    """
     try:
         # 连接到 IMAP 服务器
-        mail = imaplib.IMAP4_SSL(imap_server)
-        mail.login(username, password)
+        mail = imaplib.IMAP4_SSL(account.imap_server, account.imap_port)
+        mail.login(account.username, account.password)
         logging.info("登录成功")
         return mail
     except Exception as e:
@@ -91,9 +86,9 @@ def fetch_emails(mail):
                         )
                         continue
 
-                    # 使用 pyzmail 解析邮件
+                    # 使用共享的解析结果缓存（parsers.parse_cache），同一封邮件只解析一次
                     try:
-                        msg = pyzmail.PyzMessage.factory(raw_email)
+                        parsed = parse_cached(raw_email)
                     except Exception as e:
                         logging.error("解析邮件失败: %s", e)
                         # 保存原始邮件到文件以供分析
@@ -102,38 +97,25 @@ def fetch_emails(mail):
                         continue
 
                     # 解析邮件主题
-                    subject = msg.get_subject()
+                    subject = parsed["subject"]
                     logging.info("邮件主题: %s", subject if subject else "(无主题)")
 
                     # 解析发件人
-                    from_ = msg.get_addresses("from")
-                    logging.info("发件人: %s", from_)
+                    logging.info("发件人: %s", parsed["sender"])
 
                     # 获取邮件正文
-                    if msg.text_part:
-                        try:
-                            body = msg.text_part.get_payload().decode(
-                                msg.text_part.charset or "utf-8", errors="ignore"
-                            )
-                            logging.info(
-                                "邮件正文:\n%s...", body[:200]
-                            )  # 只打印部分正文
-                            save_email_body_to_file(email_id, body)  # 保存正文到文件
-                        except Exception as e:
-                            logging.error("邮件正文解码失败: %s", e)
-                    elif msg.html_part:
-                        try:
-                            body = msg.html_part.get_payload().decode(
-                                msg.html_part.charset or "utf-8", errors="ignore"
-                            )
-                            logging.info(
-                                "邮件正文（HTML）:\n%s...", body[:200]
-                            )  # 只打印部分正文
-                            save_email_body_to_file(
-                                email_id, body, format="html"
-                            )  # 保存HTML正文到文件
-                        except Exception as e:
-                            logging.error("HTML正文解码失败: %s", e)
+                    if parsed["text_content"]:
+                        body = parsed["text_content"]
+                        logging.info("邮件正文:\n%s...", body[:200])  # 只打印部分正文
+                        save_email_body_to_file(email_id, body)  # 保存正文到文件
+                    elif parsed["html_content"]:
+                        body = parsed["html_content"]
+                        logging.info(
+                            "邮件正文（HTML）:\n%s...", body[:200]
+                        )  # 只打印部分正文
+                        save_email_body_to_file(
+                            email_id, body, format="html"
+                        )  # 保存HTML正文到文件
                     else:
                         logging.warning("邮件 ID %s 没有正文内容", email_id.decode())
 
@@ -146,13 +128,15 @@ def fetch_emails(mail):
 
 # 主程序
 if __name__ == "__main__":
-    config = read_config()
-    email = config.get("email")
-    password = config.get("password")
-
-    if email and password:
-        mail = login_to_email(email, password)
-        if mail:
-            fetch_emails(mail)
-    else:
-        logging.error("缺少邮箱账号或密码，程序退出")
+    setup_logging()
+    # 账户配置统一来自 config.json / 环境变量（utils.config）
+    account_name = sys.argv[1] if len(sys.argv) > 1 else "qq"
+    try:
+        account = get_config().get_account(account_name)
+    except ConfigError as e:
+        logging.error("读取账户配置失败: %s", e)
+        sys.exit(1)
+
+    mail = login_to_email(account)
+    if mail:
+        fetch_emails(mail)
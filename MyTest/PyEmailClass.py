@@ -1,38 +1,27 @@
 import imaplib
 import logging
 import os
+import sys
 from email.header import decode_header
 
 import pyzmail
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,  # 设置日志级别
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(),  # 输出到控制台
-        # logging.FileHandler("process_emails.log", encoding="utf-8"),  # 输出到文件
-    ],
-)
-
-
-# 从本地txt文件读取邮箱配置
-def read_config(file_path="./qqconfig.txt"):
-    """读取邮箱配置文件"""
-    config = {}
-    try:
-        with open(file_path, "r") as f:
-            for line in f:
-                key, value = line.strip().split("=")
-                config[key] = value
-        logging.info("配置文件读取成功")
-    except FileNotFoundError:
-        logging.error("配置文件未找到: %s", file_path)
-    except ValueError:
-        logging.error("配置文件格式错误，应为 key=value")
-    except Exception as e:
-        logging.error("读取配置文件失败: %s", e)
-    return config
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.config import ConfigError, get_config
+
+
+# 配置日志（仅在作为脚本运行时调用，导入本模块不会创建日志文件）
+def setup_logging():
+    logging.basicConfig(
+        level=logging.INFO,  # 设置日志级别
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[
+            logging.StreamHandler(),  # 输出到控制台
+            # logging.FileHandler("process_emails.log", encoding="utf-8"),  # 输出到文件
+        ],
+    )
 
 
 class EmailClient:
@@ -150,13 +139,17 @@ class EmailClient:
 
 # 主程序
 if __name__ == "__main__":
-    config = read_config()
-    email = config.get("email")
-    password = config.get("password")
-
-    if email and password:
-        client = EmailClient(email, password)
-        client.login()
-        client.fetch_emails()
-    else:
-        logging.error("缺少邮箱账号或密码，程序退出")
+    setup_logging()
+    # 账户配置统一来自 config.json / 环境变量（utils.config）
+    account_name = sys.argv[1] if len(sys.argv) > 1 else "qq"
+    try:
+        account = get_config().get_account(account_name)
+    except ConfigError as e:
+        logging.error("读取账户配置失败: %s", e)
+        sys.exit(1)
+
+    client = EmailClient(
+        account.username, account.password, account.imap_server, account.imap_port
+    )
+    client.login()
+    client.fetch_emails()
@@ -1,6 +1,9 @@
 import imaplib
 import logging
+import os
 import sqlite3
+import sys
+import time
 import uuid
 from datetime import datetime
 from email.header import decode_header
@@ -8,10 +11,19 @@ from email.utils import parsedate_to_datetime
 
 import pyzmail
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-)
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.config import ConfigError, get_config
+from utils.diagnostics import run_diagnostics
+
+
+# 配置日志（仅在作为脚本运行时调用，导入本模块不会创建日志文件）
+def setup_logging():
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+
 
 # 数据库文件路径
 DB_FILE = "raw_email.db"
@@ -59,11 +71,19 @@ def init_database():
 class EmailClient:
     """邮箱客户端"""
 
-    def __init__(self, username, password, imap_server="imap.qq.com", port=993):
+    def __init__(
+        self,
+        username,
+        password,
+        imap_server="imap.qq.com",
+        port=993,
+        slow_tracker=None,
+    ):
         self.username = username
         self.password = password
         self.imap_server = imap_server
         self.port = port
+        self.slow_tracker = slow_tracker  # utils.diagnostics.SlowMessageTracker
         self.mail = None
 
     def login(self):
@@ -150,6 +170,7 @@ class EmailClient:
                             )
                             continue
 
+                        started = time.perf_counter()
                         try:
                             msg = pyzmail.PyzMessage.factory(raw_email)
                         except Exception as e:
@@ -188,6 +209,15 @@ class EmailClient:
                             )
                             is_html = True
 
+                        if self.slow_tracker is not None:
+                            self.slow_tracker.record(
+                                time.perf_counter() - started,
+                                uid=uid,
+                                size=len(raw_email),
+                                content_type=msg.get_content_type(),
+                                subject=subject,
+                            )
+
                         if body:
                             self.save_email_to_db(
                                 uid, subject, sender, body, is_html, sent_at
@@ -205,34 +235,26 @@ class EmailClient:
             logging.error("获取邮件失败: %s", e)
 
 
-# 从本地txt文件读取邮箱配置
-def read_config(file_path="./qqconfig.txt"):
-    """读取邮箱配置文件"""
-    config = {}
-    try:
-        with open(file_path, "r") as f:
-            for line in f:
-                key, value = line.strip().split("=")
-                config[key] = value
-        logging.info("配置文件读取成功")
-    except FileNotFoundError:
-        logging.error("配置文件未找到: %s", file_path)
-    except ValueError:
-        logging.error("配置文件格式错误，应为 key=value")
-    except Exception as e:
-        logging.error("读取配置文件失败: %s", e)
-    return config
-
-
 if __name__ == "__main__":
+    setup_logging()
     init_database()
-    config = read_config()
-    email = config.get("email")
-    password = config.get("password")
-
-    if email and password:
-        client = EmailClient(email, password)
+    # 账户配置统一来自 config.json / 环境变量（utils.config）；--profile 启用采样分析
+    args = [arg for arg in sys.argv[1:] if arg != "--profile"]
+    account_name = args[0] if args else "qq"
+    try:
+        account = get_config().get_account(account_name)
+    except ConfigError as e:
+        logging.error("读取账户配置失败: %s", e)
+        sys.exit(1)
+
+    # SIGUSR1 打印调用栈，结束时记录解析最慢的邮件
+    with run_diagnostics("pyemailsql", profile="--profile" in sys.argv) as tracker:
+        client = EmailClient(
+            account.username,
+            account.password,
+            account.imap_server,
+            account.imap_port,
+            slow_tracker=tracker,
+        )
         client.login()
         client.fetch_emails()
-    else:
-        logging.error("缺少邮箱账号或密码，程序退出")
@@ -1,11 +1,18 @@
+import hashlib
 import logging
 import os
+import shutil
+import sqlite3
+import sys
 import tempfile
 import zipfile
-from email import policy
-from email.parser import BytesParser
+from datetime import datetime
 
-import html2text  # 用于将 HTML 转换为纯文本
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.models import EmlManifest
+from parsers.parse_cache import parse_cached
 
 
 # 配置日志
@@ -37,85 +44,122 @@ def setup_logging():
     )
 
 
-def extract_eml_from_zip(zip_path, extract_to):
+# 处理记录保存在项目数据库的 eml_manifest 表（database.models.EmlManifest）中，
+# 重新运行时跳过未变化的 ZIP 文件和 EML 文件
+DEFAULT_DB_URL = "sqlite:///./database.db"
+LEGACY_MANIFEST_DB = "eml_manifest.db"  # 旧版本使用的独立 SQLite 文件
+STATUS_PROCESSING = "processing"
+STATUS_DONE = "done"  # ZIP：已完整扫描（失败的文件另有记录）；EML：解析成功
+STATUS_FAILED = "failed"  # ZIP：不是有效的 ZIP 文件；EML：解析失败，下次重试
+
+
+def get_manifest(session, path, member=""):
+    return (
+        session.query(EmlManifest)
+        .filter(EmlManifest.path == path, EmlManifest.member == member)
+        .one_or_none()
+    )
+
+
+def set_manifest(session, path, member, size, mtime, digest, status):
+    """写入一条处理记录并提交，中断后已处理的文件不会重复处理"""
+    row = get_manifest(session, path, member)
+    if row is None:
+        row = EmlManifest(path=path, member=member)
+        session.add(row)
+    row.size = size
+    row.mtime = mtime
+    row.digest = digest
+    row.status = status
+    row.processed_at = datetime.now()
+    session.commit()
+    return row
+
+
+def failed_members(session, path):
+    """ZIP 中上次解析失败的 EML 文件名集合"""
+    return {
+        member
+        for (member,) in session.query(EmlManifest.member).filter(
+            EmlManifest.path == path,
+            EmlManifest.member != "",
+            EmlManifest.status == STATUS_FAILED,
+        )
+    }
+
+
+def import_legacy_manifest(session, db_file=LEGACY_MANIFEST_DB):
+    """把旧版本 eml_manifest.db 中的记录导入数据库（只执行一次，之后文件改名为 .imported）"""
+    if not os.path.exists(db_file):
+        return 0
+    conn = sqlite3.connect(db_file)
     try:
-        with zipfile.ZipFile(zip_path, "r") as zip_ref:
-            for file_info in zip_ref.infolist():
-                # 尝试使用 cp437 或 gbk 解码文件名
-                try:
-                    file_name = file_info.filename.encode("cp437").decode("gbk")
-                except UnicodeDecodeError:
-                    file_name = file_info.filename  # 如果解码失败，使用原始文件名
-
-                # 构建目标文件路径
-                target_path = os.path.join(extract_to, file_name)
-                os.makedirs(os.path.dirname(target_path), exist_ok=True)
-
-                # 解压文件
-                with zip_ref.open(file_info) as source, open(
-                    target_path, "wb"
-                ) as target:
-                    target.write(source.read())
-
-        logging.info(f"成功解压ZIP文件: {os.path.basename(zip_path)}")
-    except zipfile.BadZipFile:
-        logging.error(f"错误: {os.path.basename(zip_path)} 不是一个有效的ZIP文件。")
-    except FileNotFoundError:
-        logging.error(f"错误: ZIP文件 {os.path.basename(zip_path)} 未找到。")
-    except Exception as e:
-        logging.error(f"解压ZIP文件 {os.path.basename(zip_path)} 时发生未知错误: {e}")
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(manifest)")]
+        digest = "sha256" if "sha256" in columns else "digest"
+        rows = conn.execute(
+            f"SELECT path, member, size, mtime, {digest}, status FROM manifest"
+        ).fetchall()
+    finally:
+        conn.close()
+    for path, member, size, mtime, value, status in rows:
+        if get_manifest(session, path, member) is None:
+            session.add(
+                EmlManifest(
+                    path=path,
+                    member=member,
+                    size=size,
+                    mtime=mtime,
+                    digest=value,
+                    status=status,
+                    processed_at=datetime.now(),
+                )
+            )
+    session.commit()
+    os.replace(db_file, db_file + ".imported")
+    logging.info(f"已从 {db_file} 导入 {len(rows)} 条处理记录")
+    return len(rows)
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def member_name(file_info):
+    # 尝试使用 cp437 或 gbk 解码文件名
+    try:
+        return file_info.filename.encode("cp437").decode("gbk")
+    except UnicodeDecodeError:
+        return file_info.filename  # 如果解码失败，使用原始文件名
+
+
+def extract_member(zip_ref, file_info, extract_to):
+    """只解压 ZIP 中的一个文件，返回解压后的路径"""
+    target_path = os.path.join(extract_to, member_name(file_info))
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    with zip_ref.open(file_info) as source, open(target_path, "wb") as target:
+        shutil.copyfileobj(source, target)
+    return target_path
 
 
 def parse_eml_file(eml_path, max_lines=20):
     try:
         with open(eml_path, "rb") as f:
-            msg = BytesParser(policy=policy.default).parse(f)
-
-        subject = msg["subject"]
-        date = msg["date"]
-
-        # 提取邮件内容
-        content = ""
-        if msg.is_multipart():
-            # 如果是多部分邮件，遍历所有部分
-            for part in msg.walk():
-                content_type = part.get_content_type()
-                if content_type in ["text/plain", "text/html"]:
-                    # 提取纯文本或HTML内容
-                    try:
-                        payload = part.get_payload(decode=True)
-                        if payload:
-                            # 如果是 HTML 内容，转换为纯文本
-                            if content_type == "text/html":
-                                # 获取邮件内容的编码
-                                charset = part.get_content_charset() or "utf-8"
-                                html_content = payload.decode(charset, errors="ignore")
-                                content = html2text.html2text(
-                                    html_content
-                                )  # 转换为纯文本
-                            else:
-                                charset = part.get_content_charset() or "utf-8"
-                                content = payload.decode(charset, errors="ignore")
-                            break
-                    except Exception as e:
-                        logging.warning(
-                            f"无法解码 {eml_path} 的 {content_type} 部分: {e}"
-                        )
-        else:
-            # 如果是单部分邮件，直接提取内容
-            try:
-                payload = msg.get_payload(decode=True)
-                if payload:
-                    # 如果是 HTML 内容，转换为纯文本
-                    if msg.get_content_type() == "text/html":
-                        charset = msg.get_content_charset() or "utf-8"
-                        html_content = payload.decode(charset, errors="ignore")
-                        content = html2text.html2text(html_content)  # 转换为纯文本
-                    else:
-                        charset = msg.get_content_charset() or "utf-8"
-                        content = payload.decode(charset, errors="ignore")
-            except Exception as e:
-                logging.warning(f"无法解码 {eml_path} 的内容: {e}")
+            # 与其他工具共用解析结果缓存，同一封邮件只解析一次
+            parsed = parse_cached(f.read())
+
+        subject = parsed["subject"] or None
+        date = parsed["headers"].get("Date")
+
+        # 提取邮件内容，优先使用纯文本正文
+        content = parsed["text_content"] or ""
+        if not content and parsed["html_content"]:
+            import html2text  # 用于将 HTML 转换为纯文本，按需加载
+
+            content = html2text.html2text(parsed["html_content"])  # 转换为纯文本
 
         # 获取前 max_lines 行
         content_lines = content.splitlines()[:max_lines]
@@ -127,50 +171,146 @@ def parse_eml_file(eml_path, max_lines=20):
         return None, None, None
 
 
-def process_eml_folder(eml_folder, zip_path, max_lines=20):
+def log_eml(zip_path, file, date, subject, content_preview, max_lines=20):
+    # 合并ZIP文件和EML文件的信息到一行
+    logging.info(f"ZIP文件: {os.path.basename(zip_path)}, EML文件: {file}")
+    # Date 和 Subject 独立一行显示
+    logging.info(f"Date: {date}")
+    logging.info(f"Subject: {subject}")
+    # 显示邮件内容的前 max_lines 行
+    if content_preview:
+        logging.info(f"邮件内容前{max_lines}行:")
+        logging.info(content_preview)
+    else:
+        logging.info(f"邮件内容前{max_lines}行: 无内容或无法解析")
+    logging.info("-" * 40)  # 分隔线
+
+
+def archive_unchanged(session, zip_path, size, mtime):
+    """
+    上次已完整处理且大小和修改时间都没变时直接认为未变化，不再计算 SHA-256；
+    否则计算 SHA-256，内容相同（例如只是被复制或 touch）时更新记录后同样跳过。
+
+    :return: (是否未变化, SHA-256)，未计算时 SHA-256 为 None
+    """
+    row = get_manifest(session, zip_path)
+    # 上次中断（processing）的 ZIP 需要继续处理；无效的 ZIP（failed）未变化时不再重试
+    finished = row is not None and row.status in (STATUS_DONE, STATUS_FAILED)
+    if finished and (row.size, row.mtime) == (size, mtime):
+        return True, None
+    digest = file_sha256(zip_path)
+    if finished and row.digest == digest:
+        set_manifest(session, zip_path, "", size, mtime, digest, row.status)
+        return True, digest
+    return False, digest
+
+
+def process_zip(session, zip_path, max_lines=20):
+    """
+    处理一个 ZIP 文件中新增或变化的 EML 文件，每处理完一个就写入记录，
+    中断后重新运行从未处理的文件继续。ZIP 未变化时只重试上次解析失败的文件。
+
+    :return: 本次处理的 EML 文件数
+    """
+    stat = os.stat(zip_path)
+    unchanged, digest = archive_unchanged(
+        session, zip_path, stat.st_size, stat.st_mtime
+    )
+    retry = None
+    if unchanged:
+        retry = failed_members(session, zip_path)
+        if not retry:
+            logging.info(f"跳过未变化的ZIP文件: {os.path.basename(zip_path)}")
+            return 0
+        logging.info(
+            f"重试ZIP文件 {os.path.basename(zip_path)} 中 {len(retry)} 个失败的EML文件"
+        )
+        digest = get_manifest(session, zip_path).digest
+    else:
+        logging.info(f"正在处理ZIP文件: {os.path.basename(zip_path)}")
+        set_manifest(
+            session,
+            zip_path,
+            "",
+            stat.st_size,
+            stat.st_mtime,
+            digest,
+            STATUS_PROCESSING,
+        )
+
+    processed = 0
     try:
-        for root, _, files in os.walk(eml_folder):
-            for file in files:
-                if file.endswith(".eml"):
-                    eml_path = os.path.join(root, file)
-                    date, subject, content_preview = parse_eml_file(eml_path, max_lines)
-                    if date and subject:
-                        # 合并ZIP文件和EML文件的信息到一行
-                        logging.info(
-                            f"ZIP文件: {os.path.basename(zip_path)}, EML文件: {file}"
-                        )
-                        # Date 和 Subject 独立一行显示
-                        logging.info(f"Date: {date}")
-                        logging.info(f"Subject: {subject}")
-                        # 显示邮件内容的前 max_lines 行
-                        if content_preview:
-                            logging.info(f"邮件内容前{max_lines}行:")
-                            logging.info(content_preview)
-                        else:
-                            logging.info(f"邮件内容前{max_lines}行: 无内容或无法解析")
-                        logging.info("-" * 40)  # 分隔线
-    except Exception as e:
-        logging.error(f"处理文件夹 {eml_folder} 时发生错误: {e}")
+        with zipfile.ZipFile(
+            zip_path, "r"
+        ) as zip_ref, tempfile.TemporaryDirectory() as temp_dir:
+            for file_info in zip_ref.infolist():
+                name = member_name(file_info)
+                if not name.endswith(".eml"):
+                    continue
+                if retry is not None and name not in retry:
+                    continue
+                crc = f"{file_info.CRC:08x}"
+                row = get_manifest(session, zip_path, name)
+                if (
+                    row is not None
+                    and row.size == file_info.file_size
+                    and row.digest == crc
+                    and row.status == STATUS_DONE
+                ):
+                    continue  # 已处理且未变化；上次解析失败的重新处理
+
+                eml_path = extract_member(zip_ref, file_info, temp_dir)
+                date, subject, content_preview = parse_eml_file(eml_path, max_lines)
+                os.remove(eml_path)
+                if date and subject:
+                    log_eml(zip_path, name, date, subject, content_preview, max_lines)
+                # 解析出错时三项都为 None
+                failed = date is None and subject is None and content_preview is None
+                status = STATUS_FAILED if failed else STATUS_DONE
+                set_manifest(
+                    session, zip_path, name, file_info.file_size, None, crc, status
+                )
+                processed += 1
+    except zipfile.BadZipFile:
+        logging.error(f"错误: {os.path.basename(zip_path)} 不是一个有效的ZIP文件。")
+        set_manifest(
+            session, zip_path, "", stat.st_size, stat.st_mtime, digest, STATUS_FAILED
+        )
+        return processed
+
+    # 失败的文件已经逐个记录，ZIP 本身标记为已完成，下次只重试这些文件，不再重新计算哈希
+    set_manifest(
+        session, zip_path, "", stat.st_size, stat.st_mtime, digest, STATUS_DONE
+    )
+    logging.info(
+        f"ZIP文件 {os.path.basename(zip_path)} 处理完成，新处理 {processed} 个EML文件"
+    )
+    return processed
 
 
-def process_all_zips_in_folder(folder_path, max_lines=20):
+def process_all_zips_in_folder(folder_path, max_lines=20, db_url=DEFAULT_DB_URL):
+    from database.db_init import create_session_factory
+
+    session = create_session_factory(db_url)()
+    total = 0
     try:
+        import_legacy_manifest(session)
         # 遍历文件夹中的所有ZIP文件
         for root, _, files in os.walk(folder_path):
-            for file in files:
+            for file in sorted(files):
                 if file.endswith(".zip"):
-                    zip_path = os.path.join(root, file)
-                    logging.info(f"正在处理ZIP文件: {os.path.basename(zip_path)}")
-
-                    # 创建临时文件夹
-                    with tempfile.TemporaryDirectory() as temp_dir:
-                        # 解压ZIP文件到临时文件夹
-                        extract_eml_from_zip(zip_path, temp_dir)
-
-                        # 处理解压后的.eml文件
-                        process_eml_folder(temp_dir, zip_path, max_lines)
+                    zip_path = os.path.abspath(os.path.join(root, file))
+                    try:
+                        total += process_zip(session, zip_path, max_lines)
+                    except Exception as e:
+                        session.rollback()
+                        logging.error(f"处理ZIP文件 {file} 时发生错误: {e}")
     except Exception as e:
         logging.error(f"遍历文件夹 {folder_path} 时发生错误: {e}")
+    finally:
+        session.close()
+    logging.info(f"本次共处理 {total} 个新增或变化的EML文件")
+    return total
 
 
 def main():
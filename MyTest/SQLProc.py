@@ -1,18 +1,30 @@
 import csv
 import logging
+import os
 import re
 import sqlite3
+import sys
 from typing import List, Optional, Tuple
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,  # 设置日志级别
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(),  # 输出到控制台
-        logging.FileHandler("./process_emails.log", encoding="utf-8"),  # 输出到文件
-    ],
-)
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# sqlalchemy 和 database 模块在用到的函数内导入，导入本模块只需要标准库
+# 与 main.py 的默认数据库相同
+DEFAULT_DB_URL = "sqlite:///./database.db"
+
+
+# 配置日志（仅在作为脚本运行时调用，导入本模块不会创建日志文件）
+def setup_logging():
+    logging.basicConfig(
+        level=logging.INFO,  # 设置日志级别
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[
+            logging.StreamHandler(),  # 输出到控制台
+            logging.FileHandler("./process_emails.log", encoding="utf-8"),  # 输出到文件
+        ],
+    )
+
 
 # 正则表达式，匹配表格中的记录行
 PATTERN = re.compile(
@@ -49,6 +61,59 @@ def process_email_body(body: Optional[str]) -> List[Tuple[str, ...]]:
     return matches
 
 
+def extract_new_emails(db_path: str, db_url: str = DEFAULT_DB_URL) -> int:
+    """
+    把 raw_email.db 中新增的邮件复制到模型数据库（按 rowid 断点续传，只读原型库），
+    再从尚未提取过的邮件中提取交易，写入模型中的 transactions 表
+    （与 pyemail extract 相同的表结构和自然键）。
+    :param db_path: 原型库 raw_email.db 路径
+    :param db_url: 模型数据库 URL
+    :return: 本次写入的记录数
+    """
+    from database.db_init import create_session_factory, session_scope
+    from database.db_operations import extract_transactions
+    from database.migrations import migrate_legacy_emails
+
+    migrate_legacy_emails(db_path, db_url)
+    with session_scope(create_session_factory(db_url)) as session:
+        _, total = extract_transactions(session)
+    logging.info(f"本次写入 {total} 条交易记录。")
+    return total
+
+
+def format_amount(amount, currency) -> str:
+    """把金额和币种还原为账单中的 "金额/币种" 文本"""
+    if amount is None:
+        return ""
+    return f"{amount:,.2f}/{currency}"
+
+
+def load_transactions(db_url: str = DEFAULT_DB_URL) -> List[Tuple[str, ...]]:
+    """
+    读取全部交易，按导出 CSV 的列顺序返回。
+    :param db_url: 模型数据库 URL
+    """
+    from database.db_init import create_session_factory, session_scope
+    from database.models import Transaction
+
+    with session_scope(create_session_factory(db_url)) as session:
+        transactions = session.query(Transaction).order_by(
+            Transaction.card_last4, Transaction.trade_date, Transaction.id
+        )
+        return [
+            (
+                t.card_last4,
+                t.trade_date.isoformat(),
+                t.post_date.isoformat(),
+                t.trade_type,
+                t.merchant,
+                format_amount(t.amount, t.currency),
+                format_amount(t.posted_amount, t.posted_currency),
+            )
+            for t in transactions
+        ]
+
+
 def write_to_csv(
     file_path: str, headers: List[str], rows: List[Tuple[str, ...]]
 ) -> None:
@@ -69,30 +134,21 @@ def write_to_csv(
         raise
 
 
-def main(db_path: str, output_path: str) -> None:
+def main(db_path: str, output_path: str, db_url: str = DEFAULT_DB_URL) -> None:
     """
-    主函数，处理数据库中的邮件内容并导出到 CSV 文件。
-    :param db_path: SQLite 数据库路径
+    主函数，把新邮件中的交易写入 transactions 表，并将全部交易导出到 CSV 文件。
+    :param db_path: 原型库 raw_email.db 路径
     :param output_path: 导出 CSV 文件路径
+    :param db_url: 模型数据库 URL
     """
-    conn = None
-    matches_found = False
+    from sqlalchemy.exc import SQLAlchemyError
 
     try:
-        logging.info(f"连接到数据库: {db_path}")
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT body FROM emails")
-        logging.info("成功读取 emails 表的 body 列数据。")
-
-        all_matches = []
-        for row in cursor.fetchall():
-            matches = process_email_body(row[0])
-            if matches:
-                matches_found = True
-                all_matches.extend(matches)
-
-        if matches_found:
+        logging.info(f"读取原型库: {db_path}，写入: {db_url}")
+        extract_new_emails(db_path, db_url)
+
+        all_matches = load_transactions(db_url)
+        if all_matches:
             headers = [
                 "卡号后四位",
                 "交易日",
@@ -106,15 +162,12 @@ def main(db_path: str, output_path: str) -> None:
         else:
             logging.warning("未提取到有效数据，请检查数据库内容或正则表达式。")
 
-    except sqlite3.Error as e:
+    except (sqlite3.Error, SQLAlchemyError) as e:
         logging.error(f"数据库操作出错: {e}")
     except Exception as e:
         logging.error(f"程序运行时发生未预期的错误: {e}")
-    finally:
-        if conn:
-            conn.close()
-            logging.info("数据库连接已关闭。")
 
 
 if __name__ == "__main__":
+    setup_logging()
     main("./raw_email.db", "./temp.csv")
@@ -0,0 +1,129 @@
+# ./parquet_export.py
+"""
+把提取出的信用卡交易导出为按月份和卡号分区的 Parquet 数据集。
+
+目录结构：<root>/month=2025-01/card_last4=1234/part-<批次>-0.parquet
+每次导出只追加 transactions 表中新增交易的文件，不重写已有分区；
+读取时可按列裁剪、按分区过滤。
+"""
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+PARTITION_COLUMNS = ["month", "card_last4"]
+EXPORT_BATCH_SIZE = 50000
+
+
+def _require_pyarrow():
+    """pyarrow 是可选依赖，只有导出/读取 Parquet 时才需要"""
+    try:
+        import pyarrow
+        import pyarrow.dataset
+    except ImportError as e:
+        raise ImportError("导出 Parquet 需要安装 pyarrow：pip install pyarrow") from e
+    return pyarrow, pyarrow.dataset
+
+
+def transaction_schema():
+    pa, _ = _require_pyarrow()
+    return pa.schema(
+        [
+            ("trade_date", pa.date32()),
+            ("post_date", pa.date32()),
+            ("trade_type", pa.dictionary(pa.int32(), pa.string())),
+            ("merchant", pa.string()),
+            ("amount", pa.decimal128(18, 2)),
+            ("currency", pa.dictionary(pa.int8(), pa.string())),
+            ("posted_amount", pa.decimal128(18, 2)),
+            ("posted_currency", pa.dictionary(pa.int8(), pa.string())),
+            ("occurrence", pa.int32()),
+            ("source_email_id", pa.string()),
+            ("month", pa.string()),
+            ("card_last4", pa.string()),
+        ]
+    )
+
+
+def _partitioning():
+    pa, ds = _require_pyarrow()
+    return ds.partitioning(
+        pa.schema([(name, pa.string()) for name in PARTITION_COLUMNS]),
+        flavor="hive",
+    )
+
+
+def records_to_table(records):
+    """
+    把交易记录（parse_statement 或 database.db_operations.transaction_records
+    的返回值）转换为 Arrow 表
+    """
+    pa, _ = _require_pyarrow()
+    schema = transaction_schema()
+    columns = {name: [] for name in schema.names}
+    for record in records:
+        for name in schema.names:
+            if name == "month":
+                columns[name].append(record["trade_date"].strftime("%Y-%m"))
+            else:
+                columns[name].append(record.get(name))
+    return pa.table(columns, schema=schema)
+
+
+def export_transactions(session, root, batch_size=EXPORT_BATCH_SIZE):
+    """
+    把 transactions 表中上次导出之后新增的交易追加导出，不重新解析邮件正文，
+    也不读取已有的数据集。导出进度（最大交易 id）按目录记录在 export_state 表。
+
+    每批文件名由该批的首尾 id 决定：写入文件后、提交进度前中断时，重新运行会覆盖
+    同名文件而不是重复导出。
+
+    :param session: 数据库会话，每批提交一次
+    :param root: 数据集根目录
+    :return: 本次写入的行数
+    """
+    from database.db_operations import get_export_state, transaction_records
+
+    _, ds = _require_pyarrow()
+    state = get_export_state(session, os.path.abspath(root))
+    written = 0
+    while True:
+        records = transaction_records(session, state.last_id, batch_size)
+        if not records:
+            break
+        first, last = records[0]["id"], records[-1]["id"]
+        ds.write_dataset(
+            records_to_table(records),
+            root,
+            format="parquet",
+            partitioning=_partitioning(),
+            basename_template=f"part-{first}-{last}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        state.last_id = last
+        state.exported += len(records)
+        session.commit()
+        written += len(records)
+    if written:
+        logger.info(f"已导出 {written} 条交易记录到 {root}")
+    else:
+        logger.info("没有需要导出的新交易记录")
+    return written
+
+
+def load_transactions(root, columns=None, filter=None):
+    """
+    读取导出的数据集。
+
+    :param columns: 只读取的列（列裁剪）
+    :param filter: pyarrow.dataset 表达式，例如 ds.field("month") == "2025-01"
+    :return: pyarrow.Table
+    """
+    _, ds = _require_pyarrow()
+    dataset = ds.dataset(
+        root,
+        format="parquet",
+        partitioning=_partitioning(),
+        schema=transaction_schema(),
+    )
+    return dataset.to_table(columns=columns, filter=filter)
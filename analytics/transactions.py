@@ -0,0 +1,174 @@
+# ./transactions.py
+"""
+信用卡交易的向量化分析：把提取出的记录装入 pandas DataFrame，
+金额/币种拆分、分组汇总、累计余额和重复检测全部以列运算完成，不逐行循环。
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+# SQLProc 导出的原始列（中文表头）与分析用列名的对应关系
+RAW_COLUMNS = [
+    ("卡号后四位", "card_last4"),
+    ("交易日", "trade_date"),
+    ("记账日", "post_date"),
+    ("交易类型", "trade_type"),
+    ("商户名称/城市", "merchant"),
+    ("交易金额/币种", "amount_text"),
+    ("记账金额/币种", "posted_text"),
+]
+
+# 判断重复交易的自然键。occurrence 是同一账单内相同交易的序号，
+# 因此只有不同邮件中序号也相同的记录（同一账单被重复发送）才算重复
+NATURAL_KEY = [
+    "card_last4",
+    "trade_date",
+    "post_date",
+    "trade_type",
+    "merchant",
+    "amount",
+    "currency",
+    "occurrence",
+]
+
+_AMOUNT_REGEX = r"^\s*(?P<amount>[+-]?[\d,]*\.?\d+)\s*/\s*(?P<currency>[A-Za-z]{3})\s*$"
+
+
+def _require_pandas():
+    """pandas/numpy 是可选依赖，只有做分析时才需要"""
+    try:
+        import numpy
+        import pandas
+    except ImportError as e:
+        raise ImportError("交易分析需要安装 pandas：pip install pandas") from e
+    return pandas, numpy
+
+
+def split_amount(series):
+    """
+    向量化拆分 "金额/币种" 列。
+
+    :param series: 字符串 Series，例如 "1,234.56/RMB"
+    :return: (金额 float64 Series, 币种 category Series)，无法解析的为 NaN
+    """
+    pd, _ = _require_pandas()
+    parts = series.astype("string").str.extract(_AMOUNT_REGEX)
+    amount = pd.to_numeric(
+        parts["amount"].str.replace(",", "", regex=False), errors="coerce"
+    ).astype("float64")
+    currency = parts["currency"].str.upper().astype("category")
+    return amount, currency
+
+
+def _finish_frame(df):
+    """统一类型并补充 month 列"""
+    pd, _ = _require_pandas()
+    df["card_last4"] = df["card_last4"].astype("string")
+    df["trade_date"] = pd.to_datetime(df["trade_date"])
+    df["post_date"] = pd.to_datetime(df["post_date"])
+    df["trade_type"] = df["trade_type"].astype("category")
+    df["merchant"] = df["merchant"].astype("category")
+    # 旧版导出的数据没有 occurrence 列，读出为空值
+    if "occurrence" in df:
+        df["occurrence"] = df["occurrence"].fillna(0).astype("int32")
+    else:
+        df["occurrence"] = 0
+    df["month"] = df["trade_date"].dt.to_period("M")
+    return df
+
+
+def frame_from_rows(rows):
+    """
+    从 SQLProc.process_email_body 产出的 7 元组构建 DataFrame，
+    并把两个 "金额/币种" 文本列解析为数值列和币种列。
+    7 元组没有来源邮件和 occurrence，完全相同的行按重复交易处理。
+    """
+    pd, _ = _require_pandas()
+    df = pd.DataFrame.from_records(
+        list(rows), columns=[name for _, name in RAW_COLUMNS]
+    )
+    df["amount"], df["currency"] = split_amount(df.pop("amount_text"))
+    df["posted_amount"], df["posted_currency"] = split_amount(df.pop("posted_text"))
+    return _finish_frame(df)
+
+
+def frame_from_records(records):
+    """从 parsers.statement_parser.parse_statement 的类型化记录构建 DataFrame"""
+    pd, _ = _require_pandas()
+    df = pd.DataFrame.from_records(list(records))
+    for column in ("amount", "posted_amount"):
+        df[column] = pd.to_numeric(df[column], errors="coerce").astype("float64")
+    for column in ("currency", "posted_currency"):
+        df[column] = df[column].astype("category")
+    return _finish_frame(df)
+
+
+def frame_from_parquet(root, columns=None, filter=None):
+    """读取 analytics.parquet_export 导出的数据集"""
+    from analytics.parquet_export import load_transactions
+
+    df = load_transactions(root, columns=columns, filter=filter).to_pandas()
+    for column in ("amount", "posted_amount"):
+        if column in df:
+            df[column] = df[column].astype("float64")
+    return _finish_frame(df)
+
+
+def summarize(df, by=("card_last4", "month")):
+    """
+    按指定维度汇总记账金额（按记账币种分开统计）。
+
+    :return: DataFrame，列为 total / count / mean
+    """
+    keys = list(by) + ["posted_currency"]
+    summary = df.groupby(keys, observed=True, sort=True)["posted_amount"].agg(
+        total="sum", count="count", mean="mean"
+    )
+    return summary.round({"total": 2, "mean": 2})
+
+
+def top_merchants(df, n=20):
+    """按记账金额合计排序的前 n 个商户"""
+    return summarize(df, by=("merchant",)).sort_values("total", ascending=False).head(n)
+
+
+def add_running_balance(df):
+    """
+    按卡号、币种累计记账金额，返回按 (卡号, 记账日) 排序并带 running_balance 列的新 DataFrame。
+    """
+    ordered = df.sort_values(["card_last4", "post_date", "trade_date"], kind="stable")
+    ordered = ordered.copy()
+    ordered["running_balance"] = (
+        ordered.groupby(["card_last4", "posted_currency"], observed=True)[
+            "posted_amount"
+        ]
+        .cumsum()
+        .round(2)
+    )
+    return ordered
+
+
+def mark_duplicates(df):
+    """
+    标记自然键（含 occurrence）完全相同的交易，即同一账单被多封邮件重复发送；
+    同一账单内的相同消费 occurrence 不同，不算重复。
+
+    :return: 布尔 Series，重复出现的每一行（含第一次）都为 True
+    """
+    return df.duplicated(subset=NATURAL_KEY, keep=False)
+
+
+def monthly_report(df):
+    """
+    生成月度报表所需的全部汇总。
+
+    :return: {"by_card_month", "by_month", "top_merchants", "duplicates"}
+    """
+    duplicates = mark_duplicates(df)
+    unique = df[~df.duplicated(subset=NATURAL_KEY, keep="first")]
+    return {
+        "by_card_month": summarize(unique, by=("card_last4", "month")),
+        "by_month": summarize(unique, by=("month",)),
+        "top_merchants": top_merchants(unique),
+        "duplicates": df[duplicates],
+    }
@@ -0,0 +1,416 @@
+# ./server.py
+"""
+本地 HTTP/JSON 接口，供前端浏览邮件归档。只使用标准库 asyncio，不依赖 Web 框架。
+
+    GET /api/messages?sender=&since=&until=&tag=&cursor=&limit=   邮件列表（游标分页）
+    GET /api/search?q=&cursor=&limit=                             按主题/发件人搜索
+    GET /api/messages/<id>                                        单封邮件
+    GET /api/attachments/<id>                                     下载附件（分块流式发送）
+
+数据库查询在线程池中执行，共用同一个会话工厂（连接池）；
+JSON 响应带 ETag，客户端用 If-None-Match 重新请求时未变化的内容返回 304。
+ETag 是序列化后 JSON 的摘要：邮件的标记、标签等会原地修改，没有可以廉价比较的版本号，
+因此 304 仍然要执行完整的查询和序列化，节省的只是传输和客户端的重新渲染。
+
+只支持 GET / HEAD，不读取请求体；带请求体的请求返回响应后关闭连接，
+避免未读取的请求体被当作下一个请求解析。
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sys
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+from email.utils import formatdate
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.db_operations import get_email, query_emails
+from database.models import ATTACHMENT_DOWNLOADED, Attachment
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+MAX_HEADER_BYTES = 16 * 1024
+KEEP_ALIVE_TIMEOUT = 15  # 空闲连接保持秒数
+
+REASONS = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message=None, headers=None):
+        super().__init__(message or REASONS.get(status, ""))
+        self.status = status
+        self.message = message or REASONS.get(status, "")
+        self.headers = headers or {}
+
+
+@dataclass
+class Response:
+    status: int = 200
+    body: bytes = b""
+    headers: dict = field(default_factory=dict)
+    file_path: str = None  # 非空时从文件分块发送
+    file_size: int = 0
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, Decimal)):
+        return str(value)
+    raise TypeError(f"无法序列化 {type(value).__name__}")
+
+
+def json_response(data):
+    """生成 JSON 响应，ETag 取内容摘要（需要先完成查询和序列化，见模块说明）"""
+    body = json.dumps(data, ensure_ascii=False, default=_json_default).encode("utf-8")
+    return Response(
+        body=body,
+        headers={
+            "Content-Type": "application/json; charset=utf-8",
+            "ETag": f'W/"{hashlib.sha1(body).hexdigest()[:20]}"',
+            "Cache-Control": "no-cache",
+        },
+    )
+
+
+def _loads_list(text):
+    try:
+        return json.loads(text or "[]")
+    except ValueError:
+        return []
+
+
+def email_summary(email):
+    return {
+        "id": email.uuid,
+        "sender": email.sender,
+        "recipients": _loads_list(email.recipients),
+        "subject": email.subject,
+        "sent_at": email.sent_at,
+        "tags": _loads_list(email.tags),
+        "flags": _loads_list(email.flags),
+        "expunged": email.expunged_at is not None,
+        "account": email.account,
+        "folder": email.folder,
+    }
+
+
+def email_detail(email):
+    detail = email_summary(email)
+    detail.update(
+        {
+            "cc": _loads_list(email.cc),
+            "message_id": email.message_id,
+            "text_content": email.text_content,
+            "html_content": email.html_content,
+            "attachments": [
+                {
+                    "id": attachment.id,
+                    "filename": attachment.filename,
+                    "content_type": attachment.content_type,
+                    "size": attachment.size,
+                    "status": attachment.status,
+                }
+                for attachment in email.attachments
+            ],
+        }
+    )
+    return detail
+
+
+def _param(params, name, default=None):
+    values = params.get(name)
+    return values[0] if values else default
+
+
+def _datetime_param(params, name):
+    value = _param(params, name)
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPError(400, f"参数 {name} 不是有效的 ISO 时间: {value}")
+
+
+def _limit_param(params):
+    try:
+        limit = int(_param(params, "limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise HTTPError(400, "参数 limit 必须是整数")
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _has_body(headers):
+    """请求是否带有请求体（服务器不读取请求体，这类连接不能复用）"""
+    if "transfer-encoding" in headers:
+        return True
+    try:
+        return int(headers.get("content-length") or 0) > 0
+    except ValueError:
+        return True
+
+
+def _etag_list(header):
+    if not header:
+        return set()
+    return {tag.strip() for tag in header.split(",")}
+
+
+class MailArchiveServer:
+    """
+    邮件归档浏览服务。
+
+    :param session_factory: SQLAlchemy 会话工厂，所有请求共用其连接池
+    :param archive: 冷存档库（database.archive.BodyArchive），已归档的正文从这里读取
+    """
+
+    def __init__(self, session_factory, host="127.0.0.1", port=8000, archive=None):
+        self.session_factory = session_factory
+        self.archive = archive
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, limit=MAX_HEADER_BYTES
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"邮件归档接口已启动: http://{self.host}:{self.port}/api/messages")
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    # ---- 连接与协议 ----
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(
+                        self._read_request(reader), KEEP_ALIVE_TIMEOUT
+                    )
+                except asyncio.TimeoutError:
+                    break
+                if request is None:
+                    break
+                method, target, version, headers = request
+                try:
+                    response = await self._dispatch(method, target, headers)
+                except HTTPError as e:
+                    response = json_response({"error": e.message})
+                    response.status = e.status
+                    response.headers.update(e.headers)
+                except Exception as e:
+                    logger.error(f"处理请求 {method} {target} 失败: {e}", exc_info=True)
+                    response = json_response({"error": "内部错误"})
+                    response.status = 500
+
+                keep_alive = (
+                    version == "HTTP/1.1"
+                    and headers.get("connection", "").lower() != "close"
+                    and not _has_body(headers)
+                )
+                await self._send(writer, method, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.LimitOverrunError:
+            response = json_response({"error": REASONS[431]})
+            response.status = 431
+            await self._send(writer, "GET", response, False)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(self, reader):
+        """读取请求行和请求头；连接关闭时返回 None。GET 请求不读取请求体。"""
+        raw = await reader.readuntil(b"\r\n\r\n")
+        lines = raw.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ", 2)
+        except ValueError:
+            return None
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        return method.upper(), target, version.strip(), headers
+
+    async def _send(self, writer, method, response, keep_alive):
+        if response.file_path is None:
+            length = len(response.body)
+        else:
+            length = response.file_size
+        head = [f"HTTP/1.1 {response.status} {REASONS.get(response.status, '')}"]
+        headers = {
+            "Date": formatdate(usegmt=True),
+            "Content-Length": str(length if response.status != 304 else 0),
+            "Connection": "keep-alive" if keep_alive else "close",
+            **response.headers,
+        }
+        head.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+
+        if method == "HEAD" or response.status == 304:
+            await writer.drain()
+        elif response.file_path is None:
+            writer.write(response.body)
+            await writer.drain()
+        else:
+            await self._stream_file(writer, response.file_path)
+
+    async def _stream_file(self, writer, path):
+        """分块读取文件并发送，每块等待发送缓冲区排空，内存占用与文件大小无关"""
+        with open(path, "rb") as f:
+            while True:
+                chunk = await asyncio.to_thread(f.read, CHUNK_SIZE)
+                if not chunk:
+                    break
+                writer.write(chunk)
+                await writer.drain()
+
+    # ---- 路由 ----
+
+    async def _dispatch(self, method, target, headers):
+        if method not in ("GET", "HEAD"):
+            raise HTTPError(405, headers={"Allow": "GET, HEAD"})
+        url = urlsplit(target)
+        params = parse_qs(url.query)
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+
+        if parts == ["api", "messages"]:
+            handler, args = self._list_messages, (params,)
+        elif parts == ["api", "search"]:
+            handler, args = self._search, (params,)
+        elif len(parts) == 3 and parts[:2] == ["api", "messages"]:
+            handler, args = self._get_message, (parts[2],)
+        elif len(parts) == 3 and parts[:2] == ["api", "attachments"]:
+            handler, args = self._get_attachment, (parts[2],)
+        else:
+            raise HTTPError(404)
+
+        response = await asyncio.to_thread(self._with_session, handler, *args)
+        etag = response.headers.get("ETag")
+        if etag and etag in _etag_list(headers.get("if-none-match")):
+            return Response(status=304, headers={"ETag": etag})
+        return response
+
+    def _with_session(self, handler, *args):
+        """在工作线程中执行处理函数，会话用完立即归还连接"""
+        session = self.session_factory()
+        try:
+            return handler(session, *args)
+        finally:
+            session.close()
+
+    def _page(self, session, params, **filters):
+        try:
+            emails, next_cursor = query_emails(
+                session,
+                cursor=_param(params, "cursor"),
+                limit=_limit_param(params),
+                **filters,
+            )
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        return json_response(
+            {
+                "items": [email_summary(email) for email in emails],
+                "next_cursor": next_cursor,
+            }
+        )
+
+    def _list_messages(self, session, params):
+        return self._page(
+            session,
+            params,
+            sender=_param(params, "sender"),
+            since=_datetime_param(params, "since"),
+            until=_datetime_param(params, "until"),
+            tag=_param(params, "tag"),
+        )
+
+    def _search(self, session, params):
+        keyword = _param(params, "q", "").strip()
+        if not keyword:
+            raise HTTPError(400, "缺少搜索关键词 q")
+        return self._page(session, params, search=keyword)
+
+    def _get_message(self, session, email_uuid):
+        try:
+            email_uuid = uuid.UUID(email_uuid)
+        except ValueError:
+            raise HTTPError(404)
+        email = get_email(session, email_uuid, archive=self.archive)
+        if email is None:
+            raise HTTPError(404)
+        return json_response(email_detail(email))
+
+    def _get_attachment(self, session, attachment_id):
+        if not attachment_id.isdigit():
+            raise HTTPError(404)
+        attachment = session.get(Attachment, int(attachment_id))
+        if (
+            attachment is None
+            or attachment.status != ATTACHMENT_DOWNLOADED
+            or not attachment.filepath
+            or not os.path.isfile(attachment.filepath)
+        ):
+            raise HTTPError(404, "附件不存在或尚未下载")
+
+        stat = os.stat(attachment.filepath)
+        return Response(
+            headers={
+                "Content-Type": attachment.content_type or "application/octet-stream",
+                "Content-Disposition": (
+                    f"attachment; filename*=UTF-8''{quote(attachment.filename)}"
+                ),
+                "ETag": f'"{attachment.id:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}"',
+                "Cache-Control": "private, max-age=3600",
+            },
+            file_path=attachment.filepath,
+            file_size=stat.st_size,
+        )
+
+
+def run_server(session_factory, host="127.0.0.1", port=8000, archive=None):
+    """阻塞运行服务，Ctrl+C 退出"""
+    server = MailArchiveServer(session_factory, host, port, archive=archive)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        logger.info("邮件归档接口已停止")
@@ -0,0 +1,161 @@
+# ./archive.py
+"""
+邮件正文冷存档库。
+
+超过保留期的邮件，其正文和邮件头（text_content / html_content / headers）压缩后
+移入单独的 SQLite 文件，主库只保留元数据，体积小到可以常驻页缓存。
+压缩优先使用 zstandard（可选依赖），未安装时使用标准库 zlib；每个压缩块的首字节
+记录算法，两种格式可以混存。
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+import zlib
+
+logger = logging.getLogger(__name__)
+
+CODEC_ZLIB = b"z"
+CODEC_ZSTD = b"Z"
+ZSTD_LEVEL = 10  # 冷数据写一次读很少，用较高的压缩级别
+ZLIB_LEVEL = 9
+
+BODY_FIELDS = ("text_content", "html_content", "headers")
+
+_ARCHIVES = {}
+_LOCK = threading.Lock()
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def compress_body(data):
+    """压缩字节串，返回带算法标记的压缩块"""
+    zstandard = _zstd()
+    if zstandard is not None:
+        return CODEC_ZSTD + zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return CODEC_ZLIB + zlib.compress(data, ZLIB_LEVEL)
+
+
+def decompress_body(blob):
+    """解压 compress_body 生成的压缩块"""
+    codec, payload = blob[:1], blob[1:]
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(payload)
+    if codec == CODEC_ZSTD:
+        zstandard = _zstd()
+        if zstandard is None:
+            raise ImportError(
+                "读取 zstd 压缩的存档需要安装 zstandard：pip install zstandard"
+            )
+        return zstandard.ZstdDecompressor().decompress(payload)
+    raise ValueError(f"未知的压缩格式: {codec!r}")
+
+
+class BodyArchive:
+    """
+    冷存档库：以邮件 uuid（16 字节）为键保存压缩后的正文和邮件头。
+    线程安全，可在采集线程和查询接口之间共享。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS archived_bodies (
+                    email_uuid BLOB PRIMARY KEY,
+                    body BLOB NOT NULL,
+                    raw_size INTEGER NOT NULL,
+                    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn.commit()
+
+    def store(self, items):
+        """
+        写入存档并提交。同一邮件重复写入时覆盖，因此中断后重新归档是安全的。
+
+        :param items: [(uuid.UUID, {"text_content", "html_content", "headers"})]
+        :return: (原始字节数, 压缩后字节数)
+        """
+        rows = []
+        raw_total = compressed_total = 0
+        for email_uuid, fields in items:
+            raw = json.dumps(
+                {name: fields.get(name) for name in BODY_FIELDS}, ensure_ascii=False
+            ).encode("utf-8")
+            blob = compress_body(raw)
+            rows.append((email_uuid.bytes, blob, len(raw)))
+            raw_total += len(raw)
+            compressed_total += len(blob)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO archived_bodies (email_uuid, body, raw_size) "
+                "VALUES (?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+        return raw_total, compressed_total
+
+    def load_many(self, uuids):
+        """
+        批量读取并解压。
+
+        :return: {uuid.UUID: {"text_content", "html_content", "headers"}}，不存在的不返回
+        """
+        keys = [email_uuid.bytes for email_uuid in uuids]
+        result = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                result.update(
+                    self._conn.execute(
+                        "SELECT email_uuid, body FROM archived_bodies "
+                        f"WHERE email_uuid IN ({placeholders})",
+                        chunk,
+                    ).fetchall()
+                )
+        return {
+            uuid.UUID(bytes=key): json.loads(decompress_body(blob))
+            for key, blob in result.items()
+        }
+
+    def load(self, email_uuid):
+        """读取单封邮件的存档，不存在时返回 None"""
+        return self.load_many([email_uuid]).get(email_uuid)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def get_body_archive(path):
+    """按路径缓存的存档库实例"""
+    path = os.path.abspath(path)
+    with _LOCK:
+        archive = _ARCHIVES.get(path)
+        if archive is None:
+            archive = _ARCHIVES[path] = BodyArchive(path)
+        return archive
+
+
+def close_archives():
+    with _LOCK:
+        for archive in _ARCHIVES.values():
+            archive.close()
+        _ARCHIVES.clear()
@@ -1,39 +1,154 @@
 import logging
 import os
 import sys
+import threading
+from contextlib import contextmanager
 
 # 动态添加项目根目录到 sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
 
-from database.models import Attachment, Base, Email
-from utils.logger import setup_logger  # 引入日志配置函数
+from database.migrations import upgrade
+from database.models import Attachment, Email
 
-# 将项目根目录添加到 Python 路径
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-# 初始化日志记录器
-logger = setup_logger(log_level=logging.INFO, log_file="./logs/db_init.log")
+# 模块级只获取记录器，日志处理器由调用方（main.py 或 __main__）负责配置
+logger = logging.getLogger(__name__)
+
+# 连接池参数：PostgreSQL 按并发采集线程数估算；SQLite 写入本身串行，连接池保持较小
+POSTGRES_POOL_OPTIONS = {
+    "pool_size": 10,
+    "max_overflow": 20,
+    "pool_timeout": 30,
+    "pool_recycle": 1800,  # 秒，避免使用被服务器断开的空闲连接
+    "pool_pre_ping": True,
+}
+SQLITE_POOL_OPTIONS = {"pool_size": 5, "max_overflow": 10, "pool_timeout": 30}
+
+# 按 URL 缓存的引擎和会话工厂
+_ENGINES = {}
+_SESSION_FACTORIES = {}
+_LOCK = threading.Lock()
+
+# 每个 SQLite 连接建立时执行的 PRAGMA
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",  # 读写互不阻塞，适合采集线程与查询接口并发
+    "PRAGMA synchronous=NORMAL",  # WAL 模式下足够安全，显著减少 fsync
+    "PRAGMA busy_timeout=30000",  # 写锁冲突时等待而不是立即报错
+    "PRAGMA cache_size=-65536",  # 64 MB 页缓存
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",  # 256 MB 内存映射读
+)
+
+
+def _is_sqlite_memory(url):
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+def _create_engine(db_url):
+    """按数据库类型设置连接池参数创建引擎"""
+    url = make_url(db_url)
+    backend = url.get_backend_name()
+    if backend == "sqlite":
+        if _is_sqlite_memory(url):
+            # 内存数据库每个引擎各自独立，使用 SQLAlchemy 默认的连接池
+            return create_engine(db_url)
+        engine = create_engine(
+            db_url,
+            connect_args={"check_same_thread": False, "timeout": 30},
+            **SQLITE_POOL_OPTIONS,
+        )
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
+        return engine
+    if backend == "postgresql":
+        return create_engine(db_url, **POSTGRES_POOL_OPTIONS)
+    return create_engine(db_url, pool_pre_ping=True)
+
+
+def get_engine(db_url):
+    """
+    获取数据库引擎：同一 URL 在进程内只创建一次并共享连接池，首次创建时把表结构升级到最新版本。
+    SQLite 内存数据库（sqlite://）每次调用都返回新的独立引擎。
+    """
+    if _is_sqlite_memory(make_url(db_url)):
+        engine = _create_engine(db_url)
+        upgrade(engine)
+        return engine
+
+    with _LOCK:
+        engine = _ENGINES.get(db_url)
+        if engine is None:
+            engine = _create_engine(db_url)
+            upgrade(engine)
+            _ENGINES[db_url] = engine
+            logger.info(f"Database ready at URL: {make_url(db_url).render_as_string()}")
+        return engine
+
+
+def create_session_factory(db_url):
+    """
+    返回绑定到共享引擎的会话工厂（同一 URL 返回同一个工厂）。
+    调用方用完会话后必须 close()，或者使用 session_scope() 自动提交/回滚并归还连接。
+    """
+    if _is_sqlite_memory(make_url(db_url)):
+        return sessionmaker(bind=get_engine(db_url))
+
+    engine = get_engine(db_url)
+    with _LOCK:
+        factory = _SESSION_FACTORIES.get(db_url)
+        if factory is None:
+            factory = _SESSION_FACTORIES[db_url] = sessionmaker(bind=engine)
+        return factory
+
+
+@contextmanager
+def session_scope(session_factory):
+    """
+    会话生命周期：正常结束时提交，异常时回滚，最后总是关闭并归还连接。
+
+    :param session_factory: create_session_factory 的返回值
+    """
+    session = session_factory()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def dispose_engines():
+    """释放所有缓存引擎的连接（测试结束或进程退出前调用）"""
+    with _LOCK:
+        for engine in _ENGINES.values():
+            engine.dispose()
+        _SESSION_FACTORIES.clear()
+        _ENGINES.clear()
 
 
 def initialize_database(db_url):
     """
     初始化数据库，包括表的创建和示例数据的插入。
     """
+    session = None
     try:
         logger.info("Starting database initialization...")
 
-        # 创建数据库引擎
-        engine = create_engine(db_url)
-        logger.info(f"Database engine created with URL: {db_url}")
-
-        # 创建所有表
-        Base.metadata.create_all(engine)
-        logger.info("All tables created successfully.")
-
-        # 创建会话工厂
-        Session = sessionmaker(bind=engine)
+        # 获取共享的数据库引擎（首次获取时创建所有表）
+        Session = create_session_factory(db_url)
         session = Session()
         logger.info("Database session initialized.")
 
@@ -46,6 +161,8 @@ def initialize_database(db_url):
         )
         raise
     finally:
+        if session is not None:
+            session.close()
         logger.info("Database initialization completed.")
 
 
@@ -92,6 +209,11 @@ def insert_sample_data(session):
 
 
 if __name__ == "__main__":
+    from utils.logger import setup_logger  # 引入日志配置函数
+
+    # 初始化日志记录器
+    setup_logger(log_level=logging.INFO, log_file="./logs/db_init.log")
+
     # 数据库URL（根据实际数据库类型和配置修改）
     DATABASE_URL = "sqlite:///./database.db"  # 使用 SQLite 作为示例
 
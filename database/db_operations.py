@@ -0,0 +1,757 @@
+# ./db_operations.py
+import base64
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+
+from sqlalchemy import func, or_, select, tuple_
+from sqlalchemy.orm import defer, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.archive import BODY_FIELDS
+from database.models import (
+    ATTACHMENT_DOWNLOADED,
+    ATTACHMENT_FAILED,
+    ATTACHMENT_QUEUED,
+    Attachment,
+    Email,
+    EmailTag,
+    ExportState,
+    ImportedFile,
+    ImportState,
+    SyncState,
+    Transaction,
+)
+from parsers.attachment import save_attachment
+from parsers.statement_parser import parse_statement
+
+# 附件下载失败超过该次数后不再重试
+MAX_ATTACHMENT_ATTEMPTS = 3
+
+logger = logging.getLogger(__name__)
+
+
+def get_sync_state(session, account, folder):
+    """
+    获取账户/文件夹的同步状态，不存在时创建一条新记录。
+    """
+    state = (
+        session.query(SyncState)
+        .filter(SyncState.account == account, SyncState.folder == folder)
+        .one_or_none()
+    )
+    if state is None:
+        state = SyncState(account=account, folder=folder, last_uid=0)
+        session.add(state)
+        session.flush()
+    return state
+
+
+def get_import_state(session, source):
+    """
+    获取本地归档的导入进度，不存在时创建一条新记录。
+    """
+    state = (
+        session.query(ImportState).filter(ImportState.source == source).one_or_none()
+    )
+    if state is None:
+        state = ImportState(source=source, position=0, imported=0)
+        session.add(state)
+        session.flush()
+    return state
+
+
+def get_export_state(session, target):
+    """
+    获取交易导出目录的导出进度，不存在时创建一条新记录。
+    """
+    state = (
+        session.query(ExportState).filter(ExportState.target == target).one_or_none()
+    )
+    if state is None:
+        state = ExportState(target=target, last_id=0, exported=0)
+        session.add(state)
+        session.flush()
+    return state
+
+
+def imported_keys(session, source):
+    """本地归档中已导入的文件键（Maildir 唯一名）集合"""
+    return {
+        key
+        for (key,) in session.query(ImportedFile.key).filter(
+            ImportedFile.source == source
+        )
+    }
+
+
+def record_imported_key(session, source, key):
+    """记录一个已导入的文件键。不提交事务"""
+    session.add(ImportedFile(source=source, key=key))
+
+
+def clear_imported_keys(session, source):
+    """清空归档的已导入文件记录（从头重新导入时）。不提交事务"""
+    session.query(ImportedFile).filter(ImportedFile.source == source).delete(
+        synchronize_session=False
+    )
+
+
+def reset_uidvalidity(session, state, uidvalidity):
+    """
+    服务器的 UIDVALIDITY 变化后，旧 UID 全部失效：清空该文件夹已入库邮件的 UID，
+    并从头开始同步（重新入库时按 Message-ID 找回原记录）。
+    """
+    if state.uidvalidity is not None and state.uidvalidity != uidvalidity:
+        logger.warning(
+            f"{state.account}/{state.folder} 的 UIDVALIDITY 由 {state.uidvalidity} "
+            f"变为 {uidvalidity}，重新同步"
+        )
+        session.query(Email).filter(
+            Email.account == state.account, Email.folder == state.folder
+        ).update({Email.uid: None}, synchronize_session=False)
+        state.last_uid = 0
+        state.highestmodseq = None
+        state.unstored = None
+    state.uidvalidity = uidvalidity
+
+
+def folder_uids(session, account, folder, unsynced_only=False):
+    """
+    本地保存的、服务器上尚未删除的邮件 UID（升序）。
+
+    :param unsynced_only: 只返回还没有同步过标记的邮件
+    """
+    query = session.query(Email.uid).filter(
+        Email.account == account,
+        Email.folder == folder,
+        Email.uid.isnot(None),
+        Email.expunged_at.is_(None),
+    )
+    if unsynced_only:
+        query = query.filter(Email.flags.is_(None))
+    return [uid for (uid,) in query.order_by(Email.uid)]
+
+
+def count_folder_emails(session, account, folder):
+    """与 folder_uids 条件相同的邮件数，只执行 COUNT(*)"""
+    return (
+        session.query(func.count(Email.id))
+        .filter(
+            Email.account == account,
+            Email.folder == folder,
+            Email.uid.isnot(None),
+            Email.expunged_at.is_(None),
+        )
+        .scalar()
+    )
+
+
+def update_flags(session, account, folder, flags_by_uid, chunk_size=500):
+    """
+    写入服务器上的标记。不提交事务。
+
+    :param flags_by_uid: {uid: 标记集合}
+    :return: 标记实际发生变化的邮件数
+    """
+    changed = 0
+    uids = sorted(flags_by_uid)
+    for start in range(0, len(uids), chunk_size):
+        chunk = uids[start : start + chunk_size]
+        emails = session.query(Email).filter(
+            Email.account == account, Email.folder == folder, Email.uid.in_(chunk)
+        )
+        for email in emails:
+            flags = json.dumps(sorted(flags_by_uid[email.uid]))
+            if email.flags != flags:
+                email.flags = flags
+                changed += 1
+    return changed
+
+
+def mark_expunged(session, account, folder, uids, chunk_size=500):
+    """
+    记录服务器上已删除的邮件（保留本地内容）。不提交事务。
+
+    :return: 新标记为已删除的邮件数
+    """
+    uids = sorted(uids)
+    now = datetime.now(timezone.utc)
+    marked = 0
+    for start in range(0, len(uids), chunk_size):
+        marked += (
+            session.query(Email)
+            .filter(
+                Email.account == account,
+                Email.folder == folder,
+                Email.uid.in_(uids[start : start + chunk_size]),
+                Email.expunged_at.is_(None),
+            )
+            .update({Email.expunged_at: now}, synchronize_session=False)
+        )
+    return marked
+
+
+def save_email(
+    session,
+    parsed,
+    account=None,
+    folder=None,
+    uid=None,
+    attachments_dir=None,
+    policy=None,
+):
+    """
+    保存解析后的邮件（parsers.eml_parser.parse_email_bytes 的返回值）。
+    同一账户/文件夹/UID 已存在时跳过，不提交事务，由调用方控制提交时机。
+
+    附件总是记录元信息；已有内容（payload）且符合附件策略 policy 的附件直接保存到
+    attachments_dir，其余的进入下载队列（status=queued），见 record_attachment。
+
+    没有 UID 的邮件（本地归档导入）按账户/文件夹/Message-ID 去重，
+    归档被替换或从头重新导入时不会重复入库。
+
+    :return: Email 对象；已存在时返回 None
+    """
+    if uid is None and parsed.get("message_id"):
+        exists = (
+            session.query(Email.id)
+            .filter(
+                Email.account == account,
+                Email.folder == folder,
+                Email.message_id == parsed["message_id"],
+            )
+            .first()
+        )
+        if exists:
+            logger.debug(f"邮件 {parsed['message_id']} 已存在，跳过保存")
+            return None
+
+    if uid is not None:
+        exists = (
+            session.query(Email.id)
+            .filter(Email.account == account, Email.folder == folder, Email.uid == uid)
+            .first()
+        )
+        if exists:
+            logger.info(f"邮件 {account}/{folder} UID {uid} 已存在，跳过保存")
+            return None
+
+        # UIDVALIDITY 变化后按 Message-ID 找回原记录，只更新 UID
+        if parsed.get("message_id"):
+            orphan = (
+                session.query(Email)
+                .filter(
+                    Email.account == account,
+                    Email.folder == folder,
+                    Email.uid.is_(None),
+                    Email.message_id == parsed["message_id"],
+                )
+                .first()
+            )
+            if orphan is not None:
+                orphan.uid = uid
+                return orphan
+
+    email = Email(
+        account=account,
+        folder=folder,
+        uid=uid,
+        message_id=parsed.get("message_id"),
+        sender=parsed.get("sender") or "",
+        recipients=json.dumps(parsed.get("recipients", []), ensure_ascii=False),
+        cc=json.dumps(parsed.get("cc", []), ensure_ascii=False),
+        bcc=json.dumps(parsed.get("bcc", []), ensure_ascii=False),
+        subject=parsed.get("subject") or "",
+        text_content=parsed.get("text_content"),
+        html_content=parsed.get("html_content"),
+        headers=json.dumps(parsed.get("headers", {}), ensure_ascii=False),
+    )
+    if parsed.get("sent_at") is not None:
+        email.sent_at = parsed["sent_at"]
+    session.add(email)
+
+    if parsed.get("attachments"):
+        session.flush()  # 分配 email.uuid，附件目录以此命名
+        for item in parsed["attachments"]:
+            record_attachment(session, email, item, attachments_dir, policy)
+    return email
+
+
+def record_attachment(session, email, item, attachments_dir=None, policy=None):
+    """
+    记录一个附件：内容已下载且符合附件策略时直接保存文件，否则加入下载队列。
+
+    :param policy: parsers.attachment.AttachmentPolicy，为 None 时保存所有已下载的内容
+    """
+    attachment = Attachment(
+        email_id=email.id,
+        filename=item.get("filename") or "unnamed",
+        content_type=item.get("content_type"),
+        size=item.get("size"),
+        section=item.get("section"),
+        encoding=item.get("encoding"),
+        status=ATTACHMENT_QUEUED,
+    )
+    payload = item.get("payload")
+    if policy is not None and not policy.allows(
+        attachment.content_type, attachment.size
+    ):
+        payload = None
+    if payload is not None and attachments_dir:
+        path = save_attachment(
+            payload, os.path.join(attachments_dir, str(email.uuid)), attachment.filename
+        )
+        mark_attachment_downloaded(attachment, path, len(payload))
+    session.add(attachment)
+    return attachment
+
+
+def mark_attachment_downloaded(attachment, path, size=None):
+    attachment.filepath = path
+    attachment.status = ATTACHMENT_DOWNLOADED
+    attachment.downloaded_at = datetime.now(timezone.utc)
+    attachment.error = None
+    if size is not None:
+        attachment.size = size
+
+
+def mark_attachment_failed(attachment, error):
+    """记录一次下载失败，超过重试次数后标记为 failed"""
+    attachment.attempts = (attachment.attempts or 0) + 1
+    attachment.error = str(error)
+    if attachment.attempts >= MAX_ATTACHMENT_ATTEMPTS:
+        attachment.status = ATTACHMENT_FAILED
+
+
+def get_queued_attachments(session, account=None, limit=100):
+    """
+    取出等待下载的附件（小附件优先），返回 [(Attachment, Email)]。
+    """
+    query = (
+        session.query(Attachment, Email)
+        .join(Email, Attachment.email_id == Email.id)
+        .filter(
+            Attachment.status == ATTACHMENT_QUEUED,
+            Attachment.section.isnot(None),
+            Email.uid.isnot(None),
+        )
+    )
+    if account is not None:
+        query = query.filter(Email.account == account)
+    return query.order_by(Attachment.size, Attachment.id).limit(limit).all()
+
+
+def iter_email_bodies(session, batch_size=500, archive=None):
+    """
+    逐批读取邮件正文，产出 (邮件 uuid, text_content)，不会一次性加载全部邮件。
+    指定 archive（database.archive.BodyArchive）时，已归档邮件的正文从冷存档库读取。
+    """
+    condition = Email.text_content.isnot(None)
+    if archive is not None:
+        condition = or_(condition, Email.archived_at.isnot(None))
+    result = session.execute(
+        select(Email.uuid, Email.text_content, Email.archived_at)
+        .where(condition)
+        .order_by(Email.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for partition in result.partitions():
+        archived = {}
+        if archive is not None:
+            archived = archive.load_many(
+                [email_uuid for email_uuid, _, archived_at in partition if archived_at]
+            )
+        for email_uuid, text_content, archived_at in partition:
+            if archived_at is not None:
+                text_content = archived.get(email_uuid, {}).get("text_content")
+                if text_content is None:
+                    continue
+            yield email_uuid, text_content
+
+
+def transaction_records(session, after_id=0, limit=1000):
+    """
+    按 id 顺序读取 after_id 之后的至多 limit 条交易，转换为 parse_statement 的记录格式
+    （另含 id），source_email_id 为来源邮件的 uuid。只读取交易表，不解析正文。
+    """
+    rows = (
+        session.query(
+            Transaction.id,
+            Transaction.card_last4,
+            Transaction.trade_date,
+            Transaction.post_date,
+            Transaction.trade_type,
+            Transaction.merchant,
+            Transaction.amount,
+            Transaction.currency,
+            Transaction.posted_amount,
+            Transaction.posted_currency,
+            Transaction.occurrence,
+            Email.uuid,
+        )
+        .outerjoin(Email, Transaction.email_id == Email.id)
+        .filter(Transaction.id > after_id)
+        .order_by(Transaction.id)
+        .limit(limit)
+    )
+    records = []
+    for row in rows:
+        record = row._asdict()
+        email_uuid = record.pop("uuid")
+        record["source_email_id"] = str(email_uuid) if email_uuid is not None else None
+        records.append(record)
+    return records
+
+
+# 交易自然键（与 uq_transactions_natural_key 一致）
+TRANSACTION_KEY = (
+    "card_last4",
+    "trade_date",
+    "post_date",
+    "trade_type",
+    "merchant",
+    "amount",
+    "currency",
+    "occurrence",
+)
+
+
+def _dialect_insert(session):
+    """返回支持 ON CONFLICT 的 insert 构造函数，其他数据库返回 None"""
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert
+
+
+def _transaction_rows(records, email_id):
+    """把 parse_statement 的记录转换为表行（occurrence 由 parse_statement 编号）"""
+    rows = []
+    for record in records:
+        if record.get("amount") is None or record.get("currency") is None:
+            continue
+        rows.append(
+            {
+                "email_id": email_id,
+                "card_last4": record["card_last4"],
+                "trade_date": record["trade_date"],
+                "post_date": record["post_date"],
+                "trade_type": record["trade_type"],
+                "merchant": record["merchant"],
+                "amount": record["amount"],
+                "currency": record["currency"],
+                "posted_amount": record.get("posted_amount"),
+                "posted_currency": record.get("posted_currency"),
+                "occurrence": record.get("occurrence", 0),
+            }
+        )
+    return rows
+
+
+def upsert_transactions(session, records, email_id=None):
+    """
+    按自然键写入交易记录：已存在时只更新记账金额/币种，因此重复提取是幂等的。
+    不提交事务。
+
+    :param records: parsers.statement_parser.parse_statement 的返回值
+    :param email_id: 来源邮件 ID
+    :return: 写入（插入或更新）的行数
+    """
+    rows = _transaction_rows(records, email_id)
+    if not rows:
+        return 0
+
+    insert = _dialect_insert(session)
+    if insert is not None:
+        stmt = insert(Transaction).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(TRANSACTION_KEY),
+            set_={
+                "posted_amount": stmt.excluded.posted_amount,
+                "posted_currency": stmt.excluded.posted_currency,
+                "updated_at": datetime.now(timezone.utc),
+            },
+        )
+        session.execute(stmt)
+        return len(rows)
+
+    # 不支持 ON CONFLICT 的数据库：逐条查找后插入或更新
+    for row in rows:
+        existing = (
+            session.query(Transaction)
+            .filter_by(**{name: row[name] for name in TRANSACTION_KEY})
+            .one_or_none()
+        )
+        if existing is None:
+            session.add(Transaction(**row))
+        else:
+            existing.posted_amount = row["posted_amount"]
+            existing.posted_currency = row["posted_currency"]
+    session.flush()
+    return len(rows)
+
+
+def extract_transactions(session, batch_size=500, force=False, archive=None):
+    """
+    从尚未提取过的邮件中提取账单交易并写入 transactions 表，每批提交一次。
+    已提取的邮件记录 extracted_at，再次运行时不会重新扫描。
+    指定 archive（database.archive.BodyArchive）时，已归档邮件的正文从冷存档库读取；
+    未指定时跳过已归档的邮件且不记录 extracted_at，之后指定 archive 再运行即可补提取。
+
+    :param force: 为 True 时忽略 extracted_at，重新扫描全部邮件
+    :return: (处理的邮件数, 写入的交易数)
+    """
+    if force:
+        session.query(Email).update(
+            {Email.extracted_at: None}, synchronize_session=False
+        )
+        session.commit()
+
+    emails = rows = skipped = 0
+    last_id = None
+    while True:
+        query = session.query(
+            Email.id, Email.uuid, Email.text_content, Email.archived_at
+        ).filter(Email.extracted_at.is_(None))
+        if last_id is not None:
+            query = query.filter(Email.id > last_id)
+        batch = query.order_by(Email.id).limit(batch_size).all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        archived = {}
+        if archive is not None:
+            archived = archive.load_many(
+                [row.uuid for row in batch if row.archived_at is not None]
+            )
+        extracted = []
+        for row in batch:
+            body = row.text_content
+            if row.archived_at is not None:
+                if row.uuid not in archived:
+                    skipped += 1
+                    continue
+                body = archived[row.uuid].get("text_content")
+            rows += upsert_transactions(
+                session, parse_statement(body, source_email_id=row.id), row.id
+            )
+            extracted.append(row.id)
+        if extracted:
+            session.query(Email).filter(Email.id.in_(extracted)).update(
+                {Email.extracted_at: datetime.now(timezone.utc)},
+                synchronize_session=False,
+            )
+        session.commit()
+        emails += len(extracted)
+        logger.info(f"已提取 {emails} 封邮件，写入 {rows} 条交易")
+    if skipped:
+        logger.warning(f"{skipped} 封已归档邮件未能读取正文，暂不提取")
+    return emails, rows
+
+
+def set_email_tags(session, email, tags):
+    """
+    设置邮件标签，同时更新 emails.tags（JSON）和 email_tags 表。不提交事务。
+    """
+    tags = sorted({tag.strip() for tag in tags if tag and tag.strip()})
+    email.tags = json.dumps(tags, ensure_ascii=False)
+    email.tag_rows = [EmailTag(tag=tag) for tag in tags]
+    session.flush()
+    return tags
+
+
+def add_tags_by_message_id(session, message_id, tags):
+    """
+    给 Message-ID 相同的所有邮件追加标签（保留原有标签）。不提交事务。
+
+    :return: 更新的邮件数
+    """
+    emails = (
+        session.query(Email)
+        .options(selectinload(Email.tag_rows))
+        .filter(Email.message_id == message_id)
+        .all()
+    )
+    for email in emails:
+        set_email_tags(session, email, json.loads(email.tags or "[]") + list(tags))
+    return len(emails)
+
+
+def encode_cursor(sent_at, email_id):
+    """把分页位置 (sent_at, id) 编码为 URL 安全的字符串"""
+    raw = f"{sent_at.isoformat()}|{email_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    解析 encode_cursor 生成的字符串。
+
+    :raises ValueError: 游标格式不正确
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sent_at, email_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(sent_at), int(email_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+
+
+def query_emails(
+    session,
+    sender=None,
+    since=None,
+    until=None,
+    tag=None,
+    search=None,
+    cursor=None,
+    limit=50,
+    descending=True,
+):
+    """
+    按发件人/时间范围/标签筛选邮件，按 (sent_at, id) 做游标（keyset）分页。
+    翻到任意深度的页都只需沿索引定位，不会像 OFFSET 那样扫描前面的所有行。
+    返回的 Email 对象不加载正文和邮件头。
+
+    :param sender: 发件人（精确匹配）
+    :param since: 起始时间（含）
+    :param until: 结束时间（不含）
+    :param tag: 标签
+    :param search: 关键词，匹配主题或发件人（子串匹配，不走索引，靠 LIMIT 提前结束扫描）
+    :param cursor: 上一页返回的游标，None 表示第一页
+    :param limit: 每页条数
+    :param descending: 是否按时间倒序（最新的在前）
+    :return: (邮件列表, 下一页游标)，没有下一页时游标为 None
+    """
+    query = session.query(Email).options(
+        defer(Email.text_content), defer(Email.html_content), defer(Email.headers)
+    )
+    if sender is not None:
+        query = query.filter(Email.sender == sender)
+    if since is not None:
+        query = query.filter(Email.sent_at >= since)
+    if until is not None:
+        query = query.filter(Email.sent_at < until)
+    if tag is not None:
+        query = query.filter(
+            Email.tag_rows.any(EmailTag.tag == tag),
+        )
+    if search:
+        query = query.filter(
+            or_(
+                Email.subject.contains(search, autoescape=True),
+                Email.sender.contains(search, autoescape=True),
+            )
+        )
+
+    key = tuple_(Email.sent_at, Email.id)
+    if cursor is not None:
+        position = tuple_(*decode_cursor(cursor))
+        query = query.filter(key < position if descending else key > position)
+    if descending:
+        query = query.order_by(Email.sent_at.desc(), Email.id.desc())
+    else:
+        query = query.order_by(Email.sent_at, Email.id)
+
+    # 多取一条判断是否还有下一页
+    emails = query.limit(limit + 1).all()
+    if len(emails) <= limit:
+        return emails, None
+    emails = emails[:limit]
+    return emails, encode_cursor(emails[-1].sent_at, emails[-1].id)
+
+
+def restore_archived_bodies(email, archive):
+    """
+    已归档的邮件从冷存档库取回正文和邮件头，填入 Email 对象。
+    填入的值不会被视为修改，提交会话时不会写回主库。
+    """
+    if email.archived_at is None or archive is None:
+        return email
+    fields = archive.load(email.uuid)
+    if fields is None:
+        logger.warning(f"邮件 {email.uuid} 已标记归档，但冷存档库中没有记录")
+        return email
+    for name in BODY_FIELDS:
+        set_committed_value(email, name, fields.get(name))
+    return email
+
+
+def get_email(session, email_uuid, archive=None):
+    """
+    按对外 uuid 获取单封邮件及其附件，不存在时返回 None。
+    指定 archive 时，已归档的正文透明地从冷存档库解压取回。
+    """
+    email = (
+        session.query(Email)
+        .options(selectinload(Email.attachments))
+        .filter(Email.uuid == email_uuid)
+        .one_or_none()
+    )
+    if email is not None:
+        restore_archived_bodies(email, archive)
+    return email
+
+
+def archive_old_bodies(session, archive, older_than, batch_size=500):
+    """
+    把发送时间早于 older_than 的邮件正文和邮件头压缩移入冷存档库，主库只保留元数据。
+    每批先写入并提交存档库，再清空主库中的正文并提交；中途中断后重新运行是安全的。
+
+    :param archive: database.archive.BodyArchive
+    :param older_than: datetime（不带时区的 UTC，与 sent_at 一致）
+    :return: (归档邮件数, 原始字节数, 压缩后字节数)
+    """
+    count = raw_total = compressed_total = 0
+    last_id = 0
+    while True:
+        batch = (
+            session.query(
+                Email.id,
+                Email.uuid,
+                Email.text_content,
+                Email.html_content,
+                Email.headers,
+            )
+            .filter(
+                Email.id > last_id,
+                Email.sent_at < older_than,
+                Email.archived_at.is_(None),
+            )
+            .order_by(Email.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        raw, compressed = archive.store(
+            (row.uuid, {name: getattr(row, name) for name in BODY_FIELDS})
+            for row in batch
+        )
+        session.query(Email).filter(Email.id.in_([row.id for row in batch])).update(
+            {
+                Email.text_content: None,
+                Email.html_content: None,
+                Email.headers: None,
+                Email.archived_at: datetime.now(timezone.utc),
+            },
+            synchronize_session=False,
+        )
+        session.commit()
+        count += len(batch)
+        raw_total += raw
+        compressed_total += compressed
+        last_id = batch[-1].id
+        logger.info(f"已归档 {count} 封邮件（{raw_total} -> {compressed_total} 字节）")
+    return count, raw_total, compressed_total
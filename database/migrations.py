@@ -0,0 +1,593 @@
+# ./migrations.py
+"""
+数据库结构迁移与历史数据迁移。
+
+结构迁移：按版本号顺序执行 MIGRATIONS 中的步骤，已执行的版本记录在 schema_migrations 表，
+每个步骤单独一个事务（需要复制整张表的步骤按批提交，可从断点继续）；
+get_engine 首次创建引擎时自动升级到最新版本。
+
+数据迁移：把原型脚本（MyTest/PyEmailSQL.py）生成的 raw_email.db 中的邮件分批复制到
+models.py 定义的表中。每批一个事务，进度记录在 migration_state 表，中断后重新运行会从断点继续。
+原地迁移（目标就是 raw_email.db 本身）时每批复制后删除源记录，释放的页被后续批次复用，
+文件不会膨胀到两倍。批量复制期间暂时去掉 emails 的二级索引，复制结束（包括中途出错）
+后再统一建立。
+"""
+import logging
+import os
+import sqlite3
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import MetaData, Table, inspect, select, text, tuple_
+
+from database.models import Base, Email
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+LEGACY_EMAILS_TABLE = "legacy_emails"
+LEGACY_MIGRATION = "raw_email.emails"
+
+MIGRATIONS = []
+
+
+def migration(version, description, batched=False):
+    """
+    注册一个结构迁移步骤，函数接收 SQLAlchemy Connection。
+    batched=True 的步骤接收 Engine，自行分批提交，必须能在中断后重新运行。
+    """
+
+    def decorator(func):
+        MIGRATIONS.append((version, description, func, batched))
+        MIGRATIONS.sort(key=lambda item: item[0])
+        return func
+
+    return decorator
+
+
+def _columns(conn, table):
+    inspector = inspect(conn)
+    if not inspector.has_table(table):
+        return None
+    return {column["name"] for column in inspector.get_columns(table)}
+
+
+def _add_columns(conn, table, columns):
+    """为已有表补充缺失的列：columns 为 {列名: 列定义 DDL}"""
+    existing = _columns(conn, table)
+    if existing is None:
+        return
+    for name, ddl in columns.items():
+        if name not in existing:
+            conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN "{name}" {ddl}'))
+            logger.info(f"已为 {table} 添加列 {name}")
+
+
+def _create_indexes(conn, table=None):
+    """建立模型中定义但数据库中还不存在的索引"""
+    for model_table in Base.metadata.sorted_tables:
+        if table is None or model_table.name == table:
+            for index in model_table.indexes:
+                index.create(conn, checkfirst=True)
+
+
+def _drop_indexes(conn, table):
+    """删除表的二级索引（唯一约束不受影响），用于批量写入前"""
+    for index in Base.metadata.tables[table].indexes:
+        if not index.unique:
+            index.drop(conn, checkfirst=True)
+
+
+# 原型库与模型同名但结构不同的表：表名 -> 判断函数（参数为已有列集合）
+_LEGACY_MARKERS = {
+    "emails": lambda columns: "body" in columns and "text_content" not in columns,
+    # 旧版本 MyTest/SQLProc.py 建立的交易表没有币种列
+    "transactions": lambda columns: "currency" not in columns,
+}
+
+
+@migration(1, "重命名原型库中与模型冲突的表")
+def _rename_legacy_tables(conn):
+    for table, is_legacy in _LEGACY_MARKERS.items():
+        columns = _columns(conn, table)
+        if columns is not None and is_legacy(columns):
+            conn.execute(text(f'ALTER TABLE "{table}" RENAME TO "legacy_{table}"'))
+            logger.info(f"原型表 {table} 已重命名为 legacy_{table}")
+
+
+@migration(2, "创建模型中的所有表")
+def _create_tables(conn):
+    Base.metadata.create_all(conn)
+
+
+@migration(3, "补充同步、附件和交易提取相关的列")
+def _add_sync_columns(conn):
+    _add_columns(
+        conn,
+        "emails",
+        {
+            "account": "VARCHAR",
+            "folder": "VARCHAR",
+            "uid": "INTEGER",
+            "message_id": "VARCHAR",
+            "extracted_at": "DATETIME",
+        },
+    )
+    _add_columns(
+        conn,
+        "attachments",
+        {
+            "content_type": "VARCHAR",
+            "size": "INTEGER",
+            "section": "VARCHAR",
+            "encoding": "VARCHAR",
+            "status": "VARCHAR NOT NULL DEFAULT 'downloaded'",
+            "attempts": "INTEGER NOT NULL DEFAULT 0",
+            "error": "TEXT",
+            "downloaded_at": "DATETIME",
+        },
+    )
+    # 旧表无法用 ALTER 添加唯一约束，改为建立同名唯一索引
+    constraints = {
+        constraint["name"]
+        for constraint in inspect(conn).get_unique_constraints("emails")
+    }
+    if "uq_emails_mailbox_uid" not in constraints:
+        conn.execute(
+            text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_emails_mailbox_uid "
+                "ON emails (account, folder, uid)"
+            )
+        )
+
+
+@migration(4, "建立查询和分页索引")
+def _create_query_indexes(conn):
+    _create_indexes(conn)
+
+
+# 以邮件 UUID 为主键/外键的旧表，按依赖顺序（子表在前）
+_UUID_KEYED_TABLES = ("email_tags", "transactions", "attachments", "emails")
+_CONVERT_BATCH_SIZE = 5000
+
+
+def _retire_table(conn, table):
+    """
+    把旧表重命名为 _old_<表名>，并去掉它的索引和具名约束，
+    避免与随后按新结构创建的同名索引/约束冲突。
+    """
+    old_name = f"_old_{table}"
+    inspector = inspect(conn)
+    indexes = [index["name"] for index in inspector.get_indexes(table)]
+    unique = [c["name"] for c in inspector.get_unique_constraints(table) if c["name"]]
+    primary_key = inspector.get_pk_constraint(table).get("name")
+
+    for name in indexes:
+        conn.execute(text(f'DROP INDEX "{name}"'))
+    conn.execute(text(f'ALTER TABLE "{table}" RENAME TO "{old_name}"'))
+    if conn.dialect.name != "sqlite":
+        # SQLite 的表内约束没有全局名称；其他数据库需要处理
+        for name in unique:
+            conn.execute(text(f'ALTER TABLE "{old_name}" DROP CONSTRAINT "{name}"'))
+        if primary_key:
+            conn.execute(
+                text(
+                    f'ALTER TABLE "{old_name}" RENAME CONSTRAINT "{primary_key}" '
+                    f'TO "_old_{primary_key}"'
+                )
+            )
+    return Table(old_name, MetaData(), autoload_with=conn)
+
+
+def _copy_keyed(engine, old, new, key, transform):
+    """
+    按 key 列（可以是多列）分批把 old 表复制到 new 表，每批一个事务。
+    transform(conn, rows) 把一批旧行转换为新行；已复制行数与该批数据同时提交，
+    中断后重新运行从断点继续。
+    """
+    name = f"convert_keys.{new.name}"
+    keys = [old.c[column] for column in key]
+    shared = [column.name for column in old.columns if column.name in new.columns]
+    query = select(*[old.c[column] for column in shared]).order_by(*keys)
+    with engine.begin() as conn:
+        _ensure_state_table(conn)
+        _, copied = _load_position(conn, name)
+        last = None
+        if copied:
+            # 断点续传：取已复制的最后一行的键（只在恢复时扫描一次）
+            row = conn.execute(
+                select(*keys).order_by(*keys).offset(copied - 1).limit(1)
+            ).first()
+            last = tuple(row) if row else None
+    while True:
+        batch = query
+        if last is not None:
+            batch = batch.where(
+                keys[0] > last[0] if len(keys) == 1 else tuple_(*keys) > tuple_(*last)
+            )
+        with engine.begin() as conn:
+            rows = [
+                row._asdict() for row in conn.execute(batch.limit(_CONVERT_BATCH_SIZE))
+            ]
+            if not rows:
+                return
+            last = tuple(rows[-1][column] for column in key)
+            conn.execute(new.insert(), transform(conn, rows))
+            copied += len(rows)
+            _save_position(conn, copied, copied, name)
+        logger.info(f"{new.name} 已转换 {copied} 行")
+
+
+@migration(5, "邮件主键改为整数，UUID 作为对外唯一列", batched=True)
+def _convert_to_integer_keys(engine):
+    with engine.begin() as conn:
+        resuming = _columns(conn, "_old_emails") is not None
+        columns = _columns(conn, "emails")
+        if not resuming and (columns is None or "uuid" in columns):
+            return
+        if not resuming:
+            for table in _UUID_KEYED_TABLES:
+                if _columns(conn, table) is not None:
+                    _retire_table(conn, table)
+            Base.metadata.create_all(conn)
+        old_tables = {
+            table: Table(f"_old_{table}", MetaData(), autoload_with=conn)
+            for table in _UUID_KEYED_TABLES
+            if _columns(conn, f"_old_{table}") is not None
+        }
+    emails = Base.metadata.tables["emails"]
+
+    def to_email_rows(conn, rows):
+        for row in rows:
+            row["uuid"] = uuid.UUID(str(row.pop("id")))
+        return rows
+
+    # 邮件按原 UUID 排序复制，新主键由数据库分配
+    _copy_keyed(engine, old_tables["emails"], emails, ("id",), to_email_rows)
+
+    def remap_email_ids(conn, rows):
+        uuids = {uuid.UUID(str(row["email_id"])) for row in rows if row["email_id"]}
+        mapping = dict(
+            conn.execute(
+                select(emails.c.uuid, emails.c.id).where(emails.c.uuid.in_(uuids))
+            ).all()
+        )
+        for row in rows:
+            if row["email_id"]:
+                row["email_id"] = mapping[uuid.UUID(str(row["email_id"]))]
+        return rows
+
+    for table in ("attachments", "transactions", "email_tags"):
+        if table in old_tables:
+            old = old_tables[table]
+            if "id" in old.columns:
+                key = ("id",)
+            else:
+                key = tuple(column.name for column in old.primary_key) or ("email_id",)
+            _copy_keyed(engine, old, Base.metadata.tables[table], key, remap_email_ids)
+
+    with engine.begin() as conn:
+        for table in _UUID_KEYED_TABLES:
+            if table in old_tables:
+                conn.execute(text(f'DROP TABLE "_old_{table}"'))
+        conn.execute(
+            text("DELETE FROM migration_state WHERE name LIKE 'convert_keys.%'")
+        )
+    logger.info("邮件主键已转换为整数")
+
+
+@migration(6, "增加正文归档时间列")
+def _add_archived_at(conn):
+    _add_columns(conn, "emails", {"archived_at": "DATETIME"})
+
+
+@migration(7, "记录文件夹 STATUS 快照，用于跳过未变化的文件夹")
+def _add_folder_status(conn):
+    _add_columns(conn, "sync_state", {"uidnext": "INTEGER", "messages": "INTEGER"})
+
+
+@migration(8, "增加 IMAP 标记、服务器删除时间和 HIGHESTMODSEQ 列")
+def _add_flag_sync(conn):
+    _add_columns(conn, "emails", {"flags": "TEXT", "expunged_at": "DATETIME"})
+    _add_columns(conn, "sync_state", {"highestmodseq": "BIGINT"})
+
+
+@migration(9, "创建本地归档导入进度表")
+def _create_import_state(conn):
+    Base.metadata.tables["import_state"].create(conn, checkfirst=True)
+
+
+@migration(10, "创建 Maildir 已导入文件表")
+def _create_imported_files(conn):
+    Base.metadata.tables["imported_files"].create(conn, checkfirst=True)
+
+
+@migration(11, "记录服务器上未入库的邮件数，用于检测删除")
+def _add_unstored_count(conn):
+    _add_columns(conn, "sync_state", {"unstored": "INTEGER"})
+
+
+@migration(12, "创建 EML 归档处理记录表")
+def _create_eml_manifest(conn):
+    Base.metadata.tables["eml_manifest"].create(conn, checkfirst=True)
+
+
+@migration(13, "记录上次全量比对标记的时间")
+def _add_flags_full_sync_at(conn):
+    _add_columns(conn, "sync_state", {"flags_full_sync_at": "DATETIME"})
+
+
+@migration(14, "创建交易 Parquet 导出进度表")
+def _create_export_state(conn):
+    Base.metadata.tables["export_state"].create(conn, checkfirst=True)
+
+
+def _ensure_version_table(conn):
+    conn.execute(
+        text(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description VARCHAR NOT NULL,
+                applied_at TIMESTAMP NOT NULL
+            )
+            """
+        )
+    )
+
+
+def current_version(engine):
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return conn.execute(
+            text("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+        ).scalar()
+
+
+def upgrade(engine):
+    """
+    执行所有未执行的结构迁移步骤。
+
+    :return: 本次执行的版本号列表
+    """
+    applied = []
+    version = current_version(engine)
+    for step_version, description, func, batched in MIGRATIONS:
+        if step_version <= version:
+            continue
+        if batched:
+            func(engine)
+        with engine.begin() as conn:
+            if not batched:
+                func(conn)
+            conn.execute(
+                text(
+                    "INSERT INTO schema_migrations (version, description, applied_at) "
+                    "VALUES (:version, :description, :applied_at)"
+                ),
+                {
+                    "version": step_version,
+                    "description": description,
+                    "applied_at": datetime.now(timezone.utc),
+                },
+            )
+        logger.info(f"数据库结构已升级到版本 {step_version}：{description}")
+        applied.append(step_version)
+    return applied
+
+
+# ---- raw_email.db 数据迁移 ----
+
+
+def _parse_legacy_datetime(value):
+    """原型库的时间由 sqlite3 默认适配器写入，可能带时区；统一转换为不带时区的 UTC"""
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value))
+        except (TypeError, ValueError):
+            return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _legacy_uuid(value):
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return uuid.uuid4()
+
+
+def legacy_row_to_email(row, account=None, folder="INBOX"):
+    """
+    把原型库的一行转换为 emails 表的行。
+
+    :param row: (rowid, id, uid, subject, sender, body, format, sent_at, saved_at)
+    """
+    _, email_id, uid, subject, sender, body, body_format, sent_at, saved_at = row
+    now = datetime.now(timezone.utc)
+    is_html = (body_format or "").lower() == "html"
+    return {
+        "uuid": _legacy_uuid(email_id),
+        "account": account,
+        "folder": folder,
+        "uid": int(uid) if str(uid).isdigit() else None,
+        "sender": sender or "",
+        "recipients": "[]",
+        "cc": "[]",
+        "bcc": "[]",
+        "subject": subject or "",
+        "text_content": None if is_html else body,
+        "html_content": body if is_html else None,
+        "tags": "[]",
+        "headers": None,
+        "sent_at": _parse_legacy_datetime(sent_at) or now,
+        "created_at": _parse_legacy_datetime(saved_at) or now,
+    }
+
+
+def _ensure_state_table(conn):
+    conn.execute(
+        text(
+            """
+            CREATE TABLE IF NOT EXISTS migration_state (
+                name VARCHAR PRIMARY KEY,
+                position INTEGER NOT NULL,
+                copied INTEGER NOT NULL,
+                updated_at TIMESTAMP NOT NULL
+            )
+            """
+        )
+    )
+
+
+def _load_position(conn, name=LEGACY_MIGRATION):
+    row = conn.execute(
+        text("SELECT position, copied FROM migration_state WHERE name = :name"),
+        {"name": name},
+    ).first()
+    return (row[0], row[1]) if row else (0, 0)
+
+
+def _save_position(conn, position, copied, name=LEGACY_MIGRATION):
+    params = {
+        "name": name,
+        "position": position,
+        "copied": copied,
+        "updated_at": datetime.now(timezone.utc),
+    }
+    updated = conn.execute(
+        text(
+            "UPDATE migration_state SET position = :position, copied = :copied, "
+            "updated_at = :updated_at WHERE name = :name"
+        ),
+        params,
+    ).rowcount
+    if not updated:
+        conn.execute(
+            text(
+                "INSERT INTO migration_state (name, position, copied, updated_at) "
+                "VALUES (:name, :position, :copied, :updated_at)"
+            ),
+            params,
+        )
+
+
+def _legacy_table(source):
+    """原地迁移后原型表被重命名为 legacy_emails，否则仍为 emails"""
+    tables = {
+        row[0]
+        for row in source.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    }
+    if LEGACY_EMAILS_TABLE in tables:
+        return LEGACY_EMAILS_TABLE
+    columns = {row[1] for row in source.execute("PRAGMA table_info(emails)")}
+    if "body" in columns:
+        return "emails"
+    raise ValueError("没有找到原型邮件表（emails 或 legacy_emails）")
+
+
+def migrate_legacy_emails(
+    legacy_path,
+    db_url=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+    account=None,
+    folder="INBOX",
+    progress=None,
+):
+    """
+    把 raw_email.db 中的邮件分批迁移到模型表，可中断、可重复运行。
+
+    :param legacy_path: raw_email.db 路径
+    :param db_url: 目标数据库 URL；为 None 时原地迁移（目标即 legacy_path），
+                   每批复制后删除源记录以复用空间
+    :param batch_size: 每批（每个事务）复制的邮件数
+    :param account: 写入 emails.account 的账户名（原型库只同步过一个账户）
+    :param folder: 写入 emails.folder 的文件夹名
+    :param progress: 回调 progress(已复制, 总数)，每批调用一次
+    :return: 累计复制的邮件数
+    """
+    from database.db_init import get_engine  # 避免循环导入
+
+    in_place = db_url is None
+    if in_place:
+        db_url = f"sqlite:///{legacy_path}"
+    engine = get_engine(db_url)  # 同时完成结构迁移（原地迁移时重命名原型表）
+    emails_table = Email.__table__
+
+    source = sqlite3.connect(f"file:{legacy_path}?mode=ro", uri=True)
+    try:
+        table = _legacy_table(source)
+        with engine.begin() as conn:
+            _ensure_state_table(conn)
+            position, copied = _load_position(conn)
+        (remaining,) = source.execute(
+            f'SELECT COUNT(*) FROM "{table}" WHERE rowid > ?', (position,)
+        ).fetchone()
+        source.rollback()
+        total = copied + remaining
+        if not remaining:
+            # 进程被强制终止时 finally 来不及执行，这里补建缺失的索引
+            with engine.begin() as conn:
+                _create_indexes(conn, "emails")
+            logger.info(f"{legacy_path} 没有待迁移的邮件（已迁移 {copied} 封）")
+            return copied
+
+        with engine.begin() as conn:
+            _drop_indexes(conn, "emails")
+        logger.info(
+            f"开始迁移 {legacy_path}：共 {total} 封，已完成 {copied} 封，"
+            f"每批 {batch_size} 封{'（原地迁移）' if in_place else ''}"
+        )
+
+        try:
+            started = time.perf_counter()
+            while True:
+                rows = source.execute(
+                    "SELECT rowid, id, uid, subject, sender, body, format, "
+                    f'sent_at, saved_at FROM "{table}" WHERE rowid > ? '
+                    "ORDER BY rowid LIMIT ?",
+                    (position, batch_size),
+                ).fetchall()
+                source.rollback()  # 结束读事务，WAL 检查点和删除不受阻塞
+                if not rows:
+                    break
+
+                with engine.begin() as conn:
+                    conn.execute(
+                        emails_table.insert(),
+                        [legacy_row_to_email(row, account, folder) for row in rows],
+                    )
+                    position = rows[-1][0]
+                    copied += len(rows)
+                    _save_position(conn, position, copied)
+                    if in_place:
+                        conn.execute(
+                            text(f'DELETE FROM "{table}" WHERE rowid <= :position'),
+                            {"position": position},
+                        )
+
+                elapsed = time.perf_counter() - started
+                logger.info(
+                    f"已迁移 {copied}/{total} 封邮件（{copied / total:.1%}，"
+                    f"{len(rows) / max(elapsed, 1e-6):.0f} 封/秒）"
+                )
+                started = time.perf_counter()
+                if progress is not None:
+                    progress(copied, total)
+        finally:
+            # 中途出错也要恢复索引，否则后续查询全表扫描
+            logger.info("邮件复制结束，开始建立索引")
+            with engine.begin() as conn:
+                _create_indexes(conn, "emails")
+        logger.info(f"迁移完成，共 {copied} 封邮件")
+        return copied
+    finally:
+        source.close()
@@ -2,13 +2,21 @@ import uuid
 from datetime import datetime, timezone
 
 from sqlalchemy import (
+    BigInteger,
     Column,
+    Date,
     DateTime,
+    Float,
     ForeignKey,
+    Index,
     Integer,
+    LargeBinary,
+    Numeric,
     String,
     Table,
     Text,
+    TypeDecorator,
+    UniqueConstraint,
     create_engine,
 )
 from sqlalchemy.dialects.postgresql import UUID
@@ -18,6 +26,39 @@ from sqlalchemy.orm import declarative_base, relationship
 Base = declarative_base()
 
 
+class GUID(TypeDecorator):
+    """
+    按数据库类型存储 UUID：PostgreSQL 使用原生 UUID，其他数据库（SQLite）使用 16 字节 BLOB，
+    而不是 32 个字符的十六进制字符串。Python 侧始终是 uuid.UUID。
+    """
+
+    impl = LargeBinary(16)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(UUID(as_uuid=True))
+        return dialect.type_descriptor(LargeBinary(16))
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name == "postgresql":
+            return value
+        if not isinstance(value, uuid.UUID):
+            value = uuid.UUID(str(value))
+        return value.bytes
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        return uuid.UUID(bytes=bytes(value))
+
+
+# 附件下载状态
+ATTACHMENT_DOWNLOADED = "downloaded"  # 已保存到本地
+ATTACHMENT_QUEUED = "queued"  # 只记录了元信息，等待后台下载
+ATTACHMENT_FAILED = "failed"  # 多次下载失败
+
+
 class Email(Base):
     """
     邮件表模型
@@ -25,7 +66,10 @@ class Email(Base):
 
     __tablename__ = "emails"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True)
+    # 内部使用整数主键（SQLite 中即 rowid），外键和索引都很紧凑；
+    # 对外（接口、附件目录、导出）使用 uuid
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    uuid = Column(GUID(), default=uuid.uuid4, nullable=False, unique=True)
     sender = Column(String, nullable=False)
     recipients = Column(Text, nullable=False)  # 存储 JSON 格式的收件人列表
     cc = Column(Text, default="[]")  # 存储 JSON 格式的抄送列表
@@ -42,11 +86,53 @@ class Email(Base):
         DateTime, default=lambda: datetime.now(timezone.utc), nullable=False
     )
     updated_at = Column(DateTime, onupdate=lambda: datetime.now(timezone.utc))
+    # 邮件在服务器上的位置：账户、文件夹和 IMAP UID
+    account = Column(String, nullable=True)
+    folder = Column(String, nullable=True)
+    uid = Column(Integer, nullable=True)
+    message_id = Column(String, nullable=True, index=True)
+    # 最近一次提取账单交易的时间，为空表示尚未提取
+    extracted_at = Column(DateTime, nullable=True)
+    # 正文和邮件头移入冷存档库的时间，非空时 text_content/html_content/headers 为空
+    archived_at = Column(DateTime, nullable=True)
+    # 服务器上的 IMAP 标记（JSON 列表，例如 ["\\Seen"]），为空表示尚未同步
+    flags = Column(Text, nullable=True)
+    # 服务器上已删除（EXPUNGE）的时间，本地保留邮件内容
+    expunged_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("account", "folder", "uid", name="uq_emails_mailbox_uid"),
+        # 分页查询按 (sent_at, id) 排序与定位
+        Index("ix_emails_sent_at_id", "sent_at", "id"),
+        Index("ix_emails_sender_sent_at_id", "sender", "sent_at", "id"),
+    )
 
     # 关联关系
     attachments = relationship(
         "Attachment", back_populates="email", cascade="all, delete-orphan"
     )
+    transactions = relationship(
+        "Transaction", back_populates="email", cascade="all, delete-orphan"
+    )
+    tag_rows = relationship(
+        "EmailTag", back_populates="email", cascade="all, delete-orphan"
+    )
+
+
+class EmailTag(Base):
+    """
+    邮件标签表，与 emails.tags 中的 JSON 列表保持一致，用于按标签建索引查询
+    """
+
+    __tablename__ = "email_tags"
+
+    email_id = Column(Integer, ForeignKey("emails.id"), primary_key=True)
+    tag = Column(String, primary_key=True)
+
+    __table_args__ = (Index("ix_email_tags_tag", "tag", "email_id"),)
+
+    # 关联关系
+    email = relationship("Email", back_populates="tag_rows")
 
 
 class Attachment(Base):
@@ -57,17 +143,185 @@ class Attachment(Base):
     __tablename__ = "attachments"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    email_id = Column(UUID(as_uuid=True), ForeignKey("emails.id"), nullable=False)
+    email_id = Column(Integer, ForeignKey("emails.id"), nullable=False)
     filename = Column(String, nullable=False)
-    filepath = Column(String, nullable=False)
+    filepath = Column(String, nullable=True)  # 尚未下载时为空
+    content_type = Column(String, nullable=True)
+    size = Column(Integer, nullable=True)  # 解码后的字节数（未下载时为估算值）
+    section = Column(String, nullable=True)  # IMAP BODY[section] 编号，用于延迟下载
+    encoding = Column(String, nullable=True)  # Content-Transfer-Encoding
+    status = Column(String, default=ATTACHMENT_DOWNLOADED, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    error = Column(Text, nullable=True)
+    downloaded_at = Column(DateTime, nullable=True)
     created_at = Column(
         DateTime, default=lambda: datetime.now(timezone.utc), nullable=False
     )
 
+    __table_args__ = (Index("ix_attachments_status", "status", "size"),)
+
     # 关联关系
     email = relationship("Email", back_populates="attachments")
 
 
+class SyncState(Base):
+    """
+    邮箱文件夹同步状态表，记录每个账户/文件夹已同步到的位置
+    """
+
+    __tablename__ = "sync_state"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    account = Column(String, nullable=False)
+    folder = Column(String, nullable=False)
+    uidvalidity = Column(BigInteger, nullable=True)
+    last_uid = Column(Integer, default=0, nullable=False)  # 已入库的最大 UID
+    # 上次同步完成时 STATUS 返回的值，两者都没变的文件夹不必 SELECT
+    uidnext = Column(Integer, nullable=True)
+    messages = Column(Integer, nullable=True)
+    # 上次标记同步完成时的 HIGHESTMODSEQ（CONDSTORE），之后只取变化的标记
+    highestmodseq = Column(BigInteger, nullable=True)
+    # 上次 UID SEARCH 时服务器上有、本地没有入库的邮件数（解析失败等），
+    # EXISTS 与本地邮件数之差仍等于该值时认为没有删除
+    unstored = Column(Integer, nullable=True)
+    # 上次分块比对全部标记的时间（服务器不支持 CONDSTORE 时按间隔执行）
+    flags_full_sync_at = Column(DateTime, nullable=True)
+    updated_at = Column(
+        DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+
+    __table_args__ = (
+        UniqueConstraint("account", "folder", name="uq_sync_state_folder"),
+    )
+
+
+class ImportState(Base):
+    """
+    本地归档（mbox 文件、Maildir 目录）的导入进度，中断后从 position 继续
+    """
+
+    __tablename__ = "import_state"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    source = Column(String, nullable=False, unique=True)  # 归档的绝对路径
+    # mbox 为已导入部分的字节偏移；Maildir 按文件记录在 imported_files 中，不使用
+    position = Column(BigInteger, default=0, nullable=False)
+    imported = Column(Integer, default=0, nullable=False)  # 累计入库的邮件数
+    updated_at = Column(
+        DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+
+
+class ImportedFile(Base):
+    """
+    已导入的 Maildir 邮件文件，以 "文件夹/唯一名"（文件名中 ":" 之前的部分）为键。
+    唯一名在邮件从 new 移到 cur、标记变化时保持不变，新邮件投递到任何文件夹都不影响
+    已导入文件的判断。
+    """
+
+    __tablename__ = "imported_files"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    source = Column(String, nullable=False)  # 归档的绝对路径，与 import_state 一致
+    key = Column(String, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("source", "key", name="uq_imported_files_source_key"),
+    )
+
+
+class ExportState(Base):
+    """
+    交易 Parquet 导出进度：每个导出目录记录已导出的最大 transactions.id，
+    之后只导出 id 更大的交易
+    """
+
+    __tablename__ = "export_state"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    target = Column(String, nullable=False, unique=True)  # 数据集目录的绝对路径
+    last_id = Column(Integer, default=0, nullable=False)
+    exported = Column(Integer, default=0, nullable=False)  # 累计导出的交易数
+    updated_at = Column(
+        DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+
+
+class EmlManifest(Base):
+    """
+    MyTest/ReadEml.py 的处理记录：ZIP 文件本身（member 为空字符串）及其中每个 EML 文件。
+    ZIP 的 digest 为 SHA-256，EML 的 digest 为 ZIP 目录中的 CRC-32（无需解压即可判断是否变化）。
+    """
+
+    __tablename__ = "eml_manifest"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    path = Column(String, nullable=False)  # ZIP 文件的绝对路径
+    member = Column(String, nullable=False, default="")
+    size = Column(BigInteger)
+    mtime = Column(Float)
+    digest = Column(String)
+    status = Column(String, nullable=False)
+    processed_at = Column(DateTime)
+
+    __table_args__ = (
+        UniqueConstraint("path", "member", name="uq_eml_manifest_path_member"),
+    )
+
+
+class Transaction(Base):
+    """
+    信用卡交易表模型，记录从账单邮件中提取出的交易。
+
+    自然键为卡号、日期、类型、商户、交易金额/币种，加上同一封账单内相同记录的序号
+    （occurrence），重复提取或同一账单被多次发送时按自然键合并。
+    """
+
+    __tablename__ = "transactions"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    email_id = Column(Integer, ForeignKey("emails.id"), nullable=True)
+    card_last4 = Column(String(8), nullable=False)
+    trade_date = Column(Date, nullable=False)
+    post_date = Column(Date, nullable=False)
+    trade_type = Column(String, nullable=False)
+    merchant = Column(String, nullable=False)
+    amount = Column(Numeric(18, 2), nullable=False)
+    currency = Column(String(3), nullable=False)
+    posted_amount = Column(Numeric(18, 2), nullable=True)
+    posted_currency = Column(String(3), nullable=True)
+    occurrence = Column(Integer, default=0, nullable=False)
+    created_at = Column(
+        DateTime, default=lambda: datetime.now(timezone.utc), nullable=False
+    )
+    updated_at = Column(DateTime, onupdate=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        UniqueConstraint(
+            "card_last4",
+            "trade_date",
+            "post_date",
+            "trade_type",
+            "merchant",
+            "amount",
+            "currency",
+            "occurrence",
+            name="uq_transactions_natural_key",
+        ),
+        Index("ix_transactions_card_trade_date", "card_last4", "trade_date"),
+        Index("ix_transactions_merchant", "merchant"),
+    )
+
+    # 关联关系
+    email = relationship("Email", back_populates="transactions")
+
+
 # 如果需要手动运行表的创建
 if __name__ == "__main__":
     # 数据库引擎（使用 SQLite 示例，可以替换为实际数据库 URL）
@@ -0,0 +1,143 @@
+# ./attachment_queue.py
+import logging
+import os
+import sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.db_operations import (
+    get_queued_attachments,
+    mark_attachment_downloaded,
+    mark_attachment_failed,
+)
+from database.models import Attachment
+from imap.bodystructure import MimePart
+from imap.client import EmailClient
+from imap.partial import download_part, download_part_to_file
+from parsers.attachment import attachment_path, save_attachment
+
+logger = logging.getLogger(__name__)
+
+# 超过该大小的附件边下载边写盘，不在内存中保存整个附件
+STREAM_THRESHOLD = 1024 * 1024
+
+
+class AttachmentDownloader:
+    """
+    后台附件下载队列：处理同步时只记录了元信息的附件（status=queued）。
+    使用独立的连接数上限，与主同步互不阻塞；小附件优先。
+    """
+
+    def __init__(self, account, session_factory, attachments_dir, workers=1):
+        self.account = account
+        self.session_factory = session_factory
+        self.attachments_dir = attachments_dir
+        self.workers = max(1, min(workers, account.max_connections))
+
+    def run(self, limit=100):
+        """
+        下载最多 limit 个排队中的附件。
+
+        :return: (成功数, 失败数)
+        """
+        session = self.session_factory()
+        try:
+            jobs = [
+                {
+                    "attachment_id": attachment.id,
+                    "email_uuid": str(email.uuid),
+                    "folder": email.folder,
+                    "uid": email.uid,
+                    "filename": attachment.filename,
+                    "part": MimePart(
+                        section=attachment.section,
+                        content_type=attachment.content_type or "",
+                        encoding=attachment.encoding or "7bit",
+                        size=attachment.size or 0,
+                    ),
+                }
+                for attachment, email in get_queued_attachments(
+                    session, self.account.name, limit
+                )
+            ]
+            if not jobs:
+                logger.info(f"{self.account.name} 没有待下载的附件")
+                return 0, 0
+
+            # 按连接切分任务：同一文件夹尽量分给同一个连接，减少 SELECT
+            jobs.sort(key=lambda job: (job["folder"], job["uid"]))
+            chunks = [jobs[i :: self.workers] for i in range(self.workers)]
+            with ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="attachment"
+            ) as executor:
+                results = [
+                    result
+                    for chunk_results in executor.map(self._download_chunk, chunks)
+                    for result in chunk_results
+                ]
+
+            downloaded = failed = 0
+            for attachment_id, path, size, error in results:
+                attachment = session.get(Attachment, attachment_id)
+                if error is None:
+                    mark_attachment_downloaded(attachment, path, size)
+                    downloaded += 1
+                else:
+                    mark_attachment_failed(attachment, error)
+                    failed += 1
+            session.commit()
+            logger.info(
+                f"{self.account.name} 附件下载完成：成功 {downloaded}，失败 {failed}"
+            )
+            return downloaded, failed
+        finally:
+            session.close()
+
+    def _download_chunk(self, jobs):
+        """在单个连接上依次下载一组附件，返回 [(id, 路径, 大小, 错误)]"""
+        if not jobs:
+            return []
+        results = []
+        by_folder = defaultdict(list)
+        for job in jobs:
+            by_folder[job["folder"]].append(job)
+
+        client = EmailClient.from_account(self.account)
+        try:
+            client.login()
+            for folder, folder_jobs in by_folder.items():
+                client.select(folder)
+                for job in folder_jobs:
+                    results.append(self._download_one(client, job))
+        except Exception as e:
+            logger.error(f"{self.account.name} 附件下载连接异常: {e}")
+            done = {result[0] for result in results}
+            results.extend(
+                (job["attachment_id"], None, None, e)
+                for job in jobs
+                if job["attachment_id"] not in done
+            )
+        finally:
+            client.logout()
+        return results
+
+    def _download_one(self, client, job):
+        directory = os.path.join(self.attachments_dir, job["email_uuid"])
+        try:
+            if job["part"].size >= STREAM_THRESHOLD:
+                path = attachment_path(directory, job["filename"])
+                size = download_part_to_file(client, job["uid"], job["part"], path)
+                if size is None:
+                    raise ValueError("服务器未返回附件内容")
+                return job["attachment_id"], path, size, None
+            payload = download_part(client, job["uid"], job["part"])
+            if payload is None:
+                raise ValueError("服务器未返回附件内容")
+            path = save_attachment(payload, directory, job["filename"])
+            return job["attachment_id"], path, len(payload), None
+        except Exception as e:
+            logger.warning(f"下载附件 {job['filename']} (UID {job['uid']}) 失败: {e}")
+            return job["attachment_id"], None, None, e
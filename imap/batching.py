@@ -0,0 +1,99 @@
+# ./batching.py
+"""
+按字节预算自适应分批下载（AIMD）。
+
+固定的每批邮件数对不同邮箱都不合适：5 KB 的账单邮件一批 50 封太少，
+带 20 MB 附件的邮件一批 50 封又会超时。下载前先用 RFC822.SIZE 取得每封邮件的大小，
+按字节预算装批；每批完成后根据实测耗时调整预算：
+
+- 耗时低于目标：预算加性增大（每次 step），同时不超过 实测吞吐量 × 目标耗时；
+- 耗时超过目标或发生超时：预算乘性减小（减半）；超时的批次大小的 3/4 作为之后的上限，
+  避免加性增大后再次超时。
+
+目标耗时取连接超时的一部分，因此预算收敛后单批不会接近超时；
+预算按连接保存，同一连接后续的文件夹直接沿用。
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BYTE_BUDGET = 2 * 1024 * 1024
+MIN_BYTE_BUDGET = 64 * 1024
+MAX_BYTE_BUDGET = 64 * 1024 * 1024
+BUDGET_STEP = 512 * 1024
+DECREASE_FACTOR = 0.5
+CEILING_FACTOR = 0.75  # 发生超时后，预算不再超过超时批次大小的这一比例
+MAX_BATCH_MESSAGES = 1000  # 单批邮件数上限，限制命令和响应解析的规模
+RATE_SMOOTHING = 0.3  # 吞吐量指数平滑系数
+
+
+class AdaptiveBatcher:
+    """
+    AIMD 字节预算。
+
+    :param target_seconds: 单批目标耗时（秒），应明显小于连接超时
+    """
+
+    def __init__(
+        self,
+        target_seconds,
+        budget=DEFAULT_BYTE_BUDGET,
+        min_budget=MIN_BYTE_BUDGET,
+        max_budget=MAX_BYTE_BUDGET,
+        step=BUDGET_STEP,
+        max_messages=MAX_BATCH_MESSAGES,
+    ):
+        self.target_seconds = target_seconds
+        self.budget = budget
+        self.min_budget = min_budget
+        self.max_budget = max_budget
+        self.step = step
+        self.max_messages = max_messages
+        self.rate = None  # 平滑后的吞吐量（字节/秒）
+        self.ceiling = max_budget  # 发生过超时后的预算上限
+
+    def take(self, uids, sizes, start=0):
+        """
+        从 uids[start:] 中按顺序取出一批，总大小不超过预算（单封超过预算的邮件单独一批）。
+
+        :param sizes: {uid: RFC822.SIZE}
+        """
+        batch = []
+        total = 0
+        for uid in uids[start : start + self.max_messages]:
+            size = sizes.get(uid, 0)
+            if batch and total + size > self.budget:
+                break
+            batch.append(uid)
+            total += size
+        return batch
+
+    def record(self, nbytes, seconds):
+        """记录一批成功下载的字节数和耗时，调整预算"""
+        seconds = max(seconds, 1e-3)
+        rate = nbytes / seconds
+        if self.rate is None:
+            self.rate = rate
+        else:
+            self.rate += RATE_SMOOTHING * (rate - self.rate)
+
+        if seconds > self.target_seconds:
+            self._decrease(f"单批耗时 {seconds:.1f} 秒超过目标")
+            return
+        budget = self.budget + self.step
+        # 按吞吐量估算的预计耗时不超过目标
+        budget = min(budget, int(self.rate * self.target_seconds))
+        self.budget = max(self.min_budget, min(self.ceiling, budget))
+
+    def record_timeout(self, nbytes):
+        """一批（共 nbytes 字节）下载超时"""
+        self.ceiling = max(
+            self.min_budget, min(self.ceiling, int(nbytes * CEILING_FACTOR))
+        )
+        self._decrease("下载超时")
+
+    def _decrease(self, reason):
+        self.budget = max(
+            self.min_budget, min(self.ceiling, int(self.budget * DECREASE_FACTOR))
+        )
+        logger.info(f"{reason}，下载批次预算减小到 {self.budget // 1024} KB")
@@ -0,0 +1,131 @@
+# ./bodystructure.py
+"""
+BODYSTRUCTURE 解析：把服务器返回的 MIME 结构转换为带 section 编号的叶子部分列表，
+用于只下载正文部分（BODY.PEEK[n]），附件按需或按策略再下载。
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from parsers.body_parser import decode_header_value
+
+
+@dataclass
+class MimePart:
+    """BODYSTRUCTURE 中的一个叶子部分"""
+
+    section: str
+    content_type: str
+    params: Dict[str, str] = field(default_factory=dict)
+    encoding: str = "7bit"
+    size: int = 0  # 传输编码后的字节数
+    disposition: Optional[str] = None
+    filename: Optional[str] = None
+
+    @property
+    def charset(self):
+        return self.params.get("charset")
+
+    @property
+    def is_attachment(self):
+        if self.disposition == "attachment":
+            return True
+        if self.filename:
+            return True
+        # 嵌套邮件整体作为附件处理
+        return self.content_type == "message/rfc822"
+
+    @property
+    def is_body(self):
+        return not self.is_attachment and self.content_type in (
+            "text/plain",
+            "text/html",
+        )
+
+    @property
+    def decoded_size(self):
+        """估算解码后的大小（base64 约为 3/4）"""
+        if self.encoding == "base64":
+            return self.size * 3 // 4
+        return self.size
+
+
+def _text(value):
+    if value is None:
+        return None
+    return bytes(value).decode("utf-8", errors="replace")
+
+
+def _param_dict(values):
+    """把 ("CHARSET" "utf-8" "NAME" "a.pdf") 转为字典（键小写）"""
+    if not isinstance(values, list):
+        return {}
+    params = {}
+    for i in range(0, len(values) - 1, 2):
+        params[_text(values[i]).lower()] = _text(values[i + 1])
+    return params
+
+
+def _leaf(node, section):
+    content_type = f"{_text(node[0]).lower()}/{_text(node[1]).lower()}"
+    params = _param_dict(node[2])
+    encoding = (_text(node[5]) or "7bit").lower()
+    size = int(node[6]) if node[6] is not None else 0
+
+    # 扩展字段的位置取决于类型：text 多一个行数，message/rfc822 多信封、结构和行数
+    if content_type.startswith("text/"):
+        ext = 8
+    elif content_type == "message/rfc822":
+        ext = 10
+    else:
+        ext = 7
+    disposition = None
+    disposition_params = {}
+    if len(node) > ext + 1 and isinstance(node[ext + 1], list):
+        disposition = (_text(node[ext + 1][0]) or "").lower() or None
+        disposition_params = _param_dict(node[ext + 1][1])
+
+    filename = disposition_params.get("filename") or params.get("name")
+    if filename:
+        filename = decode_header_value(filename)
+
+    return MimePart(
+        section=section,
+        content_type=content_type,
+        params=params,
+        encoding=encoding,
+        size=size,
+        disposition=disposition,
+        filename=filename,
+    )
+
+
+def parse_bodystructure(node, prefix=""):
+    """
+    把 BODYSTRUCTURE 嵌套列表展开为叶子部分列表。
+
+    :param node: imap.response.parse_fetch_response 得到的 BODYSTRUCTURE 值
+    :param prefix: 上层 section 编号（递归使用）
+    :return: [MimePart, ...]，section 与 BODY[section] 一致
+    """
+    if node and isinstance(node[0], list):
+        # multipart：若干子结构后跟子类型
+        parts = []
+        index = 0
+        for child in node:
+            if not isinstance(child, list):
+                break
+            index += 1
+            section = f"{prefix}.{index}" if prefix else str(index)
+            parts.extend(parse_bodystructure(child, section))
+        return parts
+    # 单部分邮件的正文 section 为 "1"
+    return [_leaf(node, prefix or "1")]
+
+
+def select_body_parts(parts):
+    """挑出第一个 text/plain 和第一个 text/html 正文部分"""
+    selected = {}
+    for part in parts:
+        if part.is_body and part.content_type not in selected:
+            selected[part.content_type] = part
+    return selected
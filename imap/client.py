@@ -0,0 +1,405 @@
+# ./client.py
+import imaplib
+import logging
+import re
+import time
+
+from imap.batching import AdaptiveBatcher
+from imap.folders import (
+    STATUS_ITEMS,
+    parse_list_response,
+    parse_status_response,
+    quote_mailbox,
+)
+from imap.response import fetch_by_uid
+from imap.transport import IMAP4Transport, LiteralSpool
+
+logger = logging.getLogger(__name__)
+
+# 126/163 邮箱要求登录后发送 ID 命令，否则 SELECT 之后的命令会被拒绝
+IMAP_ID = ("name", "PyEmail", "version", "1.0", "vendor", "PyEmail")
+
+_UID_RE = re.compile(rb"\bUID (\d+)")
+
+DEFAULT_TIMEOUT = 120  # 连接读写超时（秒）
+SIZE_CHUNK = 1000  # 每次 FETCH RFC822.SIZE 的 UID 数
+
+
+class IMAPClientError(Exception):
+    """IMAP 服务器返回非 OK 状态"""
+
+
+def format_uid_set(uids):
+    """
+    把 UID 列表压缩为 IMAP 序列集，例如 [1, 2, 3, 7] -> "1:3,7"。
+    """
+    uids = sorted(set(uids))
+    if not uids:
+        raise ValueError("UID 列表为空")
+    ranges = []
+    start = prev = uids[0]
+    for uid in uids[1:]:
+        if uid == prev + 1:
+            prev = uid
+            continue
+        ranges.append(f"{start}:{prev}" if start != prev else str(start))
+        start = prev = uid
+    ranges.append(f"{start}:{prev}" if start != prev else str(start))
+    return ",".join(ranges)
+
+
+def parse_uid_set(text):
+    """format_uid_set 的逆操作："1:3,7" -> [1, 2, 3, 7]"""
+    uids = []
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if ":" in item:
+            start, end = sorted(int(value) for value in item.split(":"))
+            uids.extend(range(start, end + 1))
+        else:
+            uids.append(int(item))
+    return uids
+
+
+def iter_fetch_literals(data):
+    """
+    遍历 imaplib fetch/uid("FETCH") 的返回数据，产出 (uid, 描述行, 文字内容)。
+    """
+    for item in data:
+        if not isinstance(item, tuple):
+            continue
+        meta, literal = item[0], item[1]
+        match = _UID_RE.search(meta)
+        uid = int(match.group(1)) if match else None
+        yield uid, meta, literal
+
+
+class EmailClient:
+    """基于 UID 的 IMAP 邮箱客户端"""
+
+    def __init__(
+        self,
+        username,
+        password,
+        imap_server="imap.qq.com",
+        port=993,
+        compress=True,
+        timeout=DEFAULT_TIMEOUT,
+        adaptive=True,
+    ):
+        self.username = username
+        self.password = password
+        self.imap_server = imap_server
+        self.port = port
+        self.compress = compress
+        self.timeout = timeout
+        # 按 RFC822.SIZE 和实测吞吐量自适应分批（见 imap.batching），单批目标耗时为超时的 1/4
+        self.batcher = AdaptiveBatcher(timeout / 4) if adaptive and timeout else None
+        self.mail = None
+        self.capabilities = frozenset()
+        self.folder = None
+        self.mailbox = {}  # 最近一次 SELECT 的结果
+        self.condstore = False  # 已启用 CONDSTORE（MODSEQ / CHANGEDSINCE）
+        self.qresync = False  # 已启用 QRESYNC（VANISHED）
+
+    @classmethod
+    def from_account(cls, account):
+        """根据 utils.config.AccountConfig 创建客户端"""
+        return cls(
+            account.username,
+            account.password,
+            imap_server=account.imap_server,
+            port=account.imap_port,
+            compress=account.compress,
+            timeout=account.fetch_timeout,
+            adaptive=account.adaptive_fetch,
+        )
+
+    def login(self):
+        """登录邮箱并读取服务器能力"""
+        self.mail = IMAP4Transport(self.imap_server, self.port, timeout=self.timeout)
+        self.mail.login(self.username, self.password)
+        logger.info(f"邮箱 {self.username} 登录成功")
+        self._send_id()
+        self.refresh_capabilities()
+        if self.compress and self.has_capability("COMPRESS=DEFLATE"):
+            self.mail.start_compression()
+        self._enable_modseq()
+
+    def _enable_modseq(self):
+        """服务器支持时启用 QRESYNC（隐含 CONDSTORE）或 CONDSTORE，用于增量同步标记"""
+        for capability in ("QRESYNC", "CONDSTORE"):
+            if not self.has_capability(capability) or not self.has_capability("ENABLE"):
+                continue
+            try:
+                status, _ = self.mail.enable(capability)
+            except imaplib.IMAP4.error as e:
+                logger.debug(f"启用 {capability} 失败: {e}")
+                continue
+            if status == "OK":
+                self.condstore = True
+                self.qresync = capability == "QRESYNC"
+                logger.debug(f"已启用 {capability}")
+                return
+
+    def _send_id(self):
+        """发送 IMAP ID 命令（126 邮箱需要），服务器不支持时忽略"""
+        try:
+            self.mail.xatom("ID", '("' + '" "'.join(IMAP_ID) + '")')
+        except imaplib.IMAP4.error as e:
+            logger.debug(f"服务器不支持 ID 命令: {e}")
+
+    def refresh_capabilities(self):
+        status, data = self.mail.capability()
+        if status == "OK" and data:
+            self.capabilities = frozenset(data[0].decode().upper().split())
+        return self.capabilities
+
+    def has_capability(self, name):
+        return name.upper() in self.capabilities
+
+    def _check(self, status, data, command):
+        if status != "OK":
+            raise IMAPClientError(f"{command} 失败: {status} {data}")
+        return data
+
+    def select(self, folder="INBOX", readonly=True):
+        """
+        选择文件夹，返回 {"exists", "uidvalidity", "uidnext", "highestmodseq"}。
+        highestmodseq 仅在启用 CONDSTORE 且文件夹支持时有值。
+        """
+        self.mail.response("HIGHESTMODSEQ")  # 丢弃上一个文件夹遗留的值
+        status, data = self.mail.select(quote_mailbox(folder), readonly=readonly)
+        self._check(status, data, f"SELECT {folder}")
+        self.folder = folder
+        self.mailbox = {
+            "exists": int(data[0]),
+            "uidvalidity": self._untagged_int("UIDVALIDITY"),
+            "uidnext": self._untagged_int("UIDNEXT"),
+            "highestmodseq": self._untagged_int("HIGHESTMODSEQ"),
+        }
+        return self.mailbox
+
+    def list_folders(self, pattern="*"):
+        """执行 LIST，返回 imap.folders.Folder 列表（名称已解码）"""
+        status, data = self.mail.list('""', pattern)
+        return parse_list_response(self._check(status, data, f"LIST {pattern}"))
+
+    def status(self, folder, items=None):
+        """
+        执行 STATUS，不必 SELECT 即可取得 {"messages", "uidnext", "uidvalidity"}，
+        启用 CONDSTORE 时还包括 "highestmodseq"。
+        """
+        if items is None:
+            items = STATUS_ITEMS
+            if self.condstore:
+                items = items[:-1] + " HIGHESTMODSEQ)"
+        status, data = self.mail.status(quote_mailbox(folder), items)
+        return parse_status_response(self._check(status, data, f"STATUS {folder}"))
+
+    def _untagged_int(self, name):
+        _, values = self.mail.response(name)
+        values = [v for v in values or [] if v]
+        return int(values[-1]) if values else None
+
+    def uid_search(self, criteria="ALL"):
+        """执行 UID SEARCH，返回升序 UID 列表"""
+        status, data = self.mail.uid("SEARCH", None, criteria)
+        data = self._check(status, data, f"UID SEARCH {criteria}")
+        return sorted(int(uid) for uid in (data[0] or b"").split())
+
+    def uids_after(self, last_uid):
+        """
+        返回大于 last_uid 的所有 UID。注意 "n:*" 在没有新邮件时也会返回最后一封，
+        因此需要再过滤一次。
+        """
+        return [
+            uid for uid in self.uid_search(f"UID {last_uid + 1}:*") if uid > last_uid
+        ]
+
+    def uid_fetch(self, uids, items, modifiers=None):
+        """
+        对一组 UID 执行 UID FETCH，返回 imaplib 原始数据。
+
+        :param modifiers: FETCH 修饰符，例如 "(CHANGEDSINCE 123 VANISHED)"
+        """
+        uid_set = uids if isinstance(uids, str) else format_uid_set(uids)
+        args = (uid_set, items) if modifiers is None else (uid_set, items, modifiers)
+        status, data = self.mail.uid("FETCH", *args)
+        return self._check(status, data, f"UID FETCH {uid_set} {items}")
+
+    def vanished(self):
+        """取出 QRESYNC 的 VANISHED 响应中的 UID（被服务器删除的邮件）"""
+        _, values = self.mail.response("VANISHED")
+        uids = set()
+        for value in values or []:
+            if not value:
+                continue
+            text = value.decode() if isinstance(value, bytes) else value
+            uids.update(parse_uid_set(text.replace("(EARLIER)", "").strip()))
+        return uids
+
+    def fetch_sizes(self, uids, chunk_size=SIZE_CHUNK):
+        """
+        分块获取邮件大小（RFC822.SIZE），服务器上已不存在的 UID 不在结果中。
+
+        :return: {uid: 字节数}
+        """
+        uids = list(uids)
+        sizes = {}
+        for start in range(0, len(uids), chunk_size):
+            data = self.uid_fetch(uids[start : start + chunk_size], "(UID RFC822.SIZE)")
+            for uid, values in fetch_by_uid(data).items():
+                if values.get(b"RFC822.SIZE") is not None:
+                    sizes[uid] = int(values[b"RFC822.SIZE"])
+        return sizes
+
+    def fetch_messages(self, uids, batch_size=50):
+        """
+        分批下载完整邮件，产出 (uid, 原始字节)。使用 BODY.PEEK[] 不会把邮件标为已读。
+
+        启用自适应分批时按字节预算装批，batch_size 不再起作用；否则每批 batch_size 封。
+        每封邮件的 literal 分块写入临时文件（见 imap.transport.LiteralSpool），
+        产出时才逐封读回内存，峰值内存约为单封邮件而不是整批。
+        """
+        uids = list(uids)
+        if self.batcher is not None and len(uids) > 1:
+            yield from self._fetch_adaptive(uids)
+            return
+        for start in range(0, len(uids), batch_size):
+            yield from self._fetch_batch(uids[start : start + batch_size])
+
+    def _fetch_batch(self, batch):
+        yield from self._read_spooled(self._fetch_spooled(batch))
+
+    def _fetch_spooled(self, batch):
+        """
+        下载一批邮件，返回 [(uid, 临时文件或字节)]。连接不支持 literal_sink 时
+        （literal 直接出现在返回数据中）使用原始字节。
+        """
+        spool = LiteralSpool()
+        self.mail.literal_sink = spool
+        try:
+            data = self.uid_fetch(batch, "(UID BODY.PEEK[])")
+        except BaseException:
+            spool.close()
+            raise
+        finally:
+            self.mail.literal_sink = None
+        files = iter(spool.files)
+        messages = []
+        for uid, _, literal in iter_fetch_literals(data):
+            if spool.files:
+                body = next(files, None)
+            else:
+                body = literal if isinstance(literal, bytes) else None
+            if uid is None or body is None:
+                if hasattr(body, "close"):
+                    body.close()
+                logger.warning(f"邮件数据格式异常，跳过: {batch}")
+                continue
+            messages.append((uid, body))
+        return messages
+
+    @staticmethod
+    def _read_spooled(messages):
+        """逐封读回 _fetch_spooled 的结果并删除临时文件"""
+        try:
+            for uid, body in messages:
+                if hasattr(body, "read"):
+                    body.seek(0)
+                    data = body.read()
+                    body.close()
+                    body = data
+                yield uid, body
+        finally:
+            for _, body in messages:
+                if hasattr(body, "close"):
+                    body.close()
+
+    def _fetch_adaptive(self, uids):
+        sizes = self.fetch_sizes(uids)
+        uids = [uid for uid in uids if uid in sizes]
+        position = 0
+        while position < len(uids):
+            batch = self.batcher.take(uids, sizes, position)
+            nbytes = sum(sizes[uid] for uid in batch)
+            started = time.monotonic()
+            try:
+                messages = self._fetch_spooled(batch)
+            except TimeoutError:
+                self.batcher.record_timeout(nbytes)
+                if len(batch) == 1:
+                    raise  # 单封邮件也无法在超时内下载完成，交给调用方处理
+                # 超时后连接状态未知，重新连接并以更小的批次重试
+                self.reconnect()
+                continue
+            self.batcher.record(nbytes, time.monotonic() - started)
+            position += len(batch)
+            yield from self._read_spooled(messages)
+
+    def reconnect(self):
+        """断开后重新登录，并重新选中原来的文件夹"""
+        folder = self.folder
+        logger.info(f"邮箱 {self.username} 重新连接")
+        if self.mail is not None:
+            try:
+                self.mail.shutdown()
+            except Exception:
+                pass
+            self.mail = None
+            self.folder = None
+        self.login()
+        if folder is not None:
+            self.select(folder)
+
+    def fetch_to_file(self, uid, section, fileobj):
+        """
+        下载单封邮件的一个部分，literal 按块写入 fileobj，不在内存中缓存整个部分。
+
+        :return: 写入的字节数（传输编码解码前），服务器未返回该部分时为 0
+        """
+        before = self.mail.streamed_bytes
+        self.mail.literal_sink = fileobj
+        try:
+            self.uid_fetch([uid], f"(UID BODY.PEEK[{section}])")
+        finally:
+            self.mail.literal_sink = None
+        return self.mail.streamed_bytes - before
+
+    def noop(self):
+        """发送 NOOP，返回服务器最新通告的 EXISTS 数（没有则为 None）"""
+        self.mail.noop()
+        return self._untagged_int("EXISTS")
+
+    def logout(self):
+        if self.mail is None:
+            return
+        ratio = self.mail.compression_ratio()
+        if ratio is not None:
+            logger.info(
+                f"邮箱 {self.username} 压缩传输 {self.mail.wire_bytes_in} 字节，"
+                f"压缩比 {ratio:.1f}"
+            )
+        try:
+            if self.folder is not None:
+                self.mail.close()
+        except imaplib.IMAP4.error:
+            pass
+        finally:
+            try:
+                self.mail.logout()
+            except Exception:
+                pass
+            self.mail = None
+            self.folder = None
+            logger.info(f"邮箱 {self.username} 已断开连接")
+
+    def __enter__(self):
+        self.login()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.logout()
@@ -0,0 +1,176 @@
+# ./flags.py
+"""
+IMAP 标记（\\Seen、\\Flagged 等）和服务器删除的本地镜像。
+
+- 启用 CONDSTORE 时，HIGHESTMODSEQ 与上次相同说明没有任何标记变化，直接返回；
+  否则用 UID FETCH ... (CHANGEDSINCE <modseq>) 只取变化过的邮件；
+- 启用 QRESYNC 时同一条命令加上 VANISHED 修饰符，服务器同时返回被删除的 UID；
+  只有 CONDSTORE 时，EXISTS 与本地邮件数之差和上次 UID SEARCH 时不同才重新 SEARCH，
+  找出被删除的邮件（解析失败未入库的邮件不会导致每次都 SEARCH）；
+- 服务器都不支持时分块比对全部 UID 的标记，但最多每 full_interval 秒一次，
+  其余时候只按 EXISTS 与 COUNT(*) 检测删除。
+
+新入库、尚未同步过标记的邮件总是单独分块获取一次。刚同步过新邮件的调用方可以
+传入当时 SELECT 的结果，省去一次 SELECT 往返。
+"""
+import logging
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.db_operations import (
+    count_folder_emails,
+    folder_uids,
+    get_sync_state,
+    mark_expunged,
+    reset_uidvalidity,
+    update_flags,
+)
+from imap.response import fetch_by_uid
+
+logger = logging.getLogger(__name__)
+
+FLAG_CHUNK_SIZE = 1000
+# 不支持 CONDSTORE 时两次全量比对标记的默认间隔（秒）
+DEFAULT_FULL_INTERVAL = 3600
+
+
+def parse_flags(values):
+    """FETCH 响应中的 FLAGS 列表 -> 标记字符串集合"""
+    return {bytes(flag).decode() for flag in values.get(b"FLAGS") or []}
+
+
+def fetch_flags(client, uids, chunk_size=FLAG_CHUNK_SIZE):
+    """
+    分块获取指定 UID 的标记。
+
+    :return: ({uid: 标记集合}, 服务器上已不存在的 UID 集合)
+    """
+    flags = {}
+    missing = set()
+    uids = sorted(uids)
+    for start in range(0, len(uids), chunk_size):
+        chunk = uids[start : start + chunk_size]
+        returned = {
+            uid: parse_flags(values)
+            for uid, values in fetch_by_uid(
+                client.uid_fetch(chunk, "(UID FLAGS)")
+            ).items()
+        }
+        flags.update(returned)
+        missing.update(uid for uid in chunk if uid not in returned)
+    return flags, missing
+
+
+def fetch_changed_flags(client, last_uid, modseq):
+    """
+    CONDSTORE：只获取 modseq 之后变化过的标记；启用 QRESYNC 时一并取得被删除的 UID。
+
+    :return: ({uid: 标记集合}, 被删除的 UID 集合)
+    """
+    modifier = f"CHANGEDSINCE {modseq}" + (" VANISHED" if client.qresync else "")
+    data = client.uid_fetch(f"1:{last_uid}", "(UID FLAGS)", f"({modifier})")
+    flags = {uid: parse_flags(values) for uid, values in fetch_by_uid(data).items()}
+    vanished = client.vanished() if client.qresync else set()
+    return flags, vanished
+
+
+def sync_flags(
+    client,
+    session,
+    account_name,
+    folder="INBOX",
+    mailbox=None,
+    full_interval=DEFAULT_FULL_INTERVAL,
+):
+    """
+    把服务器上的标记和删除同步到本地，开销与变化数量成正比（服务器支持 CONDSTORE 时）。
+
+    :param mailbox: 调用方刚刚 SELECT 该文件夹得到的结果；为 None 时重新 SELECT
+    :param full_interval: 不支持 CONDSTORE 时两次全量比对标记的最小间隔（秒）
+    :return: {"flags": 标记变化的邮件数, "expunged": 新发现被删除的邮件数}
+    """
+    state = get_sync_state(session, account_name, folder)
+    if mailbox is None:
+        # 重新 SELECT 一次（单次往返）以取得最新的 EXISTS 和 HIGHESTMODSEQ
+        mailbox = client.select(folder)
+    reset_uidvalidity(session, state, mailbox["uidvalidity"])
+    modseq = mailbox.get("highestmodseq") if client.condstore else None
+
+    flags, gone = {}, set()
+    unsynced = folder_uids(session, account_name, folder, unsynced_only=True)
+    if unsynced:
+        flags, gone = fetch_flags(client, unsynced)
+
+    if modseq is not None and state.highestmodseq is not None:
+        if modseq != state.highestmodseq and state.last_uid:
+            changed, vanished = fetch_changed_flags(
+                client, state.last_uid, state.highestmodseq
+            )
+            flags.update(changed)
+            gone |= vanished
+        if not client.qresync:
+            gone |= _find_expunged(client, session, state, mailbox)
+    elif _full_sync_due(state, full_interval):
+        # 没有 CONDSTORE（或还没有基准 modseq）：分块比对全部本地 UID
+        known = set(unsynced)
+        rest = [
+            uid
+            for uid in folder_uids(session, account_name, folder)
+            if uid not in known
+        ]
+        if rest:
+            rest_flags, rest_gone = fetch_flags(client, rest)
+            flags.update(rest_flags)
+            gone |= rest_gone
+        state.flags_full_sync_at = _utcnow()
+    else:
+        gone |= _find_expunged(client, session, state, mailbox)
+
+    changed = update_flags(session, account_name, folder, flags)
+    expunged = mark_expunged(session, account_name, folder, gone)
+    state.highestmodseq = modseq
+    session.commit()
+    if changed or expunged:
+        logger.info(
+            f"{account_name}/{folder} 标记变化 {changed} 封，服务器删除 {expunged} 封"
+        )
+    return {"flags": changed, "expunged": expunged}
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _full_sync_due(state, full_interval):
+    last = state.flags_full_sync_at
+    if last is None:
+        return True
+    if last.tzinfo is not None:
+        last = last.astimezone(timezone.utc).replace(tzinfo=None)
+    return _utcnow() - last >= timedelta(seconds=full_interval)
+
+
+def _find_expunged(client, session, state, mailbox):
+    """
+    没有 QRESYNC 时检测服务器删除：服务器 EXISTS 与本地邮件数（COUNT(*)）之差
+    等于上次记录的未入库邮件数时认为没有删除，否则才加载本地 UID、用 UID SEARCH
+    取得服务器上的全部 UID 做差集，并重新记录未入库邮件数。
+    """
+    exists = mailbox.get("exists")
+    if exists is not None:
+        count = count_folder_emails(session, state.account, state.folder)
+        if exists - count == (state.unstored or 0):
+            return set()
+    local = folder_uids(session, state.account, state.folder)
+    server = set(client.uid_search("ALL"))
+    gone = {uid for uid in local if uid not in server}
+    state.unstored = len(server) - (len(local) - len(gone))
+    if state.unstored:
+        logger.debug(
+            f"{state.account}/{state.folder} 服务器上有 {state.unstored} 封邮件未入库"
+        )
+    return gone
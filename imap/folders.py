@@ -0,0 +1,161 @@
+# ./folders.py
+"""
+IMAP 文件夹工具：修改版 UTF-7 文件夹名编解码（RFC 3501 5.1.3）、
+LIST / STATUS 响应解析，以及按特殊用途（RFC 6154）和常见名称确定同步优先级。
+"""
+import base64
+import re
+from dataclasses import dataclass
+
+from imap.response import Literal, parse_response
+
+STATUS_ITEMS = "(MESSAGES UIDNEXT UIDVALIDITY)"
+
+# 数字越小越先同步；None 表示不同步
+SPECIAL_USE_PRIORITY = {
+    b"\\INBOX": 0,
+    b"\\FLAGGED": 20,
+    b"\\SENT": 30,
+    b"\\ARCHIVE": 40,
+    b"\\ALL": None,  # Gmail 的“所有邮件”与其他文件夹重复
+    b"\\DRAFTS": None,
+    b"\\JUNK": None,
+    b"\\TRASH": None,
+}
+DEFAULT_PRIORITY = 10  # 普通文件夹（例如按银行分类的子文件夹）
+# 服务器未声明特殊用途时按名称识别（QQ/126/163 的常见文件夹名）
+NAME_PRIORITY = {
+    "sent messages": 30,
+    "sent": 30,
+    "已发送": 30,
+    "archive": 40,
+    "归档": 40,
+    "drafts": None,
+    "草稿箱": None,
+    "deleted messages": None,
+    "trash": None,
+    "已删除": None,
+    "junk": None,
+    "spam": None,
+    "垃圾邮件": None,
+    "病毒文件夹": None,
+}
+SKIP_FLAGS = {b"\\NOSELECT", b"\\NONEXISTENT"}
+
+_ENCODED_RE = re.compile(r"&([^-]*)-")
+
+
+def decode_modified_utf7(name):
+    """把服务器返回的修改版 UTF-7 文件夹名解码为 Unicode，例如 "&XfJT0ZAB-" -> "已发送" """
+
+    def replace(match):
+        encoded = match.group(1)
+        if not encoded:
+            return "&"
+        encoded = encoded.replace(",", "/")
+        encoded += "=" * (-len(encoded) % 4)
+        return base64.b64decode(encoded).decode("utf-16-be")
+
+    return _ENCODED_RE.sub(replace, name)
+
+
+def encode_modified_utf7(name):
+    """把 Unicode 文件夹名编码为修改版 UTF-7，用于 SELECT / STATUS 命令"""
+    result = []
+    pending = []
+
+    def flush():
+        if pending:
+            encoded = base64.b64encode("".join(pending).encode("utf-16-be"))
+            result.append(
+                "&" + encoded.decode("ascii").rstrip("=").replace("/", ",") + "-"
+            )
+            pending.clear()
+
+    for char in name:
+        if 0x20 <= ord(char) <= 0x7E:
+            flush()
+            result.append("&-" if char == "&" else char)
+        else:
+            pending.append(char)
+    flush()
+    return "".join(result)
+
+
+def quote_mailbox(name):
+    """编码并加引号，得到可直接放进命令的文件夹参数"""
+    encoded = encode_modified_utf7(name)
+    return '"' + encoded.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+@dataclass(frozen=True)
+class Folder:
+    """LIST 返回的文件夹"""
+
+    name: str  # 已解码的 Unicode 名称
+    delimiter: str
+    flags: frozenset
+
+    @property
+    def selectable(self):
+        return not (self.flags & SKIP_FLAGS)
+
+    def priority(self):
+        """同步优先级，None 表示跳过"""
+        if self.name.upper() == "INBOX":
+            return 0
+        for flag in self.flags:
+            if flag in SPECIAL_USE_PRIORITY:
+                return SPECIAL_USE_PRIORITY[flag]
+        leaf = self.name.rsplit(self.delimiter, 1)[-1] if self.delimiter else self.name
+        return NAME_PRIORITY.get(leaf.lower(), DEFAULT_PRIORITY)
+
+
+def _text(value):
+    if value is None:
+        return ""
+    return bytes(value).decode("utf-8", errors="replace")
+
+
+def parse_list_response(data):
+    """
+    解析 LIST 的返回数据，例如 b'(\\HasNoChildren) "/" "&XfJT0ZAB-"'。
+
+    :return: [Folder]
+    """
+    folders = []
+    for item in data:
+        if not item:
+            continue
+        values = parse_response([item])
+        if len(values) < 3 or not isinstance(values[0], list):
+            continue
+        flags, delimiter, name = values[0], values[1], values[2]
+        folders.append(
+            Folder(
+                name=decode_modified_utf7(_text(name)),
+                delimiter=_text(delimiter),
+                flags=frozenset(bytes(flag).upper() for flag in flags),
+            )
+        )
+    return folders
+
+
+def parse_status_response(data):
+    """
+    解析 STATUS 的返回数据，例如 b'"INBOX" (MESSAGES 3 UIDNEXT 10 UIDVALIDITY 1)'。
+
+    :return: {"messages": 3, "uidnext": 10, "uidvalidity": 1}
+    """
+    for item in data:
+        if not item:
+            continue
+        values = parse_response([item])
+        if len(values) >= 2 and isinstance(values[-1], list):
+            pairs = values[-1]
+            return {
+                bytes(pairs[i]).decode().lower(): int(pairs[i + 1])
+                for i in range(0, len(pairs) - 1, 2)
+                if not isinstance(pairs[i + 1], (list, Literal))
+            }
+    return {}
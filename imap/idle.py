@@ -0,0 +1,241 @@
+# ./idle.py
+import imaplib
+import logging
+import os
+import re
+import select
+import sys
+import threading
+import time
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from imap.client import EmailClient, IMAPClientError
+from imap.flags import sync_flags
+from imap.sync import sync_new_messages
+
+logger = logging.getLogger(__name__)
+
+# RFC 2177 要求客户端在 29 分钟内重新发起 IDLE，留出余量
+IDLE_TIMEOUT = 25 * 60
+# 不支持 IDLE 时的 NOOP 轮询间隔（秒）：有新邮件时回到最小值，空闲时逐步加倍
+POLL_MIN_INTERVAL = 15
+POLL_MAX_INTERVAL = 300
+# 连接断开后的重连等待上限（秒）
+RECONNECT_MAX_DELAY = 300
+
+_EXISTS_RE = re.compile(rb"^\* \d+ (EXISTS|RECENT)\b", re.IGNORECASE)
+# 其他客户端修改标记（FETCH FLAGS）或删除邮件（EXPUNGE / QRESYNC 的 VANISHED）
+_CHANGE_RE = re.compile(rb"^\* (\d+ (FETCH|EXPUNGE)|VANISHED)\b", re.IGNORECASE)
+
+
+class _SocketLineReader:
+    """
+    直接从 socket 按行读取服务器响应，可设置超时且不会丢失半行数据。
+    IDLE 期间绕开 imaplib 的缓冲文件对象，避免阻塞读。
+    """
+
+    def __init__(self, sock, decompress=None, buffered=b""):
+        self.sock = sock
+        self.decompress = decompress  # 连接启用 COMPRESS=DEFLATE 时解压收到的数据
+        self.buffer = buffered
+
+    def _data_ready(self, timeout):
+        # SSL 层可能已解密但尚未读取的数据，select 看不到
+        if hasattr(self.sock, "pending") and self.sock.pending():
+            return True
+        readable, _, _ = select.select([self.sock], [], [], timeout)
+        return bool(readable)
+
+    def read_line(self, timeout):
+        """读取一行（不含 CRLF），超时返回 None"""
+        deadline = time.monotonic() + timeout
+        while b"\r\n" not in self.buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._data_ready(remaining):
+                return None
+            data = self.sock.recv(65536)
+            if not data:
+                raise imaplib.IMAP4.abort("服务器关闭了连接")
+            if self.decompress is not None:
+                data = self.decompress(data)
+            self.buffer += data
+        line, self.buffer = self.buffer.split(b"\r\n", 1)
+        return line
+
+
+def idle_wait(mail, timeout, stop_event=None, tick=1.0):
+    """
+    发送 IDLE 并等待服务器推送，收到新邮件、标记变化或删除通知，超时或 stop_event
+    被设置时结束。
+
+    :param mail: 已选中文件夹的 imaplib.IMAP4 连接
+    :param timeout: 最长等待秒数
+    :param stop_event: threading.Event，设置后尽快退出
+    :param tick: 检查 stop_event 的间隔
+    :return: IDLE 期间收到的未标记响应行列表
+    """
+    tag = mail._new_tag()
+    mail.send(tag + b" IDLE\r\n")
+    take_buffered = getattr(mail, "take_buffered", None)
+    reader = _SocketLineReader(
+        mail.socket(),
+        decompress=getattr(mail, "decompress", None),
+        buffered=take_buffered() if take_buffered else b"",
+    )
+
+    line = reader.read_line(30)
+    if line is None or not line.startswith(b"+"):
+        raise IMAPClientError(f"服务器拒绝 IDLE: {line!r}")
+
+    responses = []
+    deadline = time.monotonic() + timeout
+    try:
+        while time.monotonic() < deadline:
+            if stop_event is not None and stop_event.is_set():
+                break
+            line = reader.read_line(min(tick, deadline - time.monotonic()))
+            if line is None:
+                continue
+            responses.append(line)
+            if _EXISTS_RE.match(line) or _CHANGE_RE.match(line):
+                break
+    finally:
+        mail.send(b"DONE\r\n")
+        while True:
+            line = reader.read_line(30)
+            if line is None:
+                raise imaplib.IMAP4.abort("等待 IDLE 结束响应超时")
+            if line.startswith(tag):
+                if not line[len(tag) :].strip().upper().startswith(b"OK"):
+                    raise IMAPClientError(f"IDLE 结束失败: {line!r}")
+                break
+            responses.append(line)
+    return responses
+
+
+def has_new_mail(responses):
+    """IDLE 响应中是否包含新邮件通知"""
+    return any(_EXISTS_RE.match(line) for line in responses)
+
+
+def has_changes(responses):
+    """IDLE 响应中是否包含标记变化或删除通知"""
+    return any(_CHANGE_RE.match(line) for line in responses)
+
+
+class IdleDaemon:
+    """
+    常驻同步进程：启动时补齐增量，之后通过 IMAP IDLE 等待新邮件推送，
+    服务器不支持 IDLE（如 126 邮箱）时退化为自适应间隔的 NOOP 轮询。
+    只下载服务器新通告的 UID，断线后自动重连。
+    """
+
+    def __init__(
+        self,
+        account,
+        session_factory,
+        folder="INBOX",
+        idle_timeout=IDLE_TIMEOUT,
+        poll_min=POLL_MIN_INTERVAL,
+        poll_max=POLL_MAX_INTERVAL,
+        attachments_dir=None,
+        policy=None,
+        slow_tracker=None,
+    ):
+        self.account = account
+        self.session_factory = session_factory
+        self.folder = folder
+        self.idle_timeout = idle_timeout
+        self.poll_min = poll_min
+        self.poll_max = poll_max
+        self.attachments_dir = attachments_dir
+        self.policy = policy
+        self.slow_tracker = slow_tracker
+        self.stop_event = threading.Event()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        """运行直到 stop() 被调用"""
+        delay = 1
+        while not self.stop_event.is_set():
+            client = EmailClient.from_account(self.account)
+            try:
+                client.login()
+                delay = 1
+                self._serve(client)
+            except (imaplib.IMAP4.error, IMAPClientError, OSError) as e:
+                logger.warning(
+                    f"{self.account.name}/{self.folder} 连接异常: {e}，{delay} 秒后重连"
+                )
+                self.stop_event.wait(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+            finally:
+                client.logout()
+        logger.info(f"{self.account.name}/{self.folder} 同步进程已停止")
+
+    def _sync(self, client, session):
+        fresh = client.folder != self.folder  # 本次同步会重新 SELECT
+        saved = sync_new_messages(
+            client,
+            session,
+            self.account.name,
+            self.folder,
+            batch_size=self.account.fetch_batch_size,
+            commit_interval=self.account.commit_interval,
+            parse_workers=self.account.parse_workers,
+            partial=self.account.partial_fetch,
+            attachments_dir=self.attachments_dir,
+            policy=self.policy,
+            slow_tracker=self.slow_tracker,
+        )
+        self._sync_flags(client, session, client.mailbox if fresh else None)
+        return saved
+
+    def _sync_flags(self, client, session, mailbox=None):
+        sync_flags(
+            client,
+            session,
+            self.account.name,
+            self.folder,
+            mailbox=mailbox,
+            full_interval=self.account.flag_full_sync_interval,
+        )
+
+    def _serve(self, client):
+        session = self.session_factory()
+        try:
+            self._sync(client, session)
+            if self.account.idle and client.has_capability("IDLE"):
+                logger.info(f"{self.account.name}/{self.folder} 进入 IDLE 推送模式")
+                self._idle_loop(client, session)
+            else:
+                logger.info(
+                    f"{self.account.name}/{self.folder} 不使用 IDLE，改为自适应 NOOP 轮询"
+                )
+                self._poll_loop(client, session)
+        finally:
+            session.close()
+
+    def _idle_loop(self, client, session):
+        while not self.stop_event.is_set():
+            responses = idle_wait(client.mail, self.idle_timeout, self.stop_event)
+            if has_new_mail(responses):
+                self._sync(client, session)
+            elif has_changes(responses):
+                self._sync_flags(client, session)
+
+    def _poll_loop(self, client, session):
+        interval = self.poll_min
+        last_exists = client.noop()
+        while not self.stop_event.wait(interval):
+            exists = client.noop()
+            if exists is not None and exists != last_exists:
+                last_exists = exists
+                if self._sync(client, session):
+                    interval = self.poll_min
+                    continue
+            interval = min(interval * 2, self.poll_max)
@@ -0,0 +1,182 @@
+# ./parallel.py
+"""
+同一文件夹内的并行下载：把待下载的 UID 按顺序切成连续区间，由多个已登录的连接
+同时下载，结果按 UID 顺序合并成一个流，调用方仍按原来的顺序写库和提交。
+
+连接数不超过账户的 max_connections；服务器拒绝额外连接时，剩余区间由已建立的
+连接继续下载，因此吞吐量随连接数增长，直到达到服务器自身的限制。
+"""
+import logging
+import os
+import sys
+import threading
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from imap.client import EmailClient, IMAPClientError
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_PER_CONNECTION = 2  # 每个连接最多领先消费者的区间数，限制内存占用
+
+
+def partition_uids(uids, size):
+    """按顺序把 UID 切成每段 size 个的连续区间，区间内的 UID 能压缩成紧凑的序列集"""
+    uids = sorted(uids)
+    return [uids[start : start + size] for start in range(0, len(uids), size)]
+
+
+class ParallelFetcher:
+    """
+    多连接并行下载器，接口与 EmailClient.fetch_messages 相同，可直接传给
+    imap.sync.iter_parsed_messages。
+
+    :param account: utils.config.AccountConfig
+    :param folder: 文件夹名
+    :param workers: 连接数，上限为 account.max_connections
+    :param client: 可选的已登录客户端，作为其中一个连接复用，不额外计入连接数
+    :param client_factory: 创建新连接的函数，默认 EmailClient.from_account
+    """
+
+    def __init__(
+        self, account, folder="INBOX", workers=None, client=None, client_factory=None
+    ):
+        self.account = account
+        self.folder = folder
+        self.workers = max(
+            1, min(workers or account.max_connections, account.max_connections)
+        )
+        self.client = client
+        self.client_factory = client_factory or EmailClient.from_account
+
+    def fetch_messages(self, uids, batch_size=50):
+        """
+        并行下载完整邮件，按 UID 升序产出 (uid, 原始字节)。
+        中途停止迭代时，后台连接会在当前区间下载完成后退出。
+        """
+        chunks = partition_uids(uids, batch_size)
+        if not chunks:
+            return
+        workers = min(self.workers, len(chunks))
+        run = _FetchRun(chunks, window=workers * PREFETCH_PER_CONNECTION)
+        threads = [
+            threading.Thread(
+                target=self._worker,
+                args=(run, self.client if i == 0 else None),
+                name=f"fetch-{self.account.name}-{i}",
+                daemon=True,
+            )
+            for i in range(workers)
+        ]
+        run.alive = len(threads)
+        for thread in threads:
+            thread.start()
+        logger.info(
+            f"{self.account.name}/{self.folder} 使用 {workers} 个连接并行下载 "
+            f"{sum(len(chunk) for chunk in chunks)} 封邮件"
+        )
+        try:
+            for index in range(len(chunks)):
+                yield from run.take(index)
+        finally:
+            run.cancel()
+            for thread in threads:
+                thread.join()
+
+    def _worker(self, run, client):
+        """在单个连接上不断领取下一个区间下载，连接失败时把区间交还给其他连接"""
+        owned = client is None
+        if owned:
+            client = self.client_factory(self.account)
+        try:
+            if owned:
+                client.login()
+            if client.folder != self.folder:
+                client.select(self.folder)
+            while True:
+                index = run.next_chunk()
+                if index is None:
+                    break
+                try:
+                    messages = list(
+                        client.fetch_messages(
+                            run.chunks[index], batch_size=len(run.chunks[index])
+                        )
+                    )
+                except Exception:
+                    run.requeue(index)
+                    raise
+                run.complete(index, messages)
+        except Exception as e:
+            logger.warning(f"{threading.current_thread().name} 连接退出: {e}")
+            run.finish(e)
+        else:
+            run.finish()
+        finally:
+            if owned:
+                client.logout()
+
+
+class _FetchRun:
+    """一次并行下载的共享状态：待领取的区间、已完成的结果和存活连接数"""
+
+    def __init__(self, chunks, window):
+        self.chunks = chunks
+        self.window = window
+        self.pending = list(range(len(chunks)))  # 按顺序领取，重试的区间插回队首
+        self.results = {}
+        self.consumed = 0
+        self.alive = 0
+        self.error = None
+        self.cancelled = False
+        self.cond = threading.Condition()
+
+    def next_chunk(self):
+        """领取下一个区间；超出预取窗口时等待消费者，全部领完或已取消时返回 None"""
+        with self.cond:
+            while True:
+                if self.cancelled or not self.pending:
+                    return None
+                if self.pending[0] < self.consumed + self.window:
+                    return self.pending.pop(0)
+                self.cond.wait()
+
+    def requeue(self, index):
+        with self.cond:
+            self.pending.append(index)
+            self.pending.sort()
+            self.cond.notify_all()
+
+    def complete(self, index, messages):
+        with self.cond:
+            self.results[index] = messages
+            self.cond.notify_all()
+
+    def finish(self, error=None):
+        """连接退出，error 为连接异常（正常结束时为 None）"""
+        with self.cond:
+            self.alive -= 1
+            if error is not None:
+                self.error = error
+            self.cond.notify_all()
+
+    def take(self, index):
+        """等待第 index 个区间下载完成并取出；所有连接都已退出时抛出最后的错误"""
+        with self.cond:
+            while index not in self.results:
+                if self.alive == 0:
+                    raise IMAPClientError(
+                        f"并行下载中断，剩余 {len(self.chunks) - index} 个区间未下载: "
+                        f"{self.error}"
+                    )
+                self.cond.wait()
+            messages = self.results.pop(index)
+            self.consumed = index + 1
+            self.cond.notify_all()
+        return messages
+
+    def cancel(self):
+        with self.cond:
+            self.cancelled = True
+            self.cond.notify_all()
@@ -0,0 +1,204 @@
+# ./partial.py
+import base64
+import binascii
+import logging
+import os
+import quopri
+import sys
+from collections import defaultdict
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from imap.bodystructure import parse_bodystructure, select_body_parts
+from imap.response import fetch_by_uid
+from parsers.body_parser import decode_payload
+from parsers.eml_parser import parse_header_bytes
+
+logger = logging.getLogger(__name__)
+
+# 第一轮请求：大小、MIME 结构和邮件头，不包含任何正文或附件数据
+STRUCTURE_ITEMS = "(UID RFC822.SIZE BODYSTRUCTURE BODY.PEEK[HEADER])"
+
+
+def decode_transfer_encoding(data, encoding):
+    """按 Content-Transfer-Encoding 解码部分内容"""
+    if data is None:
+        return None
+    encoding = (encoding or "7bit").lower()
+    try:
+        if encoding == "base64":
+            return base64.b64decode(data)
+        if encoding == "quoted-printable":
+            return quopri.decodestring(data)
+    except (binascii.Error, ValueError) as e:
+        logger.warning(f"{encoding} 解码失败: {e}")
+    return bytes(data)
+
+
+class TransferDecodingWriter:
+    """
+    边写边按 Content-Transfer-Encoding 解码的文件包装，配合分块读取的 literal 使用：
+    base64 每次只解码完整的 4 字节组，quoted-printable 按完整行解码，其余原样写入。
+    """
+
+    def __init__(self, fileobj, encoding):
+        self.fileobj = fileobj
+        self.encoding = (encoding or "7bit").lower()
+        self.pending = b""
+        self.size = 0
+
+    def _emit(self, data):
+        if data:
+            self.fileobj.write(data)
+            self.size += len(data)
+
+    def write(self, chunk):
+        if self.encoding == "base64":
+            data = self.pending + b"".join(bytes(chunk).split())
+            usable = len(data) - len(data) % 4
+            self.pending = data[usable:]
+            self._emit(base64.b64decode(data[:usable]))
+        elif self.encoding == "quoted-printable":
+            data = self.pending + bytes(chunk)
+            end = data.rfind(b"\n") + 1
+            self.pending = data[end:]
+            self._emit(quopri.decodestring(data[:end]))
+        else:
+            self._emit(bytes(chunk))
+
+    def close(self):
+        """写出剩余数据（不关闭底层文件）"""
+        if self.pending:
+            self._emit(decode_transfer_encoding(self.pending, self.encoding))
+            self.pending = b""
+
+
+def fetch_structures(client, uids):
+    """
+    获取一批邮件的 MIME 结构和邮件头。
+
+    :return: {uid: {"parts": [MimePart], "header": bytes, "size": int}}
+    """
+    structures = {}
+    for uid, values in fetch_by_uid(client.uid_fetch(uids, STRUCTURE_ITEMS)).items():
+        structures[uid] = {
+            "parts": parse_bodystructure(values.get(b"BODYSTRUCTURE") or []),
+            "header": bytes(values.get(b"BODY[HEADER]") or b""),
+            "size": int(values.get(b"RFC822.SIZE") or 0),
+        }
+    return structures
+
+
+def fetch_sections(client, sections_by_uid):
+    """
+    下载指定的 section。section 组合相同的邮件合并为一条 UID FETCH 命令。
+
+    :param sections_by_uid: {uid: [section, ...]}
+    :return: {uid: {section: 原始（未解码）字节}}
+    """
+    groups = defaultdict(list)
+    for uid, sections in sections_by_uid.items():
+        if sections:
+            groups[tuple(sorted(sections))].append(uid)
+
+    contents = defaultdict(dict)
+    for sections, uids in groups.items():
+        items = "(UID " + " ".join(f"BODY.PEEK[{s}]" for s in sections) + ")"
+        for uid, values in fetch_by_uid(client.uid_fetch(uids, items)).items():
+            for section in sections:
+                contents[uid][section] = values.get(f"BODY[{section}]".upper().encode())
+    return contents
+
+
+def download_part(client, uid, part):
+    """按需下载单个部分（例如附件），返回解码后的字节"""
+    contents = fetch_sections(client, {uid: [part.section]})
+    return decode_transfer_encoding(contents[uid].get(part.section), part.encoding)
+
+
+def download_part_to_file(client, uid, part, path):
+    """
+    按需下载单个部分并边下载边解码写入 path，内存占用与附件大小无关。
+
+    :return: 解码后的字节数；服务器未返回该部分时删除文件并返回 None
+    """
+    try:
+        with open(path, "wb") as f:
+            writer = TransferDecodingWriter(f, part.encoding)
+            received = client.fetch_to_file(uid, part.section, writer)
+            writer.close()
+    except Exception:
+        os.remove(path)
+        raise
+    if not received:
+        os.remove(path)
+        return None
+    return writer.size
+
+
+def fetch_partial_messages(client, uids, batch_size=50, attachment_filter=None):
+    """
+    两阶段部分下载：先取 BODYSTRUCTURE 和邮件头，再只下载正文部分
+    （以及 attachment_filter 允许的附件），其余附件只记录元信息。
+
+    :param client: 已选中文件夹的 imap.client.EmailClient
+    :param uids: 待下载的 UID 列表
+    :param batch_size: 每批邮件数
+    :param attachment_filter: 可选函数 f(MimePart) -> bool，为 True 的附件随正文一起下载
+    :return: 生成器，产出 (uid, parsed)，parsed 与 parse_email_bytes 的结构一致，
+             附件项额外包含 section、encoding 和 payload（未下载时为 None）
+    """
+    uids = list(uids)
+    for start in range(0, len(uids), batch_size):
+        batch = uids[start : start + batch_size]
+        structures = fetch_structures(client, batch)
+
+        wanted = {}
+        for uid, structure in structures.items():
+            bodies = select_body_parts(structure["parts"])
+            attachments = [p for p in structure["parts"] if p.is_attachment]
+            eager = [
+                p for p in attachments if attachment_filter and attachment_filter(p)
+            ]
+            structure.update(bodies=bodies, attachments=attachments)
+            wanted[uid] = [p.section for p in list(bodies.values()) + eager]
+
+        contents = fetch_sections(client, wanted)
+
+        for uid in batch:
+            structure = structures.get(uid)
+            if structure is None:
+                logger.warning(f"服务器未返回 UID {uid} 的结构，跳过")
+                continue
+            yield uid, _build_parsed(structure, contents.get(uid, {}))
+
+
+def _build_parsed(structure, contents):
+    parsed = parse_header_bytes(structure["header"])
+
+    for content_type, key in (
+        ("text/plain", "text_content"),
+        ("text/html", "html_content"),
+    ):
+        part = structure["bodies"].get(content_type)
+        parsed[key] = None
+        if part is not None:
+            raw = decode_transfer_encoding(contents.get(part.section), part.encoding)
+            parsed[key] = decode_payload(raw, part.charset)
+
+    parsed["attachments"] = [
+        {
+            "filename": part.filename or "unnamed",
+            "content_type": part.content_type,
+            "size": part.decoded_size,
+            "section": part.section,
+            "encoding": part.encoding,
+            "payload": decode_transfer_encoding(
+                contents.get(part.section), part.encoding
+            ),
+        }
+        for part in structure["attachments"]
+    ]
+    parsed["size"] = structure["size"]
+    return parsed
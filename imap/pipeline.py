@@ -0,0 +1,121 @@
+# ./pipeline.py
+"""
+下载 → 解析 → 写库 三级流水线。
+
+    下载线程 ──(有界队列)──> 解析线程池 ──(按 UID 顺序)──> 写库（调用方线程）
+
+- 下载线程不断从 IMAP 读取邮件并提交给解析线程池，网络等待期间解析和写库照常进行；
+- 队列中按提交顺序保存解析任务，写库一方按顺序取结果，因此同步位置仍按 UID 顺序推进，
+  中断后从最后一次提交的 UID 继续；
+- 队列有上限：写库或解析跟不上时下载线程阻塞（背压），内存中最多保留 queue_size 封、
+  合计 max_bytes 字节的邮件（单封超过 max_bytes 的邮件在队列为空时仍可放入）。
+
+吞吐量接近三个阶段中最慢的一个，而不是三者耗时之和。SQLAlchemy 会话不是线程安全的，
+因此写库始终在调用方线程中进行。
+"""
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 200
+DEFAULT_QUEUE_BYTES = 64 * 1024 * 1024
+_DONE = object()
+
+
+class _FetchFailed:
+    def __init__(self, error):
+        self.error = error
+
+
+def pipelined(
+    fetch,
+    parse,
+    workers=2,
+    queue_size=DEFAULT_QUEUE_SIZE,
+    max_bytes=DEFAULT_QUEUE_BYTES,
+    sizeof=None,
+):
+    """
+    以流水线方式执行 fetch 和 parse，按 fetch 产出的顺序产出 parse 的结果。
+
+    :param fetch: 无参函数，返回产出待解析数据的迭代器（在下载线程中执行）
+    :param parse: 解析函数 parse(item) -> 结果（在解析线程池中执行）
+    :param workers: 解析线程数
+    :param queue_size: 已下载但尚未写库的最大数量
+    :param max_bytes: 已下载但尚未写库的数据合计字节数上限
+    :param sizeof: sizeof(item) -> 字节数；为 None 时只按数量限制
+    """
+    pending = queue.Queue(maxsize=max(1, queue_size))
+    stop = threading.Event()
+    budget = threading.Condition()
+    queued_bytes = 0
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, workers), thread_name_prefix="parse"
+    )
+
+    def reserve(size):
+        # 字节预算用完时等待写库一方释放；队列为空时总是放行，避免超大邮件卡死
+        nonlocal queued_bytes
+        with budget:
+            while queued_bytes and queued_bytes + size > max_bytes:
+                if stop.is_set():
+                    return False
+                budget.wait(0.1)
+            queued_bytes += size
+        return True
+
+    def release(size):
+        nonlocal queued_bytes
+        with budget:
+            queued_bytes -= size
+            budget.notify_all()
+
+    def put(item, size=0):
+        # 队列满时阻塞等待写库一方；调用方提前结束时及时退出
+        while not stop.is_set():
+            try:
+                pending.put((item, size), timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run_fetch():
+        try:
+            for item in fetch():
+                size = sizeof(item) if sizeof is not None else 0
+                if not reserve(size):
+                    return
+                if not put(executor.submit(parse, item), size):
+                    return
+        except Exception as e:
+            logger.error(f"下载线程异常: {e}", exc_info=True)
+            put(_FetchFailed(e))
+            return
+        put(_DONE)
+
+    fetcher = threading.Thread(target=run_fetch, name="fetch", daemon=True)
+    fetcher.start()
+    try:
+        while True:
+            item, size = pending.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _FetchFailed):
+                raise item.error
+            result = item.result()
+            release(size)
+            yield result
+    finally:
+        stop.set()
+        # 排空队列，让阻塞在 put 上的下载线程尽快退出
+        while fetcher.is_alive():
+            try:
+                pending.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        fetcher.join()
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,136 @@
+# ./response.py
+"""
+IMAP 响应解析工具：把 imaplib 返回的原始数据（文本片段与 literal 交错）
+还原为嵌套列表，并把 FETCH 响应整理成按邮件划分的字典。
+"""
+import re
+
+_ATOM_SPECIALS = b' ()"\r\n'
+_LITERAL_RE = re.compile(rb"\{(\d+)\+?\}\s*$")
+
+
+class Literal(bytes):
+    """字符串值（引号字符串或 literal），与原子、括号区分开"""
+
+
+class ResponseParseError(ValueError):
+    """无法解析的 IMAP 响应"""
+
+
+def _tokenize_text(text, tokens):
+    i = 0
+    length = len(text)
+    while i < length:
+        ch = text[i : i + 1]
+        if ch in (b" ", b"\r", b"\n"):
+            i += 1
+        elif ch in (b"(", b")"):
+            tokens.append(ch)
+            i += 1
+        elif ch == b'"':
+            i += 1
+            value = bytearray()
+            while i < length and text[i : i + 1] != b'"':
+                if text[i : i + 1] == b"\\":
+                    i += 1
+                value += text[i : i + 1]
+                i += 1
+            i += 1  # 跳过结束引号
+            tokens.append(Literal(bytes(value)))
+        else:
+            start = i
+            depth = 0
+            # 原子内部允许出现 [...]，例如 BODY[HEADER.FIELDS (FROM TO)]
+            while i < length:
+                ch = text[i : i + 1]
+                if ch == b"[":
+                    depth += 1
+                elif ch == b"]":
+                    depth -= 1
+                elif depth == 0 and ch in _ATOM_SPECIALS:
+                    break
+                i += 1
+            atom = text[start:i]
+            tokens.append(None if atom.upper() == b"NIL" else atom)
+
+
+def tokenize(data):
+    """
+    把 imaplib 的返回数据拆成记号：b"(" / b")" / 原子(bytes) / Literal / None(NIL)。
+
+    :param data: imaplib 返回的列表，元素为 bytes 或 (描述行, literal) 元组
+    """
+    if isinstance(data, (bytes, bytearray)):
+        data = [bytes(data)]
+    tokens = []
+    for item in data:
+        if item is None:
+            continue
+        if isinstance(item, tuple):
+            meta, literal = item[0], item[1]
+            match = _LITERAL_RE.search(meta)
+            if match is None:
+                raise ResponseParseError(f"缺少 literal 长度标记: {meta!r}")
+            _tokenize_text(meta[: match.start()], tokens)
+            tokens.append(Literal(literal))
+        else:
+            _tokenize_text(item, tokens)
+    return tokens
+
+
+def parse_tokens(tokens):
+    """把记号序列解析为嵌套列表"""
+    stack = [[]]
+    for token in tokens:
+        if token == b"(" and not isinstance(token, Literal):
+            stack.append([])
+        elif token == b")" and not isinstance(token, Literal):
+            if len(stack) == 1:
+                raise ResponseParseError("括号不匹配")
+            finished = stack.pop()
+            stack[-1].append(finished)
+        else:
+            stack[-1].append(token)
+    if len(stack) != 1:
+        raise ResponseParseError("括号不匹配")
+    return stack[0]
+
+
+def parse_response(data):
+    """把原始响应解析为嵌套列表"""
+    return parse_tokens(tokenize(data))
+
+
+def _normalize_key(key):
+    # BODY.PEEK[...] 在响应中以 BODY[...] 返回
+    key = key.upper()
+    return key.replace(b"BODY.PEEK[", b"BODY[")
+
+
+def parse_fetch_response(data):
+    """
+    解析 FETCH/UID FETCH 的返回数据。
+
+    :return: {序号: {b"UID": b"12", b"BODY[1]": b"...", b"BODYSTRUCTURE": [...]}}
+    """
+    items = parse_response(data)
+    messages = {}
+    i = 0
+    while i + 1 < len(items):
+        seq, attributes = items[i], items[i + 1]
+        i += 2
+        if not isinstance(attributes, list):
+            raise ResponseParseError(f"FETCH 响应格式异常: {seq!r} {attributes!r}")
+        values = messages.setdefault(int(seq), {})
+        for j in range(0, len(attributes) - 1, 2):
+            values[_normalize_key(attributes[j])] = attributes[j + 1]
+    return messages
+
+
+def fetch_by_uid(data):
+    """同 parse_fetch_response，但以 UID（int）为键"""
+    result = {}
+    for values in parse_fetch_response(data).values():
+        if b"UID" in values:
+            result[int(values[b"UID"])] = values
+    return result
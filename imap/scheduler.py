@@ -0,0 +1,254 @@
+# ./scheduler.py
+"""
+全部文件夹同步调度：
+
+1. 每个账户用一个连接执行 LIST 发现文件夹，再对每个文件夹执行 STATUS（无需 SELECT）；
+2. UIDVALIDITY、UIDNEXT、MESSAGES（以及 CONDSTORE 的 HIGHESTMODSEQ）与上次同步完成时
+   记录的值都相同的文件夹直接跳过；
+3. 有变化的文件夹按优先级（收件箱 > 普通文件夹 > 已发送 > 归档）排队，
+   由若干工作线程同步，所有账户合计的连接数不超过全局预算，单个账户不超过其 max_connections。
+
+多文件夹同步的开销因此只与实际变化的文件夹数量有关。
+"""
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.db_operations import get_sync_state
+from imap.client import EmailClient
+from imap.flags import sync_flags
+from imap.sync import sync_new_messages
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONNECTION_BUDGET = 4
+
+
+@dataclass(order=True)
+class FolderJob:
+    priority: int
+    account: object = field(compare=False)
+    folder: str = field(compare=False)
+    status: dict = field(compare=False)
+
+
+def folder_changed(state, status):
+    """与上次同步完成时的 STATUS 快照比较，任何一项不同（或没有快照）都需要同步"""
+    if state is None:
+        return True
+    return (
+        state.uidvalidity != status.get("uidvalidity")
+        or state.uidnext is None
+        or state.uidnext != status.get("uidnext")
+        or state.messages != status.get("messages")
+        # 启用 CONDSTORE 时 STATUS 还带 HIGHESTMODSEQ，标记变化也能被发现
+        or (
+            "highestmodseq" in status and state.highestmodseq != status["highestmodseq"]
+        )
+    )
+
+
+class FolderScheduler:
+    """
+    多账户、多文件夹同步调度器。
+
+    :param accounts: utils.config.AccountConfig 列表
+    :param session_factory: SQLAlchemy 会话工厂
+    :param budget: 所有账户合计的最大并发连接数
+    :param client_factory: 创建连接的函数，默认 EmailClient.from_account
+    :param sync_options: 传给 sync_new_messages 的其他参数（attachments_dir、policy 等）
+    """
+
+    def __init__(
+        self,
+        accounts,
+        session_factory,
+        budget=DEFAULT_CONNECTION_BUDGET,
+        client_factory=None,
+        **sync_options,
+    ):
+        self.accounts = list(accounts)
+        self.session_factory = session_factory
+        self.budget = max(1, budget)
+        self.client_factory = client_factory or EmailClient.from_account
+        self.sync_options = sync_options
+        self._cond = threading.Condition()
+        self._jobs = []
+        self._in_use = {}
+
+    # ---- 发现 ----
+
+    def plan(self):
+        """LIST + STATUS 所有账户的文件夹，返回按优先级排序的待同步任务"""
+        jobs = []
+        with ThreadPoolExecutor(
+            max_workers=min(self.budget, len(self.accounts)) or 1,
+            thread_name_prefix="folder-plan",
+        ) as executor:
+            for account_jobs in executor.map(self._plan_account, self.accounts):
+                jobs.extend(account_jobs)
+        jobs.sort()
+        return jobs
+
+    def _plan_account(self, account):
+        client = self.client_factory(account)
+        session = self.session_factory()
+        try:
+            client.login()
+            folders = [folder for folder in client.list_folders() if folder.selectable]
+            jobs = []
+            skipped = 0
+            for folder in folders:
+                priority = folder.priority()
+                if priority is None:
+                    continue
+                status = client.status(folder.name)
+                state = get_sync_state(session, account.name, folder.name)
+                if folder_changed(state, status):
+                    jobs.append(FolderJob(priority, account, folder.name, status))
+                else:
+                    skipped += 1
+            session.rollback()  # 只读：不保存 get_sync_state 新建的空记录
+            logger.info(
+                f"{account.name} 共 {len(folders)} 个文件夹，"
+                f"{len(jobs)} 个有变化，{skipped} 个未变化已跳过"
+            )
+            return jobs
+        except Exception as e:
+            logger.error(f"{account.name} 获取文件夹列表失败: {e}")
+            return []
+        finally:
+            session.close()
+            client.logout()
+
+    # ---- 同步 ----
+
+    def run(self):
+        """
+        同步所有有变化的文件夹。
+
+        :return: {(账户名, 文件夹): 新入库邮件数}，同步失败的文件夹值为 None
+        """
+        self._jobs = self.plan()
+        if not self._jobs:
+            logger.info("所有文件夹均无变化")
+            return {}
+        self._in_use = {account.name: 0 for account in self.accounts}
+        results = {}
+        workers = min(self.budget, len(self._jobs))
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="folder-sync"
+        ) as executor:
+            for worker_results in executor.map(
+                lambda _: self._worker(), range(workers)
+            ):
+                results.update(worker_results)
+        return results
+
+    def _take(self, current):
+        """
+        取出优先级最高、且其账户还有空闲连接的任务。已持有某账户连接的线程
+        可以直接接手该账户的任务。没有剩余任务时返回 None。
+        """
+        with self._cond:
+            while self._jobs:
+                for i, job in enumerate(self._jobs):
+                    name = job.account.name
+                    if (
+                        name == current
+                        or self._in_use[name] < job.account.max_connections
+                    ):
+                        del self._jobs[i]
+                        if name != current:
+                            self._in_use[name] += 1
+                        return job
+                self._cond.wait()
+            return None
+
+    def _release(self, current):
+        with self._cond:
+            if current is not None:
+                self._in_use[current] -= 1
+            self._cond.notify_all()
+
+    def _worker(self):
+        results = {}
+        current = None
+        client = None
+        session = self.session_factory()
+        try:
+            while True:
+                job = self._take(current)
+                if job is None:
+                    break
+                if job.account.name != current:
+                    # 先断开旧账户的连接再归还名额，避免其他线程超出该账户的连接上限
+                    if client is not None:
+                        client.logout()
+                    self._release(current)
+                    current = job.account.name
+                    client = self.client_factory(job.account)
+                    try:
+                        client.login()
+                    except Exception as e:
+                        logger.error(f"{current} 登录失败: {e}")
+                        results[(current, job.folder)] = None
+                        client.logout()
+                        client = None
+                        self._release(current)
+                        current = None
+                        continue
+                saved = self._sync_folder(client, session, job)
+                results[(current, job.folder)] = saved
+                if saved is None:
+                    # 连接可能已经不可用，下一个任务重新登录
+                    client.logout()
+                    client = None
+                    self._release(current)
+                    current = None
+        finally:
+            if client is not None:
+                client.logout()
+            self._release(current)
+            session.close()
+        return results
+
+    def _sync_folder(self, client, session, job):
+        account = job.account
+        try:
+            fresh = client.folder != job.folder  # 本次同步会重新 SELECT
+            saved = sync_new_messages(
+                client,
+                session,
+                account.name,
+                job.folder,
+                batch_size=account.fetch_batch_size,
+                commit_interval=account.commit_interval,
+                parse_workers=account.parse_workers,
+                partial=account.partial_fetch,
+                **self.sync_options,
+            )
+            sync_flags(
+                client,
+                session,
+                account.name,
+                job.folder,
+                mailbox=client.mailbox if fresh else None,
+                full_interval=account.flag_full_sync_interval,
+            )
+            # 同步完成后才记录快照；同步期间到达的新邮件会让下次 STATUS 不一致而被再次同步
+            state = get_sync_state(session, account.name, job.folder)
+            state.uidnext = job.status.get("uidnext")
+            state.messages = job.status.get("messages")
+            session.commit()
+            return saved
+        except Exception as e:
+            session.rollback()
+            logger.error(f"{account.name}/{job.folder} 同步失败: {e}", exc_info=True)
+            return None
@@ -0,0 +1,168 @@
+# ./sync.py
+import logging
+import os
+import sys
+import time
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.db_operations import get_sync_state, reset_uidvalidity, save_email
+from imap.partial import fetch_partial_messages
+from imap.pipeline import pipelined
+from parsers.eml_parser import parse_email_bytes
+
+logger = logging.getLogger(__name__)
+
+
+def iter_parsed_messages(
+    client,
+    uids,
+    batch_size=50,
+    partial=False,
+    slow_tracker=None,
+    parse_workers=0,
+    **kwargs,
+):
+    """
+    下载并解析邮件，产出 (uid, parsed)；解析失败时 parsed 为 None。
+
+    :param partial: True 时使用 BODYSTRUCTURE 部分下载，只取正文
+    :param slow_tracker: utils.diagnostics.SlowMessageTracker，记录每封邮件的解析耗时
+    :param parse_workers: 大于 0 时下载与解析并行（见 imap.pipeline），结果仍按 UID 顺序产出
+    """
+    if partial:
+        yield from fetch_partial_messages(client, uids, batch_size=batch_size, **kwargs)
+        return
+
+    def parse(item):
+        uid, raw_email = item
+        return uid, _parse_message(uid, raw_email, slow_tracker)
+
+    def fetch():
+        return client.fetch_messages(uids, batch_size=batch_size)
+
+    if parse_workers > 0:
+        # 最多缓冲两批：一批在解析，一批在下载；同时按字节数限制
+        yield from pipelined(
+            fetch,
+            parse,
+            workers=parse_workers,
+            queue_size=2 * batch_size,
+            sizeof=lambda item: len(item[1]),
+        )
+    else:
+        yield from map(parse, fetch())
+
+
+def _parse_message(uid, raw_email, slow_tracker=None):
+    started = time.perf_counter()
+    try:
+        parsed = parse_email_bytes(raw_email)
+    except Exception as e:
+        logger.error(f"解析邮件 UID {uid} 失败: {e}", exc_info=True)
+        parsed = None
+    if slow_tracker is not None:
+        _record_parse_time(slow_tracker, uid, raw_email, parsed, started)
+    return parsed
+
+
+def _record_parse_time(slow_tracker, uid, raw_email, parsed, started):
+    headers = (parsed or {}).get("headers") or {}
+    slow_tracker.record(
+        time.perf_counter() - started,
+        uid=uid,
+        size=len(raw_email),
+        content_type=(headers.get("Content-Type") or "").split(";")[0].strip() or None,
+        subject=(parsed or {}).get("subject"),
+    )
+
+
+def sync_new_messages(
+    client,
+    session,
+    account_name,
+    folder="INBOX",
+    batch_size=50,
+    commit_interval=100,
+    partial=False,
+    attachments_dir=None,
+    policy=None,
+    slow_tracker=None,
+    fetcher=None,
+    parse_workers=0,
+):
+    """
+    增量同步：只下载比上次同步位置更新的 UID，解析后写入数据库。
+
+    :param client: 已登录的 imap.client.EmailClient
+    :param session: SQLAlchemy 会话
+    :param account_name: 账户名（写入 Email.account）
+    :param folder: 文件夹名
+    :param batch_size: 每次 UID FETCH 的邮件数
+    :param commit_interval: 每写入多少封邮件提交一次
+    :param partial: 是否只下载正文部分（见 imap.partial）
+    :param attachments_dir: 附件保存目录，为空时附件全部进入下载队列
+    :param policy: parsers.attachment.AttachmentPolicy。与 attachments_dir 同时指定时
+                   总是按 BODYSTRUCTURE 部分下载，只随同步下载符合策略的附件，
+                   其余进入后台下载队列，大附件不会拖慢同步
+    :param slow_tracker: utils.diagnostics.SlowMessageTracker，记录解析最慢的邮件
+    :param fetcher: imap.parallel.ParallelFetcher，新邮件多于一批时用多个连接并行下载
+    :param parse_workers: 解析线程数，大于 0 时下载、解析、写库三级流水线并行
+    :return: 新入库的邮件数
+    """
+    state = get_sync_state(session, account_name, folder)
+    # 已选中该文件夹时（IDLE/NOOP 循环中）不必重复 SELECT
+    if client.folder != folder:
+        mailbox = client.select(folder)
+        reset_uidvalidity(session, state, mailbox["uidvalidity"])
+    session.commit()
+
+    new_uids = client.uids_after(state.last_uid)
+    if not new_uids:
+        logger.debug(f"{account_name}/{folder} 没有新邮件")
+        return 0
+    logger.info(f"{account_name}/{folder} 发现 {len(new_uids)} 封新邮件")
+
+    saved = 0
+    pending = 0
+    extra = {}
+    if policy is not None and attachments_dir:
+        partial = True
+        extra["attachment_filter"] = policy.allows_part
+    source = client
+    if fetcher is not None and not partial and len(new_uids) > batch_size:
+        source = fetcher
+    for uid, parsed in iter_parsed_messages(
+        source,
+        new_uids,
+        batch_size=batch_size,
+        partial=partial,
+        slow_tracker=slow_tracker,
+        parse_workers=parse_workers,
+        **extra,
+    ):
+        if parsed is not None:
+            email = save_email(
+                session,
+                parsed,
+                account_name,
+                folder,
+                uid,
+                attachments_dir=attachments_dir,
+                policy=policy,
+            )
+            if email is not None:
+                saved += 1
+        # 解析失败的邮件同样推进同步位置，避免每次都重新下载
+        state.last_uid = max(state.last_uid, uid)
+        pending += 1
+        if pending >= commit_interval:
+            session.commit()
+            pending = 0
+
+    session.commit()
+    logger.info(
+        f"{account_name}/{folder} 新入库 {saved} 封邮件，最新 UID {state.last_uid}"
+    )
+    return saved
@@ -0,0 +1,166 @@
+# ./transport.py
+"""
+imaplib 的传输层扩展（通过覆盖文档允许覆盖的 read / readline / send 实现）：
+
+- COMPRESS=DEFLATE（RFC 4978）：服务器声明支持时协商压缩，之后双向数据都经过
+  raw deflate，邮件正文这类文本通常能减少 60%~80% 的传输量；
+- 大 literal 分块读取：设置 literal_sink 后，FETCH 返回的 literal 按块直接写入
+  sink（例如磁盘文件），不再整块缓存在内存中。整封邮件下载使用 LiteralSpool，
+  每封邮件各写入一个临时文件，超过 SPOOL_MAX_SIZE 的转存到磁盘。
+"""
+import imaplib
+import logging
+import tempfile
+import zlib
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK = 64 * 1024
+COMPRESS_LEVEL = 6
+SPOOL_MAX_SIZE = 1024 * 1024  # LiteralSpool 单个 literal 在内存中保留的上限
+
+# imaplib 只允许执行 Commands 中登记过的命令
+imaplib.Commands.setdefault("COMPRESS", ("AUTH", "SELECTED"))
+
+
+class LiteralSpool:
+    """
+    literal_sink 的实现之一：每个 literal 写入单独的 SpooledTemporaryFile，
+    按读取顺序保存在 files 中。用完后调用 close() 删除临时文件。
+    """
+
+    def __init__(self, max_size=SPOOL_MAX_SIZE):
+        self.max_size = max_size
+        self.files = []
+
+    def start_literal(self, size):
+        self.files.append(tempfile.SpooledTemporaryFile(self.max_size))
+
+    def write(self, chunk):
+        self.files[-1].write(chunk)
+
+    def close(self):
+        for fileobj in self.files:
+            fileobj.close()
+        self.files = []
+
+
+class TransportMixin:
+    """
+    为 imaplib.IMAP4 / IMAP4_SSL 增加压缩和 literal 分块读取。
+
+    literal_sink: 非空时，读取到的 literal 按块调用 literal_sink.write()，
+    imaplib 的返回数据中对应位置为 b""。sink 有 start_literal(size) 方法时，
+    每个 literal 开始前先调用它。
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._compressor = None
+        self._decompressor = None
+        self._inbuf = bytearray()
+        self.literal_sink = None
+        self.streamed_bytes = 0  # 写入 literal_sink 的总字节数
+        self.wire_bytes_in = 0  # 压缩后实际收到的字节数
+        self.data_bytes_in = 0  # 解压后的字节数
+        super().__init__(*args, **kwargs)
+
+    @property
+    def compressed(self):
+        return self._decompressor is not None
+
+    def start_compression(self, level=COMPRESS_LEVEL):
+        """发送 COMPRESS DEFLATE，成功后开始压缩，返回是否已启用"""
+        if self.compressed:
+            return True
+        typ, data = self._simple_command("COMPRESS", "DEFLATE")
+        if typ != "OK":
+            logger.info(f"服务器拒绝 COMPRESS DEFLATE: {data}")
+            return False
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        self._decompressor = zlib.decompressobj(-15)
+        logger.debug("已启用 IMAP COMPRESS=DEFLATE")
+        return True
+
+    def decompress(self, data):
+        """解压直接从 socket 读到的数据（IDLE 绕过 imaplib 读取时使用）"""
+        if not self.compressed:
+            return data
+        self.wire_bytes_in += len(data)
+        data = self._decompressor.decompress(data)
+        self.data_bytes_in += len(data)
+        return data
+
+    def take_buffered(self):
+        """取出已解压但还未读取的数据"""
+        data = bytes(self._inbuf)
+        self._inbuf.clear()
+        return data
+
+    def _fill(self):
+        raw = self.file.read1(READ_CHUNK)
+        if not raw:
+            raise self.abort("socket error: EOF")
+        self._inbuf += self.decompress(raw)
+
+    def _iter_chunks(self, size):
+        """分块读取 size 字节"""
+        remaining = size
+        while remaining > 0:
+            if self.compressed:
+                if not self._inbuf:
+                    self._fill()
+                n = min(remaining, len(self._inbuf), READ_CHUNK)
+                chunk = bytes(self._inbuf[:n])
+                del self._inbuf[:n]
+            else:
+                chunk = self.file.read(min(remaining, READ_CHUNK))
+                if not chunk:
+                    raise self.abort("socket error: EOF")
+            remaining -= len(chunk)
+            yield chunk
+
+    def read(self, size):
+        if self.literal_sink is not None:
+            start = getattr(self.literal_sink, "start_literal", None)
+            if start is not None:
+                start(size)
+            for chunk in self._iter_chunks(size):
+                self.literal_sink.write(chunk)
+            self.streamed_bytes += size
+            return b""
+        if not self.compressed:
+            return super().read(size)
+        data = bytearray()
+        for chunk in self._iter_chunks(size):
+            data += chunk
+        return bytes(data)
+
+    def readline(self):
+        if not self.compressed:
+            return super().readline()
+        while True:
+            end = self._inbuf.find(b"\n")
+            if end >= 0:
+                line = bytes(self._inbuf[: end + 1])
+                del self._inbuf[: end + 1]
+                return line
+            if len(self._inbuf) > imaplib._MAXLINE:
+                raise self.error(f"got more than {imaplib._MAXLINE} bytes")
+            self._fill()
+
+    def send(self, data):
+        if self._compressor is not None:
+            data = self._compressor.compress(data) + self._compressor.flush(
+                zlib.Z_SYNC_FLUSH
+            )
+        super().send(data)
+
+    def compression_ratio(self):
+        """已收到数据的压缩比（解压后 / 实际传输），未压缩时返回 None"""
+        if not self.compressed or not self.wire_bytes_in:
+            return None
+        return self.data_bytes_in / self.wire_bytes_in
+
+
+class IMAP4Transport(TransportMixin, imaplib.IMAP4_SSL):
+    """支持压缩和 literal 分块读取的 IMAP4_SSL"""
@@ -0,0 +1,158 @@
+# ./base.py
+"""
+本地邮件归档导入的公共部分：扫描（读取线程）→ 解析（线程池）→ 写库（调用方线程），
+与 IMAP 同步共用 imap.pipeline 流水线和 save_email。
+
+导入进度与邮件在同一事务中提交，中断后从最后一次提交处继续，既不会重复导入也不会遗漏：
+mbox 记录字节偏移（import_state.position），Maildir 逐个记录已导入文件的唯一名
+（imported_files），目录中新增或移动文件不影响续传。
+没有 UID 的邮件另按 Message-ID 去重（见 save_email），归档被替换后从头导入也不会重复入库。
+"""
+import json
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass
+from functools import partial
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.db_operations import (
+    clear_imported_keys,
+    get_import_state,
+    imported_keys,
+    record_imported_key,
+    save_email,
+)
+from imap.pipeline import pipelined
+from parsers.eml_parser import parse_email_bytes
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COMMIT_INTERVAL = 500
+
+
+@dataclass
+class LocalMessage:
+    """扫描器产出的一封邮件"""
+
+    data: object  # 邮件字节，mbox 导入时为 mmap 的 memoryview 切片
+    folder: str
+    next_position: int = None  # 这封邮件入库后的导入位置（mbox）
+    flags: frozenset = None  # IMAP 标记，None 表示归档中没有标记信息
+    key: str = None  # 邮件文件的稳定标识（Maildir 唯一名），入库后记录到 imported_files
+
+
+def _parse(message, slow_tracker=None):
+    started = time.perf_counter()
+    size = len(message.data)
+    try:
+        parsed = parse_email_bytes(message.data)
+    except Exception as e:
+        logger.error(
+            f"解析邮件失败（位置 {message.key or message.next_position}）: {e}",
+            exc_info=True,
+        )
+        parsed = None
+    if slow_tracker is not None:
+        headers = (parsed or {}).get("headers") or {}
+        slow_tracker.record(
+            time.perf_counter() - started,
+            uid=message.key or message.next_position,
+            size=size,
+            content_type=(headers.get("Content-Type") or "").split(";")[0].strip()
+            or None,
+            subject=(parsed or {}).get("subject"),
+        )
+    if isinstance(message.data, memoryview):
+        # 尽早释放切片，扫描结束后 mmap 才能解除映射
+        message.data.release()
+    return message, parsed
+
+
+def import_messages(
+    session,
+    source,
+    scan,
+    account=None,
+    parse_workers=2,
+    commit_interval=DEFAULT_COMMIT_INTERVAL,
+    attachments_dir=None,
+    restart=False,
+    progress=None,
+    slow_tracker=None,
+):
+    """
+    导入一个本地归档。
+
+    :param session: SQLAlchemy 会话
+    :param source: 归档标识（绝对路径），用于记录导入位置
+    :param scan: scan(position, seen) -> 产出 LocalMessage 的迭代器：从 position 开始，
+                 跳过键在 seen（已导入的文件键集合）中的邮件
+    :param account: 写入 Email.account 的账户名
+    :param parse_workers: 解析线程数，0 表示在调用方线程中解析
+    :param commit_interval: 每处理多少封邮件提交一次（同时保存导入位置）
+    :param attachments_dir: 附件保存目录，为空时只记录附件元信息
+    :param restart: 忽略已保存的位置，从头导入
+    :param progress: 回调 progress(本次已入库数)，每次提交后调用
+    :param slow_tracker: utils.diagnostics.SlowMessageTracker，记录解析最慢的邮件
+    :return: 本次新入库的邮件数
+    """
+    state = get_import_state(session, source)
+    if restart:
+        state.position = 0
+        clear_imported_keys(session, source)
+    session.commit()
+    start = state.position
+    seen = imported_keys(session, source)
+    if start or seen:
+        logger.info(
+            f"{source} 从位置 {start} 继续导入"
+            f"（已导入 {state.imported} 封，已处理文件 {len(seen)} 个）"
+        )
+
+    parse = partial(_parse, slow_tracker=slow_tracker)
+    if parse_workers > 0:
+        results = pipelined(
+            lambda: scan(start, seen),
+            parse,
+            workers=parse_workers,
+            sizeof=lambda message: len(message.data),
+        )
+    else:
+        results = map(parse, scan(start, seen))
+
+    saved = 0
+    pending = 0
+    for message, parsed in results:
+        if parsed is not None:
+            email = save_email(
+                session,
+                parsed,
+                account,
+                message.folder,
+                attachments_dir=attachments_dir,
+            )
+            if email is not None:
+                if message.flags is not None:
+                    email.flags = json.dumps(sorted(message.flags))
+                saved += 1
+                state.imported += 1
+        # 解析失败和重复的邮件同样推进导入位置，避免每次都重新解析
+        if message.next_position is not None:
+            state.position = message.next_position
+        if message.key is not None:
+            record_imported_key(session, source, message.key)
+        pending += 1
+        if pending >= commit_interval:
+            session.commit()
+            pending = 0
+            if progress is not None:
+                progress(saved)
+    session.commit()
+    if progress is not None:
+        progress(saved)
+    logger.info(f"{source} 导入完成，本次新入库 {saved} 封邮件")
+    return saved
@@ -0,0 +1,109 @@
+# ./maildir.py
+"""
+Maildir / Maildir++ 目录导入。
+
+用 os.scandir 遍历 cur 和 new 子目录（大多数平台上目录项自带文件类型，不必逐个 stat），
+按文件夹、文件名排序后逐个读取；文件名中的标记（":2,FRS"）转换为 IMAP 标记。
+续传以文件的唯一名（":" 之前的部分）为键，已导入的文件直接跳过，不必读取；
+唯一名在邮件从 new 移到 cur 或标记变化时不变，新邮件投递到任何文件夹都不影响续传。
+"""
+import logging
+import os
+import sys
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from imap.folders import decode_modified_utf7
+from importers.base import LocalMessage
+
+logger = logging.getLogger(__name__)
+
+INBOX = "INBOX"
+MESSAGE_DIRS = ("cur", "new")  # tmp 中是尚未投递完成的邮件
+MAILDIR_FLAGS = {
+    "D": "\\Draft",
+    "F": "\\Flagged",
+    "R": "\\Answered",
+    "S": "\\Seen",
+    "T": "\\Deleted",
+}
+
+
+def is_maildir(path):
+    return all(os.path.isdir(os.path.join(path, name)) for name in MESSAGE_DIRS)
+
+
+def maildir_folders(root):
+    """
+    产出 (文件夹名, 目录)：根目录为 INBOX，Maildir++ 子文件夹 ".Bank.CMB" 为 "Bank.CMB"
+    （名称按修改版 UTF-7 解码）。
+    """
+    if is_maildir(root):
+        yield INBOX, root
+    with os.scandir(root) as entries:
+        subfolders = sorted(
+            entry.name
+            for entry in entries
+            if entry.name.startswith(".") and entry.is_dir() and is_maildir(entry.path)
+        )
+    for name in subfolders:
+        yield decode_modified_utf7(name[1:]), os.path.join(root, name)
+
+
+def parse_flags(filename):
+    """文件名 "<唯一名>:2,<标记>" 中的标记 -> IMAP 标记集合"""
+    _, _, info = filename.partition(":2,")
+    return frozenset(MAILDIR_FLAGS[c] for c in info if c in MAILDIR_FLAGS)
+
+
+def unique_name(filename):
+    """Maildir 文件名中 ":" 之前的唯一名"""
+    return filename.split(":", 1)[0]
+
+
+def list_messages(root):
+    """全部邮件文件 [(文件夹, 唯一名, 路径, 标记)]，按文件夹、唯一名排序"""
+    messages = []
+    for folder, directory in maildir_folders(root):
+        files = []
+        for sub in MESSAGE_DIRS:
+            with os.scandir(os.path.join(directory, sub)) as entries:
+                files.extend(
+                    (unique_name(entry.name), entry.path, parse_flags(entry.name))
+                    for entry in entries
+                    if entry.is_file() and not entry.name.startswith(".")
+                )
+        files.sort()
+        messages.extend((folder, name, path, flags) for name, path, flags in files)
+    return messages
+
+
+def message_key(folder, name):
+    """续传用的文件键：同一唯一名可能出现在不同文件夹（复制的邮件），因此带上文件夹"""
+    return f"{folder}/{name}"
+
+
+def iter_maildir(root, seen=frozenset()):
+    """
+    逐封产出 Maildir 中尚未导入的邮件。
+
+    :param seen: 已导入的文件键集合（见 message_key）
+    :return: LocalMessage 迭代器，key 为文件键
+    """
+    messages = list_messages(root)
+    logger.info(f"{root} 共 {len(messages)} 封邮件，已导入 {len(seen)} 封")
+    yielded = set()
+    for folder, name, path, flags in messages:
+        key = message_key(folder, name)
+        # 扫描期间邮件从 new 移到 cur 时，同一唯一名可能出现两次
+        if key in seen or key in yielded:
+            continue
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            logger.warning(f"{path} 已不存在，跳过")
+            continue
+        yielded.add(key)
+        yield LocalMessage(data, folder, flags=flags, key=key)
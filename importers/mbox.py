@@ -0,0 +1,89 @@
+# ./mbox.py
+"""
+mbox 文件导入（Thunderbird、Google Takeout 等导出的多 GB 归档）。
+
+整个文件用 mmap 只读映射，由 mmap.find 在 C 层扫描 "\\nFrom " 分隔行，
+每封邮件以 memoryview 切片交给解析线程，扫描过程不复制邮件内容，
+内存占用只取决于流水线队列中的邮件数，而不是文件大小。
+导入位置为下一封邮件分隔行的字节偏移。
+"""
+import logging
+import mmap
+import os
+import re
+import sys
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from importers.base import LocalMessage
+
+logger = logging.getLogger(__name__)
+
+SEPARATOR = b"From "
+# mboxrd/mboxo 把正文中以 "From " 开头的行转义为 ">From "，导入时去掉一层 ">"
+_QUOTED_FROM_RE = re.compile(rb"^>(>*From )", re.MULTILINE)
+
+
+def find_boundary(mm, position):
+    """返回 position 及之后第一个分隔行的起始偏移，没有时返回文件长度"""
+    if mm[position : position + len(SEPARATOR)] == SEPARATOR and (
+        position == 0 or mm[position - 1] == ord("\n")
+    ):
+        return position
+    found = mm.find(b"\n" + SEPARATOR, max(position - 1, 0))
+    return len(mm) if found < 0 else found + 1
+
+
+def unquote_from(data):
+    return _QUOTED_FROM_RE.sub(rb"\1", bytes(data))
+
+
+def iter_mbox(path, start=0, folder=None):
+    """
+    从字节偏移 start 开始逐封产出 mbox 中的邮件。
+
+    :param folder: 写入 Email.folder 的文件夹名，默认取文件名（不含扩展名）
+    :return: LocalMessage 迭代器，next_position 为下一封邮件的起始偏移
+    """
+    if folder is None:
+        folder = os.path.splitext(os.path.basename(path))[0]
+    size = os.path.getsize(path)
+    if start > size:
+        logger.warning(f"{path} 比上次导入时更小（可能已被替换），从头导入")
+        start = 0
+    if start >= size:
+        return
+
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mmap, "MADV_SEQUENTIAL"):
+        mm.madvise(mmap.MADV_SEQUENTIAL)  # 顺序扫描，提示内核预读
+    view = memoryview(mm)
+    try:
+        position = find_boundary(mm, start)
+        while position < size:
+            # 跳过分隔行 "From sender date"
+            body = mm.find(b"\n", position)
+            if body < 0:
+                break
+            body += 1
+            following = mm.find(b"\n" + SEPARATOR, body - 1)
+            next_position = size if following < 0 else following + 1
+            end = next_position
+            # 邮件之间的空行属于分隔，不属于邮件
+            if following >= 0 and end - 2 >= body and mm[end - 2] == ord("\n"):
+                end -= 1
+            if mm.find(b">" + SEPARATOR, body, end) >= 0:
+                data = unquote_from(mm[body:end])  # 只有少数含转义行的邮件需要复制
+            else:
+                data = view[body:end]
+            yield LocalMessage(data, folder, next_position)
+            position = next_position
+    finally:
+        view.release()
+        try:
+            mm.close()
+        except BufferError:
+            # 提前结束时流水线中可能还有未释放的切片，映射在最后一个切片释放后解除
+            pass
@@ -0,0 +1,580 @@
+# ./main.py
+"""
+PyEmail 命令行入口。
+
+每个子命令只在自己的处理函数内导入所需模块（sqlalchemy、解析器等），
+日志文件等 I/O 也在真正用到时才创建，保证定时任务（cron）冷启动足够快。
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import time
+
+# 记录进程启动时刻，用于统计冷启动耗时
+_START_TIME = time.perf_counter()
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+DEFAULT_DB_URL = "sqlite:///./database.db"
+DEFAULT_LOG_FILE = "./logs/app.log"
+
+# 冷启动预算（秒）：从解释器开始执行本文件到子命令开始运行
+STARTUP_BUDGET_SECONDS = 0.2
+
+
+def sqlite_path_from_url(db_url):
+    """从 sqlite:/// 形式的 URL 中取出数据库文件路径，非 SQLite URL 返回 None"""
+    prefix = "sqlite:///"
+    if not db_url.startswith(prefix):
+        return None
+    return db_url[len(prefix) :]
+
+
+def cmd_status(args):
+    """快速状态检查：只使用标准库 sqlite3，不加载 sqlalchemy"""
+    db_path = sqlite_path_from_url(args.db_url)
+    if db_path is None:
+        print(f"数据库: {args.db_url}（非 SQLite，跳过快速检查）")
+        return 0
+    if not os.path.exists(db_path):
+        print(f"数据库: {db_path}（不存在）")
+        return 1
+
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        tables = [
+            row[0]
+            for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name"
+            )
+        ]
+        print(f"数据库: {db_path}（{os.path.getsize(db_path)} 字节）")
+        for table in tables:
+            (count,) = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()
+            print(f"  {table}: {count} 行")
+    finally:
+        conn.close()
+    return 0
+
+
+def cmd_init_db(args):
+    """创建数据库表并插入示例数据"""
+    from database.db_init import initialize_database
+
+    initialize_database(args.db_url)
+    return 0
+
+
+def cmd_migrate(args):
+    """升级数据库结构；指定 --legacy 时把原型库 raw_email.db 的邮件分批迁移过来"""
+    from database.db_init import get_engine
+    from database.migrations import current_version, migrate_legacy_emails
+
+    if args.legacy is None:
+        engine = get_engine(args.db_url)
+        print(f"数据库结构版本: {current_version(engine)}")
+        return 0
+
+    def report(copied, total):
+        print(f"\r已迁移 {copied}/{total} 封邮件", end="", flush=True)
+
+    copied = migrate_legacy_emails(
+        args.legacy,
+        db_url=None if args.in_place else args.db_url,
+        batch_size=args.batch_size,
+        account=args.account,
+        progress=report,
+    )
+    print(f"\n迁移完成，共 {copied} 封邮件")
+    return 0
+
+
+def cmd_import(args):
+    """导入本地 mbox 文件或 Maildir 目录，中断后重新运行会从断点继续"""
+    from database.db_init import create_session_factory
+    from importers.base import import_messages
+    from importers.maildir import iter_maildir
+    from importers.mbox import iter_mbox
+    from utils.config import get_config
+
+    path = os.path.abspath(args.path)
+    if os.path.isdir(path):
+
+        def scan(position, seen):
+            return iter_maildir(path, seen)
+
+    elif os.path.isfile(path):
+
+        def scan(position, seen):
+            return iter_mbox(path, position, folder=args.folder)
+
+    else:
+        print(f"{args.path} 不存在", file=sys.stderr)
+        return 1
+
+    def report(saved):
+        print(f"\r已导入 {saved} 封邮件", end="", flush=True)
+
+    session = create_session_factory(args.db_url)()
+    try:
+        saved = import_messages(
+            session,
+            path,
+            scan,
+            account=args.account,
+            parse_workers=args.workers,
+            restart=args.restart,
+            progress=report,
+            attachments_dir=get_config(args.config).attachments_dir,
+            slow_tracker=getattr(args, "slow_tracker", None),
+        )
+    finally:
+        session.close()
+    print(f"\n导入完成，新入库 {saved} 封邮件")
+    return 0
+
+
+def cmd_accounts(args):
+    """列出已配置的邮箱账户及其调优参数（不显示密码）"""
+    from utils.config import ConfigError, describe_account, get_config
+
+    try:
+        config = get_config(args.config)
+    except ConfigError as e:
+        print(f"配置错误: {e}", file=sys.stderr)
+        return 2
+
+    if not config.accounts:
+        print("未配置任何邮箱账户")
+        return 1
+    for account in config.accounts.values():
+        values = describe_account(account)
+        print(values.pop("name"))
+        for key, value in values.items():
+            print(f"  {key}: {value}")
+    return 0
+
+
+def _load_accounts(args):
+    """按命令行指定的账户名（默认全部）取出账户配置"""
+    from utils.config import get_config
+
+    config = get_config(args.config)
+    names = args.account or list(config.accounts)
+    return [config.get_account(name) for name in names]
+
+
+def _attachment_options(args):
+    """同步时的附件保存目录和下载策略"""
+    from utils.config import get_config
+
+    config = get_config(args.config)
+    return {
+        "attachments_dir": config.attachments_dir,
+        "policy": config.attachment_policy(),
+    }
+
+
+def _body_archive(args):
+    """已存在的冷存档库，没有归档过任何邮件时返回 None"""
+    from database.archive import get_body_archive
+    from utils.config import get_config
+
+    config = get_config(args.config)
+    if not os.path.exists(config.archive_path):
+        return None
+    return get_body_archive(config.archive_path)
+
+
+def cmd_fetch(args):
+    """一次性增量同步：只下载上次同步之后的新邮件"""
+    from database.db_init import create_session_factory
+    from imap.client import EmailClient
+    from imap.flags import sync_flags
+    from imap.parallel import ParallelFetcher
+    from imap.sync import sync_new_messages
+
+    Session = create_session_factory(args.db_url)
+    if args.all_folders:
+        from imap.scheduler import FolderScheduler
+
+        scheduler = FolderScheduler(
+            _load_accounts(args),
+            Session,
+            budget=args.budget,
+            slow_tracker=getattr(args, "slow_tracker", None),
+            **_attachment_options(args),
+        )
+        results = scheduler.run()
+        return 1 if any(saved is None for saved in results.values()) else 0
+
+    for account in _load_accounts(args):
+        session = Session()
+        try:
+            with EmailClient.from_account(account) as client:
+                fetcher = None
+                if args.connections > 1:
+                    fetcher = ParallelFetcher(
+                        account, args.folder, workers=args.connections, client=client
+                    )
+                sync_new_messages(
+                    client,
+                    session,
+                    account.name,
+                    args.folder,
+                    batch_size=account.fetch_batch_size,
+                    commit_interval=account.commit_interval,
+                    parse_workers=account.parse_workers,
+                    partial=args.partial or account.partial_fetch,
+                    slow_tracker=getattr(args, "slow_tracker", None),
+                    fetcher=fetcher,
+                    **_attachment_options(args),
+                )
+                # sync_new_messages 刚刚 SELECT 过该文件夹，直接复用其结果
+                sync_flags(
+                    client,
+                    session,
+                    account.name,
+                    args.folder,
+                    mailbox=client.mailbox,
+                    full_interval=account.flag_full_sync_interval,
+                )
+        finally:
+            session.close()
+    return 0
+
+
+def cmd_daemon(args):
+    """常驻模式：IMAP IDLE 推送（不支持时自适应 NOOP 轮询），每个账户一个线程"""
+    import signal
+    import threading
+
+    from database.db_init import create_session_factory
+    from imap.idle import IdleDaemon
+
+    Session = create_session_factory(args.db_url)
+    daemons = [
+        IdleDaemon(
+            account,
+            Session,
+            folder=args.folder,
+            slow_tracker=getattr(args, "slow_tracker", None),
+            **_attachment_options(args),
+        )
+        for account in _load_accounts(args)
+    ]
+
+    def handle_signal(signum, frame):
+        logging.info(f"收到信号 {signum}，正在停止...")
+        for daemon in daemons:
+            daemon.stop()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    threads = [
+        threading.Thread(target=daemon.run, name=daemon.account.name)
+        for daemon in daemons
+    ]
+    for thread in threads:
+        thread.start()
+    # 主线程定时 join，以便及时响应信号
+    while any(thread.is_alive() for thread in threads):
+        for thread in threads:
+            thread.join(timeout=1)
+    return 0
+
+
+def cmd_attachments(args):
+    """以低优先级处理后台附件下载队列"""
+    from database.db_init import create_session_factory
+    from imap.attachment_queue import AttachmentDownloader
+    from utils.config import get_config
+
+    if hasattr(os, "nice"):
+        os.nice(10)  # 降低进程优先级，不与同步任务争抢 CPU
+
+    config = get_config(args.config)
+    Session = create_session_factory(args.db_url)
+    failed = 0
+    for account in _load_accounts(args):
+        downloader = AttachmentDownloader(
+            account,
+            Session,
+            config.attachments_dir,
+            workers=args.workers or config.attachment_workers,
+        )
+        failed += downloader.run(limit=args.limit)[1]
+    return 1 if failed else 0
+
+
+def cmd_archive(args):
+    """把超过保留期的邮件正文压缩移入冷存档库"""
+    from datetime import datetime, timedelta, timezone
+
+    from database.archive import get_body_archive
+    from database.db_init import create_session_factory, get_engine
+    from database.db_operations import archive_old_bodies
+    from utils.config import get_config
+
+    config = get_config(args.config)
+    days = args.days if args.days is not None else config.retention_days
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+    session = create_session_factory(args.db_url)()
+    try:
+        count, raw, compressed = archive_old_bodies(
+            session, get_body_archive(config.archive_path), cutoff
+        )
+    finally:
+        session.close()
+    print(f"归档 {count} 封 {days} 天前的邮件正文：{raw} -> {compressed} 字节")
+
+    if args.vacuum and count and sqlite_path_from_url(args.db_url):
+        # VACUUM 不能在事务中执行，使用自动提交连接
+        engine = get_engine(args.db_url)
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("VACUUM")
+        print("主库已 VACUUM")
+    return 0
+
+
+def cmd_extract(args):
+    """从邮件正文提取账单交易，写入 transactions 表"""
+    from database.db_init import create_session_factory, session_scope
+    from database.db_operations import extract_transactions
+
+    with session_scope(create_session_factory(args.db_url)) as session:
+        emails, rows = extract_transactions(
+            session, force=args.force, archive=_body_archive(args)
+        )
+    print(f"处理 {emails} 封邮件，写入 {rows} 条交易记录")
+    return 0
+
+
+def cmd_export(args):
+    """提取账单交易并把新增的交易追加导出为分区 Parquet"""
+    from analytics.parquet_export import export_transactions
+    from database.db_init import create_session_factory, session_scope
+    from database.db_operations import extract_transactions
+
+    with session_scope(create_session_factory(args.db_url)) as session:
+        # 只扫描尚未提取过的邮件，导出时直接读取 transactions 表
+        extract_transactions(session, archive=_body_archive(args))
+        written = export_transactions(session, args.output)
+    print(f"新导出 {written} 条交易记录 -> {args.output}")
+    return 0
+
+
+def cmd_report(args):
+    """从导出的 Parquet 数据集生成月度交易报表"""
+    from analytics.transactions import frame_from_parquet, monthly_report
+
+    report = monthly_report(frame_from_parquet(args.input))
+    print("按月份汇总:")
+    print(report["by_month"].to_string())
+    print()
+    print("按卡号/月份汇总:")
+    print(report["by_card_month"].to_string())
+    print()
+    print(f"商户消费前 {len(report['top_merchants'])} 名:")
+    print(report["top_merchants"].to_string())
+    duplicates = report["duplicates"]
+    if len(duplicates):
+        print()
+        print(f"疑似重复交易 {len(duplicates)} 条")
+    return 0
+
+
+def cmd_serve(args):
+    """启动本地 HTTP/JSON 接口，浏览邮件归档"""
+    from api.server import run_server
+    from database.db_init import create_session_factory
+
+    run_server(
+        create_session_factory(args.db_url), args.host, args.port, _body_archive(args)
+    )
+    return 0
+
+
+def build_parser():
+    """构建命令行解析器"""
+    parser = argparse.ArgumentParser(prog="pyemail", description="PyEmail 邮件归档工具")
+    parser.add_argument(
+        "--db-url",
+        default=os.environ.get("DATABASE_URL", DEFAULT_DB_URL),
+        help="数据库 URL（默认读取环境变量 DATABASE_URL）",
+    )
+    parser.add_argument("--config", default="config.json", help="JSON 配置文件路径")
+    parser.add_argument("--log-file", default=DEFAULT_LOG_FILE, help="日志文件路径")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出调试日志")
+    parser.add_argument(
+        "--startup-time",
+        action="store_true",
+        help="在标准错误输出中打印冷启动耗时",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="启用采样分析，结束时在 logs/profiles 写出火焰图数据",
+    )
+    parser.add_argument(
+        "--slow",
+        type=int,
+        default=20,
+        metavar="N",
+        help="结束时在日志中报告解析最慢的 N 封邮件（默认 20）",
+    )
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    status = subparsers.add_parser("status", help="快速查看数据库状态")
+    status.set_defaults(func=cmd_status, needs_logging=False)
+
+    accounts = subparsers.add_parser("accounts", help="查看已配置的邮箱账户")
+    accounts.set_defaults(func=cmd_accounts, needs_logging=False)
+
+    init_db = subparsers.add_parser("init-db", help="初始化数据库")
+    init_db.set_defaults(func=cmd_init_db, needs_logging=True)
+
+    migrate = subparsers.add_parser("migrate", help="升级数据库结构或迁移原型库")
+    migrate.add_argument("--legacy", help="原型库 raw_email.db 路径")
+    migrate.add_argument(
+        "--in-place",
+        action="store_true",
+        help="原地迁移到原型库文件中（逐批删除源记录，不额外占用一倍磁盘）",
+    )
+    migrate.add_argument("--batch-size", type=int, default=1000, help="每批邮件数")
+    migrate.add_argument("--account", help="写入迁移邮件的账户名")
+    migrate.set_defaults(func=cmd_migrate, needs_logging=True)
+
+    local_import = subparsers.add_parser(
+        "import", help="导入本地 mbox 文件或 Maildir 目录（可断点续传）"
+    )
+    local_import.add_argument("path", help="mbox 文件或 Maildir 目录")
+    local_import.add_argument("--account", help="写入导入邮件的账户名")
+    local_import.add_argument(
+        "--folder", help="mbox 导入时写入的文件夹名（默认取文件名）"
+    )
+    local_import.add_argument("--workers", type=int, default=2, help="解析线程数")
+    local_import.add_argument(
+        "--restart", action="store_true", help="忽略已保存的导入位置，从头导入"
+    )
+    local_import.set_defaults(func=cmd_import, needs_logging=True)
+
+    for name, func, help_text in (
+        ("fetch", cmd_fetch, "增量同步新邮件后退出"),
+        ("daemon", cmd_daemon, "常驻同步，新邮件秒级入库"),
+    ):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument(
+            "--account", action="append", help="账户名，可重复指定（默认全部）"
+        )
+        sub.add_argument("--folder", default="INBOX", help="文件夹（默认 INBOX）")
+        sub.set_defaults(func=func, needs_logging=True)
+        if name == "fetch":
+            sub.add_argument(
+                "--partial",
+                action="store_true",
+                help="按 BODYSTRUCTURE 只下载正文，附件只记录元信息",
+            )
+            sub.add_argument(
+                "--connections",
+                type=int,
+                default=1,
+                help="并行下载的 IMAP 连接数（上限为账户 max_connections），"
+                "适合首次导入大文件夹",
+            )
+            sub.add_argument(
+                "--all-folders",
+                action="store_true",
+                help="LIST 发现全部文件夹，只同步 STATUS 有变化的文件夹（忽略 --folder）",
+            )
+            sub.add_argument(
+                "--budget",
+                type=int,
+                default=4,
+                help="--all-folders 时所有账户合计的 IMAP 连接数上限",
+            )
+
+    attachments = subparsers.add_parser("attachments", help="处理附件下载队列")
+    attachments.add_argument(
+        "--account", action="append", help="账户名，可重复指定（默认全部）"
+    )
+    attachments.add_argument("--limit", type=int, default=100, help="本次最多下载数")
+    attachments.add_argument("--workers", type=int, help="并发连接数")
+    attachments.set_defaults(func=cmd_attachments, needs_logging=True)
+
+    archive = subparsers.add_parser("archive", help="归档旧邮件正文到冷存档库")
+    archive.add_argument(
+        "--days", type=int, help="保留天数（默认读取配置 retention_days）"
+    )
+    archive.add_argument(
+        "--vacuum", action="store_true", help="归档后 VACUUM 主库以回收磁盘空间"
+    )
+    archive.set_defaults(func=cmd_archive, needs_logging=True)
+
+    extract = subparsers.add_parser("extract", help="提取账单交易到数据库")
+    extract.add_argument(
+        "--force", action="store_true", help="忽略提取记录，重新扫描全部邮件"
+    )
+    extract.set_defaults(func=cmd_extract, needs_logging=True)
+
+    export = subparsers.add_parser("export", help="导出交易记录为 Parquet")
+    export.add_argument(
+        "--output", default="./exports/transactions", help="Parquet 数据集目录"
+    )
+    export.set_defaults(func=cmd_export, needs_logging=True)
+
+    report = subparsers.add_parser("report", help="生成月度交易报表")
+    report.add_argument(
+        "--input", default="./exports/transactions", help="Parquet 数据集目录"
+    )
+    report.set_defaults(func=cmd_report, needs_logging=True)
+
+    serve = subparsers.add_parser("serve", help="启动本地浏览接口")
+    serve.add_argument("--host", default="127.0.0.1", help="监听地址")
+    serve.add_argument("--port", type=int, default=8000, help="监听端口")
+    serve.set_defaults(func=cmd_serve, needs_logging=True)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.needs_logging:
+        from utils.logger import setup_logger
+
+        setup_logger(
+            log_level=logging.DEBUG if args.verbose else logging.INFO,
+            log_file=args.log_file,
+        )
+
+    if args.startup_time:
+        elapsed = time.perf_counter() - _START_TIME
+        print(
+            f"冷启动耗时: {elapsed * 1000:.1f} ms"
+            f"（预算 {STARTUP_BUDGET_SECONDS * 1000:.0f} ms）",
+            file=sys.stderr,
+        )
+
+    if not args.needs_logging:
+        return args.func(args)
+
+    # 长任务：SIGUSR1 打印调用栈，--profile 时采样分析，结束时记录最慢的邮件
+    from utils.diagnostics import run_diagnostics
+
+    name = args.func.__name__.removeprefix("cmd_")
+    with run_diagnostics(
+        name, profile=args.profile, slow_messages=args.slow
+    ) as slow_tracker:
+        args.slow_tracker = slow_tracker
+        return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
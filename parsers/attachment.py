@@ -0,0 +1,118 @@
+# ./attachment.py
+import logging
+import os
+import re
+from dataclasses import dataclass
+
+from parsers.body_parser import decode_header_value, is_attachment_part
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTACHMENT_SIZE = 20 * 1024 * 1024  # 20 MB
+
+_UNSAFE_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+@dataclass(frozen=True)
+class AttachmentPolicy:
+    """
+    附件下载策略：同步时只下载允许类型且不超过大小上限的附件，
+    其余附件只记录元信息，放入后台下载队列。
+    """
+
+    allowed_types: tuple = ("application/pdf",)
+    max_size: int = DEFAULT_MAX_ATTACHMENT_SIZE
+
+    def allows(self, content_type, size):
+        """
+        :param content_type: MIME 类型，支持 "image/*" 形式的通配
+        :param size: 解码后的字节数
+        """
+        if size is not None and size > self.max_size:
+            return False
+        content_type = (content_type or "").lower()
+        for allowed in self.allowed_types:
+            allowed = allowed.lower()
+            if allowed == content_type or (
+                allowed.endswith("/*") and content_type.startswith(allowed[:-1])
+            ):
+                return True
+        return False
+
+    def allows_part(self, part):
+        """用于 imap.partial 的 attachment_filter"""
+        return self.allows(part.content_type, part.decoded_size)
+
+
+def _iter_leaf_parts(part, prefix=""):
+    """按 IMAP section 编号遍历叶子部分，嵌套邮件（message/rfc822）视为叶子"""
+    if part.is_multipart() and part.get_content_type() != "message/rfc822":
+        for index, child in enumerate(part.get_payload(), 1):
+            section = f"{prefix}.{index}" if prefix else str(index)
+            yield from _iter_leaf_parts(child, section)
+    else:
+        yield prefix or "1", part
+
+
+def _part_payload(part):
+    if part.get_content_type() == "message/rfc822" and part.is_multipart():
+        return part.get_payload(0).as_bytes()
+    return part.get_payload(decode=True) or b""
+
+
+def list_attachments(msg):
+    """
+    列出邮件中所有附件的元信息。
+
+    :param msg: email.message.Message 对象
+    :return: [{"filename", "content_type", "size", "section", "encoding", "payload"}]
+    """
+    attachments = []
+    for section, part in _iter_leaf_parts(msg):
+        content_type = part.get_content_type()
+        if not (is_attachment_part(part) or content_type == "message/rfc822"):
+            continue
+        payload = _part_payload(part)
+        encoding = part.get("Content-Transfer-Encoding") or "7bit"
+        attachments.append(
+            {
+                "filename": decode_header_value(part.get_filename()) or "unnamed",
+                "content_type": content_type,
+                "size": len(payload),
+                "section": section,
+                "encoding": encoding.strip().lower(),
+                "payload": payload,
+            }
+        )
+    return attachments
+
+
+def safe_filename(filename):
+    """去掉路径分隔符等不能出现在文件名中的字符"""
+    name = _UNSAFE_CHARS.sub("_", os.path.basename(filename or "")).strip(" .")
+    return name or "unnamed"
+
+
+def attachment_path(directory, filename):
+    """返回 directory 下可用的附件路径，文件名冲突时自动加序号"""
+    os.makedirs(directory, exist_ok=True)
+    base, ext = os.path.splitext(safe_filename(filename))
+    path = os.path.join(directory, base + ext)
+    index = 1
+    while os.path.exists(path):
+        path = os.path.join(directory, f"{base}({index}){ext}")
+        index += 1
+    return path
+
+
+def save_attachment(payload, directory, filename):
+    """
+    保存附件到 directory，文件名冲突时自动加序号。
+
+    :return: 保存后的文件路径
+    """
+    path = attachment_path(directory, filename)
+    with open(path, "wb") as f:
+        f.write(payload)
+    logger.info(f"附件已保存: {path}")
+    return path
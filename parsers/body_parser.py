@@ -0,0 +1,85 @@
+# ./body_parser.py
+import logging
+from email.header import decode_header, make_header
+
+logger = logging.getLogger(__name__)
+
+# 常见的中文邮件编码，声明的字符集解码失败时依次尝试
+FALLBACK_CHARSETS = ["utf-8", "gb18030", "big5"]
+
+
+def decode_payload(payload, charset=None):
+    """
+    按声明的字符集解码正文字节，失败时尝试常见编码。
+
+    :param payload: 正文字节
+    :param charset: 邮件声明的字符集
+    :return: 解码后的字符串
+    """
+    if payload is None:
+        return None
+    if isinstance(payload, str):
+        return payload
+
+    candidates = [charset] if charset else []
+    candidates += [c for c in FALLBACK_CHARSETS if c != charset]
+    for candidate in candidates:
+        try:
+            return payload.decode(candidate)
+        except (LookupError, UnicodeDecodeError):
+            continue
+    logger.warning(f"无法识别正文编码（声明为 {charset}），按 utf-8 忽略错误解码")
+    return payload.decode("utf-8", errors="ignore")
+
+
+def decode_header_value(header_value):
+    """解码邮件头（RFC 2047 编码的中文标题、附件名等）"""
+    if header_value is None:
+        return ""
+    try:
+        return str(make_header(decode_header(str(header_value))))
+    except Exception:
+        return str(header_value)
+
+
+def is_attachment_part(part):
+    """判断 MIME 部分是否为附件（而不是正文）"""
+    disposition = part.get_content_disposition()
+    return disposition == "attachment" or (
+        disposition == "inline" and part.get_filename() is not None
+    )
+
+
+def extract_bodies(msg):
+    """
+    从 email.message 对象中提取纯文本和 HTML 正文。
+
+    :param msg: email.message.Message 对象
+    :return: (text_content, html_content)，缺失的部分为 None
+    """
+    text_content = None
+    html_content = None
+
+    for part in msg.walk():
+        if part.is_multipart() or is_attachment_part(part):
+            continue
+        content_type = part.get_content_type()
+        if content_type not in ("text/plain", "text/html"):
+            continue
+        try:
+            body = decode_payload(
+                part.get_payload(decode=True), part.get_content_charset()
+            )
+        except Exception as e:
+            logger.warning(f"无法解码 {content_type} 部分: {e}")
+            continue
+
+        if content_type == "text/plain" and text_content is None:
+            text_content = body
+        elif content_type == "text/html" and html_content is None:
+            html_content = body
+
+        if text_content is not None and html_content is not None:
+            break
+
+    return text_content, html_content
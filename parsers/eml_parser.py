@@ -0,0 +1,93 @@
+# ./eml_parser.py
+import codecs
+import logging
+from datetime import timezone
+from email import policy
+from email.parser import BytesHeaderParser, Parser
+from email.utils import getaddresses, parsedate_to_datetime
+
+from parsers.attachment import list_attachments
+from parsers.body_parser import decode_header_value, extract_bodies
+
+logger = logging.getLogger(__name__)
+
+
+def parse_addresses(msg, name):
+    """解析地址类邮件头，返回纯邮箱地址列表"""
+    values = [decode_header_value(v) for v in msg.get_all(name, [])]
+    return [address for _, address in getaddresses(values) if address]
+
+
+def parse_date(value):
+    """把 Date 头解析为 UTC 时间（不带时区信息），失败返回 None"""
+    if not value:
+        return None
+    try:
+        sent_at = parsedate_to_datetime(str(value))
+    except (TypeError, ValueError):
+        logger.warning(f"无法解析发件时间: {value}")
+        return None
+    if sent_at.tzinfo is not None:
+        sent_at = sent_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return sent_at
+
+
+def parse_header_fields(msg):
+    """
+    提取邮件头中的元信息（不涉及正文），供完整解析和只下载邮件头的部分解析共用。
+
+    :param msg: email.message.Message 对象（可以只包含邮件头）
+    :return: dict
+    """
+    headers = {}
+    for key, value in msg.items():
+        headers.setdefault(key, decode_header_value(value))
+
+    senders = parse_addresses(msg, "From")
+    return {
+        "message_id": (msg.get("Message-ID") or "").strip() or None,
+        "sender": senders[0] if senders else "",
+        "recipients": parse_addresses(msg, "To"),
+        "cc": parse_addresses(msg, "Cc"),
+        "bcc": parse_addresses(msg, "Bcc"),
+        "subject": decode_header_value(msg.get("Subject")),
+        "sent_at": parse_date(msg.get("Date")),
+        "headers": headers,
+    }
+
+
+def parse_header_bytes(header_bytes):
+    """解析 BODY[HEADER] 返回的邮件头字节"""
+    msg = BytesHeaderParser(policy=policy.compat32).parsebytes(header_bytes)
+    return parse_header_fields(msg)
+
+
+def parse_email_bytes(raw_email):
+    """
+    解析原始邮件字节，返回包含元信息、正文和附件信息的字典。
+
+    :param raw_email: RFC822 格式的邮件字节，也可以是 memoryview 等字节类对象
+    :return: dict，字段与 database.models.Email 对应
+    """
+    # 与 BytesParser.parsebytes 相同的解码方式，但直接接受 memoryview（mbox 导入时的
+    # mmap 切片），不必先复制成 bytes
+    text = codecs.decode(raw_email, "ascii", "surrogateescape")
+    msg = Parser(policy=policy.compat32).parsestr(text)
+    text_content, html_content = extract_bodies(msg)
+
+    parsed = parse_header_fields(msg)
+    parsed.update(
+        {
+            "text_content": text_content,
+            "html_content": html_content,
+            "attachments": list_attachments(msg),
+            "size": len(raw_email),
+        }
+    )
+    return parsed
+
+
+def parse_eml_file(eml_path):
+    """解析本地 .eml 文件"""
+    with open(eml_path, "rb") as f:
+        return parse_email_bytes(f.read())
@@ -0,0 +1,211 @@
+# ./parse_cache.py
+"""
+邮件解析结果缓存。
+
+以原始邮件字节的 SHA-256 为键，把 parse_email_bytes 的规范化结果（邮件头、解码后的正文、
+附件清单，不含附件内容）压缩后保存在本地 SQLite 文件中。ReadEml、PyEmail、EmailForwarder
+等工具处理同一封邮件时只真正解析一次，之后直接读取缓存。
+
+缓存总大小超过上限时按最近使用时间淘汰（LRU），一次淘汰到上限的 90%。命中时只在内存中
+记录使用时间，写入新结果、累计 TOUCH_BATCH 条或关闭时才批量写回，读缓存不产生提交。
+多个进程可以共享同一个缓存文件（WAL 模式）。
+"""
+import atexit
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime
+
+from parsers.eml_parser import parse_email_bytes
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = "./cache/parse_cache.db"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+EVICT_RATIO = 0.9
+TOUCH_BATCH = 256  # 内存中积累多少条命中记录后写回 last_used
+CACHE_VERSION = 1  # 规范化结果的格式版本，变化后旧缓存自动失效
+
+_CACHES = {}
+_LOCK = threading.Lock()
+
+
+def content_hash(raw_email):
+    """原始邮件字节的 SHA-256（32 字节）"""
+    return hashlib.sha256(raw_email).digest()
+
+
+def normalize(parsed):
+    """去掉附件内容，把发件时间转换为字符串，得到可以 JSON 序列化的结果"""
+    result = dict(parsed)
+    result["attachments"] = [
+        {key: value for key, value in item.items() if key != "payload"}
+        for item in parsed.get("attachments") or []
+    ]
+    if result.get("sent_at") is not None:
+        result["sent_at"] = result["sent_at"].isoformat()
+    return result
+
+
+def denormalize(data):
+    if data.get("sent_at"):
+        data["sent_at"] = datetime.fromisoformat(data["sent_at"])
+    return data
+
+
+class ParseCache:
+    """
+    磁盘上的解析结果缓存，线程安全。
+
+    :param path: SQLite 文件路径
+    :param max_bytes: 压缩后结果的总大小上限
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._touched = {}  # hash -> 尚未写回的最近使用时间
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS parsed_messages (
+                    hash BLOB PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_parsed_messages_last_used "
+                "ON parsed_messages (last_used)"
+            )
+            self._conn.commit()
+            self._total = self._stored_bytes()
+
+    def _stored_bytes(self):
+        return self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM parsed_messages"
+        ).fetchone()[0]
+
+    def get(self, digest):
+        """按 SHA-256 读取缓存的解析结果，不存在时返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM parsed_messages WHERE hash = ? AND version = ?",
+                (digest, CACHE_VERSION),
+            ).fetchone()
+            if row is None:
+                return None
+            self._touched[digest] = time.time()
+            if len(self._touched) >= TOUCH_BATCH:
+                self._flush_touches()
+                self._conn.commit()
+        return denormalize(json.loads(zlib.decompress(row[0])))
+
+    def put(self, digest, parsed):
+        """保存解析结果（parse_email_bytes 的返回值）"""
+        blob = zlib.compress(
+            json.dumps(normalize(parsed), ensure_ascii=False).encode("utf-8")
+        )
+        with self._lock:
+            old = self._conn.execute(
+                "SELECT size FROM parsed_messages WHERE hash = ?", (digest,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO parsed_messages "
+                "(hash, version, data, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (digest, CACHE_VERSION, blob, len(blob), time.time()),
+            )
+            self._total += len(blob) - (old[0] if old else 0)
+            self._touched.pop(digest, None)
+            self._flush_touches()
+            if self._total > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _flush_touches(self):
+        """把内存中的命中时间写回 last_used（调用方持有锁并负责提交）"""
+        if not self._touched:
+            return
+        self._conn.executemany(
+            "UPDATE parsed_messages SET last_used = ? WHERE hash = ?",
+            [(used, digest) for digest, used in self._touched.items()],
+        )
+        self._touched.clear()
+
+    def _evict(self):
+        # 其他进程可能也写入过，以数据库中的实际大小为准
+        self._total = self._stored_bytes()
+        target = int(self.max_bytes * EVICT_RATIO)
+        if self._total <= self.max_bytes:
+            return
+        victims = []
+        for digest, size in self._conn.execute(
+            "SELECT hash, size FROM parsed_messages ORDER BY last_used"
+        ):
+            if self._total <= target:
+                break
+            victims.append((digest,))
+            self._total -= size
+        self._conn.executemany("DELETE FROM parsed_messages WHERE hash = ?", victims)
+        logger.debug(f"解析缓存淘汰 {len(victims)} 条，剩余 {self._total} 字节")
+
+    def parse(self, raw_email):
+        """
+        解析原始邮件，同一内容只解析一次。
+
+        :return: 与 parse_email_bytes 相同的字典，但附件只有元信息（没有 payload）
+        """
+        digest = content_hash(raw_email)
+        cached = self.get(digest)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+        parsed = parse_email_bytes(raw_email)
+        self.put(digest, parsed)
+        return denormalize(normalize(parsed))
+
+    def close(self):
+        with self._lock:
+            self._flush_touches()
+            self._conn.commit()
+            self._conn.close()
+
+
+def get_parse_cache(path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+    """按路径缓存的 ParseCache 实例"""
+    path = os.path.abspath(path)
+    with _LOCK:
+        cache = _CACHES.get(path)
+        if cache is None:
+            cache = _CACHES[path] = ParseCache(path, max_bytes)
+        return cache
+
+
+def parse_cached(raw_email, path=DEFAULT_CACHE_PATH):
+    """使用默认缓存解析原始邮件，见 ParseCache.parse"""
+    return get_parse_cache(path).parse(raw_email)
+
+
+def close_parse_caches():
+    with _LOCK:
+        for cache in _CACHES.values():
+            cache.close()
+        _CACHES.clear()
+
+
+atexit.register(close_parse_caches)
@@ -0,0 +1,130 @@
+# ./rules.py
+"""
+邮件转发/打标签规则引擎。
+
+所有规则的关键词编译进同一个 Aho-Corasick 自动机，每封邮件的每个字段（主题、发件人、正文）
+只扫描一遍就能得到全部命中的关键词，耗时与邮件长度和命中数有关，与规则数量无关。
+关键词互相包含（例如 "工商" 与 "工商银行"）时都会命中，这一点用合并正则做不到。
+匹配不区分大小写。
+"""
+import logging
+from collections import deque
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("subject", "sender", "body")
+
+
+@dataclass(frozen=True)
+class Rule:
+    """
+    一条规则：fields 中任一字段包含 keywords 中任一关键词即命中。
+
+    target: 转发目标邮箱，为空表示只打标签
+    """
+
+    name: str
+    keywords: tuple
+    fields: tuple = FIELDS
+    target: str = None
+    tags: tuple = ()
+
+
+class AhoCorasick:
+    """多关键词匹配自动机，一次扫描找出文本中出现的全部关键词（包括重叠的）"""
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        for index, pattern in enumerate(self.patterns):
+            self._add(pattern.casefold(), index)
+        self._build_failure_links()
+
+    def _add(self, pattern, index):
+        if not pattern:
+            return
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            node = next_node
+        self._output[node] += (index,)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                # 合并后缀节点的输出，扫描时不必再沿失败链查找
+                self._output[child] += self._output[self._fail[child]]
+
+    def find(self, text):
+        """返回文本中出现过的关键词序号集合"""
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set()
+        node = 0
+        for char in text.casefold():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found.update(output[node])
+        return found
+
+
+class RuleEngine:
+    """
+    按规则匹配邮件。
+
+    :param rules: Rule 列表
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        keywords = {}
+        # 关键词序号 -> [(规则序号, 规则适用的字段)]
+        self._owners = []
+        for rule_index, rule in enumerate(self.rules):
+            for keyword in rule.keywords:
+                key = keyword.casefold()
+                if not key:
+                    continue
+                if key not in keywords:
+                    keywords[key] = len(keywords)
+                    self._owners.append([])
+                self._owners[keywords[key]].append((rule_index, set(rule.fields)))
+        self._automaton = AhoCorasick(keywords)
+        logger.debug(f"已编译 {len(self.rules)} 条规则，{len(keywords)} 个关键词")
+
+    def match(self, fields):
+        """
+        :param fields: {"subject": ..., "sender": ..., "body": ...}，缺少的字段视为空
+        :return: 命中的规则列表（按规则定义顺序）
+        """
+        matched = set()
+        for field in FIELDS:
+            text = fields.get(field)
+            if not text:
+                continue
+            for keyword in self._automaton.find(text):
+                for rule_index, rule_fields in self._owners[keyword]:
+                    if field in rule_fields:
+                        matched.add(rule_index)
+        return [self.rules[i] for i in sorted(matched)]
+
+    def tags(self, fields):
+        """命中规则的全部标签"""
+        return sorted({tag for rule in self.match(fields) for tag in rule.tags})
@@ -0,0 +1,97 @@
+# ./statement_parser.py
+import logging
+import re
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 正则表达式，匹配信用卡账单表格中的记录行（与 MyTest/SQLProc.py 相同）
+PATTERN = re.compile(
+    r"\|\s*(\d+)\s*\|\s*(\d{4}-\d{2}-\d{2})\s*\|\s*(\d{4}-\d{2}-\d{2})\s*\|\s*([^|]*?)\s*\|\s*([^|]*?)\s*\|\s*([^|]*?)\s*\|\s*([^|]*?)\s*\|"
+)
+
+# "交易金额/币种" 形如 "1,234.56/RMB"、"-20.00/USD"
+AMOUNT_PATTERN = re.compile(r"^\s*([+-]?[\d,]*\.?\d+)\s*/\s*([A-Za-z]{3})\s*$")
+
+
+def parse_amount(text: str) -> Tuple[Optional[Decimal], Optional[str]]:
+    """
+    解析 "金额/币种" 字段。
+    :param text: 例如 "1,234.56/RMB"
+    :return: (金额, 币种)，无法解析时为 (None, None)
+    """
+    match = AMOUNT_PATTERN.match(text or "")
+    if not match:
+        return None, None
+    try:
+        amount = Decimal(match.group(1).replace(",", ""))
+    except InvalidOperation:
+        return None, None
+    return amount, match.group(2).upper()
+
+
+def parse_statement(body: Optional[str], source_email_id=None) -> List[dict]:
+    """
+    从账单邮件正文中提取交易记录，并把日期、金额和币种解析为类型化字段。
+    :param body: 邮件正文
+    :param source_email_id: 来源邮件 ID，写入每条记录
+    :return: 交易记录列表。同一账单中完全相同的交易（例如同一天同一商户的两笔相同消费）
+             按出现顺序编号为 occurrence 0, 1, ...，与来源邮件一起区分真实的重复消费
+             和被重复发送的账单
+    """
+    if not body:
+        return []
+
+    records = []
+    seen = {}
+    for line in body.splitlines():
+        match = PATTERN.match(line)
+        if not match:
+            continue
+        card, trade_date, post_date, trade_type, merchant, amount, posted = (
+            field.strip() for field in match.groups()
+        )
+        try:
+            trade_day = date.fromisoformat(trade_date)
+            post_day = date.fromisoformat(post_date)
+        except ValueError as e:
+            # 形如 2025-02-30 的日期能匹配 PATTERN 但不是合法日期，跳过该行
+            logger.warning(
+                f"邮件 {source_email_id} 的交易日期无效，已跳过: {line!r} ({e})"
+            )
+            continue
+        amount_value, currency = parse_amount(amount)
+        posted_value, posted_currency = parse_amount(posted)
+        if amount_value is None:
+            logger.warning(f"无法解析交易金额: {amount}")
+        key = (
+            card,
+            trade_date,
+            post_date,
+            trade_type,
+            merchant,
+            amount_value,
+            currency,
+        )
+        occurrence = seen.get(key, 0)
+        seen[key] = occurrence + 1
+        records.append(
+            {
+                "card_last4": card,
+                "trade_date": trade_day,
+                "post_date": post_day,
+                "trade_type": trade_type,
+                "merchant": merchant,
+                "amount": amount_value,
+                "currency": currency,
+                "posted_amount": posted_value,
+                "posted_currency": posted_currency,
+                "occurrence": occurrence,
+                "source_email_id": (
+                    str(source_email_id) if source_email_id is not None else None
+                ),
+            }
+        )
+    return records
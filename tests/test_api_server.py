@@ -0,0 +1,133 @@
+# ./test_api_server.py
+import asyncio
+import json
+import os
+import sys
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from api.server import CHUNK_SIZE, MailArchiveServer
+from database.db_init import create_session_factory
+from database.models import Attachment, Email
+
+
+def _get(url, headers=None):
+    request = urllib.request.Request(url, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, dict(response.headers), response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), e.read()
+
+
+def test_browse_archive(tmp_path):
+    Session = create_session_factory(f"sqlite:///{tmp_path / 'mail.db'}")
+    payload = os.urandom(CHUNK_SIZE * 2 + 123)
+    path = tmp_path / "statement.pdf"
+    path.write_bytes(payload)
+
+    session = Session()
+    for i in range(3):
+        session.add(
+            Email(
+                sender="bank@example.com",
+                recipients='["me@example.com"]',
+                subject=f"账单 {i}",
+                sent_at=datetime(2025, 1, i + 1),
+            )
+        )
+    session.flush()
+    email = session.query(Email).filter_by(subject="账单 2").one()
+    attachment = Attachment(
+        email_id=email.id,
+        filename="对账单.pdf",
+        filepath=str(path),
+        content_type="application/pdf",
+        size=len(payload),
+    )
+    session.add(attachment)
+    session.commit()
+    email_uuid, attachment_id = str(email.uuid), attachment.id
+    session.close()
+
+    async def scenario():
+        server = await MailArchiveServer(Session, port=0).start()
+        base = f"http://127.0.0.1:{server.port}"
+        try:
+            status, headers, body = await asyncio.to_thread(
+                _get, f"{base}/api/messages?limit=2"
+            )
+            assert status == 200
+            page = json.loads(body)
+            assert [item["subject"] for item in page["items"]] == ["账单 2", "账单 1"]
+
+            status, _, body = await asyncio.to_thread(
+                _get, f"{base}/api/messages?limit=2&cursor={page['next_cursor']}"
+            )
+            assert [item["subject"] for item in json.loads(body)["items"]] == ["账单 0"]
+
+            # 条件请求：内容未变化时返回 304
+            status, _, body = await asyncio.to_thread(
+                _get,
+                f"{base}/api/messages?limit=2",
+                {"If-None-Match": headers["ETag"]},
+            )
+            assert status == 304 and body == b""
+
+            status, _, body = await asyncio.to_thread(
+                _get, f"{base}/api/messages/{email_uuid}"
+            )
+            assert json.loads(body)["attachments"][0]["filename"] == "对账单.pdf"
+
+            status, _, body = await asyncio.to_thread(
+                _get, f"{base}/api/search?q=%E8%B4%A6%E5%8D%95%201"
+            )
+            assert [item["subject"] for item in json.loads(body)["items"]] == ["账单 1"]
+
+            status, headers, body = await asyncio.to_thread(
+                _get, f"{base}/api/attachments/{attachment_id}"
+            )
+            assert status == 200 and body == payload
+            assert headers["Content-Type"] == "application/pdf"
+
+            status, _, _ = await asyncio.to_thread(_get, f"{base}/api/messages/bad")
+            assert status == 404
+            status, _, _ = await asyncio.to_thread(
+                _get, f"{base}/api/messages?cursor=bad"
+            )
+            assert status == 400
+        finally:
+            await server.close()
+
+    asyncio.run(scenario())
+
+
+def test_post_with_body_closes_connection(tmp_path):
+    Session = create_session_factory(f"sqlite:///{tmp_path / 'mail.db'}")
+
+    async def scenario():
+        server = await MailArchiveServer(Session, port=0).start()
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            # 请求体看起来像另一个请求，不能被当作下一个请求处理
+            body = b"GET /api/messages HTTP/1.1\r\nHost: x\r\n\r\n"
+            writer.write(
+                b"POST /api/messages HTTP/1.1\r\nHost: x\r\n"
+                b"Content-Length: %d\r\n\r\n" % len(body) + body
+            )
+            await writer.drain()
+            data = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            return data
+        finally:
+            await server.close()
+
+    data = asyncio.run(scenario())
+    assert data.startswith(b"HTTP/1.1 405 ")
+    assert b"Connection: close" in data
+    assert b"Allow: GET, HEAD" in data
+    assert data.count(b"HTTP/1.1 ") == 1
@@ -0,0 +1,71 @@
+# ./test_archive.py
+import os
+import sys
+from datetime import datetime
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+from database.archive import BodyArchive, compress_body, decompress_body
+from database.db_init import create_session_factory
+from database.db_operations import archive_old_bodies, get_email, iter_email_bodies
+from database.models import Email
+
+
+def test_compress_round_trip():
+    data = "账单明细 ".encode("utf-8") * 1000
+    blob = compress_body(data)
+    assert len(blob) < len(data) // 10
+    assert decompress_body(blob) == data
+    with pytest.raises(ValueError):
+        decompress_body(b"?abc")
+
+
+def test_archive_and_transparent_read(tmp_path):
+    archive = BodyArchive(str(tmp_path / "archive.db"))
+    session = create_session_factory("sqlite://")()
+    for year in (2020, 2021, 2030):
+        session.add(
+            Email(
+                sender="bank@example.com",
+                recipients="[]",
+                subject=str(year),
+                text_content=f"{year} 年账单正文",
+                html_content=f"<p>{year}</p>",
+                headers='{"X": "1"}',
+                sent_at=datetime(year, 1, 1),
+            )
+        )
+    session.commit()
+
+    count, raw, compressed = archive_old_bodies(
+        session, archive, datetime(2025, 1, 1), batch_size=1
+    )
+    assert count == 2 and raw > 0 and compressed > 0
+    # 重复运行不会再次归档
+    assert archive_old_bodies(session, archive, datetime(2025, 1, 1))[0] == 0
+
+    old = session.query(Email).filter_by(subject="2020").one()
+    assert old.archived_at is not None
+    assert old.text_content is None and old.headers is None
+    session.expunge_all()
+
+    email = get_email(session, old.uuid, archive=archive)
+    assert email.text_content == "2020 年账单正文"
+    assert email.html_content == "<p>2020</p>"
+    assert not session.dirty  # 取回的正文不会写回主库
+    session.commit()
+    session.expunge_all()
+    assert get_email(session, old.uuid).text_content is None
+
+    bodies = dict(iter_email_bodies(session, archive=archive))
+    assert sorted(bodies.values()) == [
+        "2020 年账单正文",
+        "2021 年账单正文",
+        "2030 年账单正文",
+    ]
+    assert len(dict(iter_email_bodies(session))) == 1
+    session.close()
+    archive.close()
@@ -0,0 +1,204 @@
+# ./test_attachments.py
+import os
+import sys
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.db_init import create_session_factory
+from database.db_operations import save_email
+from database.models import ATTACHMENT_DOWNLOADED, ATTACHMENT_QUEUED, Attachment
+from imap import attachment_queue
+from imap.attachment_queue import AttachmentDownloader
+from imap.sync import sync_new_messages
+from parsers.attachment import AttachmentPolicy
+from tests.test_imap_partial import HEADER
+from utils.config import build_account
+
+PARSED = {
+    "sender": "bank@example.com",
+    "subject": "账单",
+    "attachments": [
+        {
+            "filename": "statement.pdf",
+            "content_type": "application/pdf",
+            "size": 3,
+            "section": "2",
+            "encoding": "base64",
+            "payload": b"pdf",
+        },
+        {
+            "filename": "photo.jpg",
+            "content_type": "image/jpeg",
+            "size": 5,
+            "section": "3",
+            "encoding": "base64",
+            "payload": None,
+        },
+        {
+            # 不符合附件策略，但完整下载时内容已经在内存中
+            "filename": "archive.zip",
+            "content_type": "application/zip",
+            "size": 3,
+            "section": "4",
+            "encoding": "base64",
+            "payload": b"zip",
+        },
+    ],
+}
+
+
+def test_policy_type_and_size():
+    policy = AttachmentPolicy(allowed_types=("application/pdf", "image/*"), max_size=10)
+    assert policy.allows("application/pdf", 10)
+    assert policy.allows("image/png", 1)
+    assert not policy.allows("application/pdf", 11)
+    assert not policy.allows("application/zip", 1)
+
+
+def test_save_email_keeps_payloads_and_queues_rest(tmp_path, monkeypatch):
+    Session = create_session_factory("sqlite://")
+    session = Session()
+    save_email(
+        session,
+        PARSED,
+        "qq",
+        "INBOX",
+        1,
+        attachments_dir=str(tmp_path),
+    )
+    session.commit()
+
+    pdf, photo, archive = session.query(Attachment).order_by(Attachment.section).all()
+    assert pdf.status == ATTACHMENT_DOWNLOADED
+    assert open(pdf.filepath, "rb").read() == b"pdf"
+    # 已下载的内容直接保存，不再进入队列重复下载
+    assert archive.status == ATTACHMENT_DOWNLOADED
+    assert open(archive.filepath, "rb").read() == b"zip"
+    assert photo.status == ATTACHMENT_QUEUED and photo.filepath is None
+
+    # 后台队列：用假的 IMAP 客户端下载排队中的附件
+    class FakeClient:
+        def login(self):
+            pass
+
+        def select(self, folder):
+            self.folder = folder
+
+        def logout(self):
+            pass
+
+    monkeypatch.setattr(
+        attachment_queue.EmailClient,
+        "from_account",
+        classmethod(lambda cls, a: FakeClient()),
+    )
+    monkeypatch.setattr(
+        attachment_queue, "download_part", lambda client, uid, part: b"jpeg!"
+    )
+    account = build_account(
+        "qq", {"username": "me@qq.com", "password": "x", "imap_server": "imap.qq.com"}
+    )
+    downloader = AttachmentDownloader(account, Session, str(tmp_path), workers=2)
+    assert downloader.run() == (1, 0)
+
+    session.expire_all()
+    photo = session.get(Attachment, photo.id)
+    assert photo.status == ATTACHMENT_DOWNLOADED
+    assert open(photo.filepath, "rb").read() == b"jpeg!"
+    session.close()
+
+
+BLOCKED_SIZE = 30 * 1024 * 1024
+BLOCKED_STRUCTURE = (
+    b'(("TEXT" "PLAIN" ("CHARSET" "utf-8") NIL NIL "7BIT" 4 1 NIL NIL NIL)'
+    b'("APPLICATION" "ZIP" ("NAME" "big.zip") NIL NIL "BASE64" %d NIL'
+    b' ("ATTACHMENT" ("FILENAME" "big.zip")) NIL)'
+    b' "MIXED" ("BOUNDARY" "b0") NIL NIL)' % (BLOCKED_SIZE * 4 // 3)
+)
+
+
+class BlockedPartClient:
+    """邮件带 30 MB 的 zip 附件；完整下载（fetch_messages）时直接失败"""
+
+    def __init__(self):
+        self.folder = None
+        self.commands = []
+
+    def select(self, folder="INBOX", readonly=True):
+        self.folder = folder
+        return {"exists": 1, "uidvalidity": 1}
+
+    def uids_after(self, last_uid):
+        return [1] if last_uid < 1 else []
+
+    def fetch_messages(self, uids, batch_size=50):
+        raise AssertionError("配置了附件策略时不应完整下载邮件")
+
+    def uid_fetch(self, uids, items):
+        self.commands.append(items)
+        if "BODYSTRUCTURE" in items:
+            head = b"1 (UID 1 RFC822.SIZE %d BODYSTRUCTURE " % (BLOCKED_SIZE * 2)
+            return [
+                (
+                    head + BLOCKED_STRUCTURE + b" BODY[HEADER] {%d}" % len(HEADER),
+                    HEADER,
+                ),
+                b")",
+            ]
+        assert "BODY.PEEK[2]" not in items
+        return [(b"1 (UID 1 BODY[1] {4}", b"body"), b")"]
+
+
+def test_sync_with_policy_skips_blocked_part(tmp_path):
+    Session = create_session_factory("sqlite://")
+    session = Session()
+    client = BlockedPartClient()
+    saved = sync_new_messages(
+        client,
+        session,
+        "qq",
+        partial=False,
+        parse_workers=0,
+        attachments_dir=str(tmp_path),
+        policy=AttachmentPolicy(),
+    )
+    assert saved == 1
+    (attachment,) = session.query(Attachment).all()
+    assert attachment.filename == "big.zip"
+    assert attachment.status == ATTACHMENT_QUEUED and attachment.filepath is None
+    assert client.commands[1] == "(UID BODY.PEEK[1])"
+    assert list(tmp_path.iterdir()) == []
+    session.close()
+
+
+def test_policy_rejected_payload_stays_queued(tmp_path):
+    Session = create_session_factory("sqlite://")
+    session = Session()
+    parsed = {
+        "subject": "大附件",
+        "attachments": [
+            {
+                "filename": "big.zip",
+                "content_type": "application/zip",
+                "size": BLOCKED_SIZE,
+                "section": "2",
+                "encoding": "base64",
+                "payload": b"\0" * BLOCKED_SIZE,
+            }
+        ],
+    }
+    save_email(
+        session,
+        parsed,
+        "qq",
+        "INBOX",
+        1,
+        attachments_dir=str(tmp_path),
+        policy=AttachmentPolicy(),
+    )
+    session.commit()
+    (attachment,) = session.query(Attachment).all()
+    assert attachment.status == ATTACHMENT_QUEUED and attachment.filepath is None
+    assert list(tmp_path.iterdir()) == []
+    session.close()
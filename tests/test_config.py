@@ -0,0 +1,229 @@
+# ./test_config.py
+import json
+import os
+import sys
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+from database.db_init import create_session_factory, session_scope
+from database.db_operations import save_email, set_email_tags
+from database.models import Email
+from MyTest import CopyEmail
+from utils import config as config_module
+from utils.config import (
+    ConfigError,
+    build_account,
+    get_config,
+    get_email_credentials,
+    reload_config,
+)
+from utils.ratelimit import RateLimiter
+
+
+@pytest.fixture
+def clean_env(monkeypatch, tmp_path):
+    """
+    清理 EMAIL_* 环境变量，并切换到空的临时目录，避免读取真实的 .env。
+    """
+    for key in list(os.environ):
+        if key.startswith("EMAIL_") or key == "DATABASE_URL":
+            monkeypatch.delenv(key)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config_module, "_dotenv_loaded", True)
+    reload_config()
+    yield tmp_path
+    reload_config()
+
+
+def test_accounts_from_env_with_presets(clean_env, monkeypatch):
+    monkeypatch.setenv("EMAIL_126_USERNAME", "me@126.com")
+    monkeypatch.setenv("EMAIL_126_PASSWORD", "secret")
+    monkeypatch.setenv("EMAIL_QQ_USERNAME", "me@qq.com")
+    monkeypatch.setenv("EMAIL_QQ_PASSWORD", "secret")
+    monkeypatch.setenv("EMAIL_QQ_FETCH_BATCH_SIZE", "200")
+
+    config = get_config()
+    assert set(config.accounts) == {"126", "qq"}
+
+    account_126 = config.get_account("126")
+    assert account_126.imap_server == "imap.126.com"
+    assert account_126.imap_port == 993  # 端口缺失时使用默认值而不是崩溃
+    assert account_126.idle is False
+
+    account_qq = config.get_account("qq")
+    assert account_qq.fetch_batch_size == 200
+    assert account_qq.idle is True
+
+    credentials = get_email_credentials()
+    assert credentials["qq"]["username"] == "me@qq.com"
+
+
+def test_json_accounts_and_defaults(clean_env):
+    config_file = clean_env / "config.json"
+    config_file.write_text(
+        json.dumps(
+            {
+                "database_url": "sqlite:///./mail.db",
+                "defaults": {"commit_interval": 500},
+                "accounts": {
+                    "work": {
+                        "username": "me@example.com",
+                        "password": "secret",
+                        "imap_server": "imap.example.com",
+                        "idle": "off",
+                        "smtp_rate_limit": "0.5",
+                    }
+                },
+            }
+        ),
+        encoding="utf-8",
+    )
+
+    config = get_config(str(config_file))
+    assert config.database_url == "sqlite:///./mail.db"
+    work = config.get_account("work")
+    assert work.commit_interval == 500
+    assert work.idle is False
+    assert work.smtp_rate_limit == 0.5
+    # 同一配置文件只解析一次
+    assert get_config(str(config_file)) is config
+
+
+def test_invalid_values_rejected(clean_env, monkeypatch):
+    monkeypatch.setenv("EMAIL_QQ_USERNAME", "me@qq.com")
+    monkeypatch.setenv("EMAIL_QQ_PASSWORD", "secret")
+    monkeypatch.setenv("EMAIL_QQ_IMAP_PORT", "not-a-port")
+
+    with pytest.raises(ConfigError):
+        get_config()
+
+    monkeypatch.delenv("EMAIL_QQ_IMAP_PORT")
+    reload_config()
+    with pytest.raises(ConfigError):
+        get_config().get_account("missing")
+
+
+def test_rate_limiter_spaces_calls():
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    limiter = RateLimiter(2, clock=lambda: now[0], sleep=sleep)
+    assert limiter.wait() == 0
+    assert limiter.wait() == 0.5
+    now[0] += 2  # 空闲一段时间后不需要等待
+    assert limiter.wait() == 0
+    assert sleeps == [0.5]
+    with pytest.raises(ValueError):
+        RateLimiter(0)
+
+
+def test_forwarder_uses_account_and_rate_limit(clean_env, monkeypatch):
+    rules = clean_env / "rules.ini"
+    rules.write_text("[forward]\ntarget_email = me@example.com\n", encoding="utf-8")
+    account = build_account(
+        "126",
+        {"username": "me@126.com", "password": "secret", "smtp_rate_limit": "0.5"},
+    )
+    sent = []
+
+    class FakeSMTP:
+        def __init__(self, host, port):
+            sent.append((host, port))
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def login(self, username, password):
+            assert (username, password) == ("me@126.com", "secret")
+
+        def sendmail(self, sender, target, message):
+            sent.append((sender, target))
+
+    monkeypatch.setattr(CopyEmail.smtplib, "SMTP_SSL", FakeSMTP)
+    forwarder = CopyEmail.EmailForwarder(account, str(rules), keyword="工商")
+    assert forwarder.limiter.interval == 2
+    waits = []
+    monkeypatch.setattr(forwarder.limiter, "wait", lambda: waits.append(1))
+    forwarder.apply_rules(
+        {
+            "subject": "工商银行账单",
+            "sender": "",
+            "text_content": "正文",
+            "html_content": None,
+        }
+    )
+    assert sent == [("smtp.126.com", 465), ("me@126.com", "me@example.com")]
+    assert waits == [1]
+
+
+def test_forwarder_saves_rule_tags(clean_env):
+    rules = clean_env / "rules.ini"
+    rules.write_text(
+        "[rule:icbc]\nkeywords = 工商\ntags = 工商银行, 信用卡\n", encoding="utf-8"
+    )
+    db_url = f"sqlite:///{clean_env / 'tags.db'}"
+    session_factory = create_session_factory(db_url)
+    with session_scope(session_factory) as session:
+        email = save_email(
+            session,
+            {"subject": "工商银行账单", "message_id": "<icbc-1@example.com>"},
+            "126",
+            "INBOX",
+            1,
+        )
+        set_email_tags(session, email, ["账单"])
+
+    account = build_account("126", {"username": "me@126.com", "password": "x"})
+    forwarder = CopyEmail.EmailForwarder(account, str(rules), db_url=db_url)
+    matched = forwarder.apply_rules(
+        {
+            "subject": "工商银行账单",
+            "sender": "",
+            "text_content": "正文",
+            "html_content": None,
+            "message_id": "<icbc-1@example.com>",
+        }
+    )
+    assert [rule.name for rule in matched] == ["icbc"]
+    with session_scope(session_factory) as session:
+        email = session.query(Email).one()
+        assert json.loads(email.tags) == ["信用卡", "工商银行", "账单"]
+        assert sorted(row.tag for row in email.tag_rows) == [
+            "信用卡",
+            "工商银行",
+            "账单",
+        ]
+
+
+def test_forwarder_records_parse_time(clean_env):
+    from tests.test_parse_cache import make_email
+    from utils.diagnostics import SlowMessageTracker
+
+    rules = clean_env / "rules.ini"
+    rules.write_text("", encoding="utf-8")
+    account = build_account("126", {"username": "me@126.com", "password": "x"})
+    tracker = SlowMessageTracker()
+    forwarder = CopyEmail.EmailForwarder(
+        account, str(rules), keyword="工商", slow_tracker=tracker
+    )
+    raw = make_email("工商银行账单")
+
+    class FakeConn:
+        def fetch(self, email_id, items):
+            return "OK", [(b"1 (RFC822 {%d}" % len(raw), raw)]
+
+    forwarder.conn = FakeConn()
+    assert forwarder.fetch_email(b"1")["subject"] == "工商银行账单"
+    (record,) = tracker.slowest()
+    assert record["uid"] == "1" and record["size"] == len(raw)
+    assert record["content_type"] == "text/plain"
@@ -6,13 +6,19 @@ import sys
 # 动态添加项目根目录到 sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+import threading
+
 import pytest
-from sqlalchemy import create_engine
 from sqlalchemy.inspection import inspect
-from sqlalchemy.orm import sessionmaker
 
-from database.db_init import initialize_database  # 正常导入
-from database.models import Attachment, Base, Email
+from database.db_init import (  # 正常导入
+    create_session_factory,
+    dispose_engines,
+    get_engine,
+    initialize_database,
+    session_scope,
+)
+from database.models import Attachment, Email
 from utils.logger import setup_logger  # 引入日志配置函数
 
 # 初始化日志记录器
@@ -27,10 +33,8 @@ def setup_database():
     """
     测试数据库环境配置。
     """
-    # 创建测试数据库
-    engine = create_engine(DATABASE_URL)
-    Base.metadata.create_all(engine)
-    Session = sessionmaker(bind=engine)
+    # 创建测试数据库（与 initialize_database 共用同一个引擎）
+    Session = create_session_factory(DATABASE_URL)
     session = Session()
 
     logger.info("Test database setup complete.")
@@ -39,7 +43,7 @@ def setup_database():
 
     # 测试完成后清理环境
     session.close()  # 关闭数据库会话
-    engine.dispose()  # 释放数据库连接
+    dispose_engines()  # 释放数据库连接
 
 
 def test_initialize_database(setup_database):
@@ -51,7 +55,7 @@ def test_initialize_database(setup_database):
     initialize_database(DATABASE_URL)
 
     # 验证表是否存在
-    engine = create_engine(DATABASE_URL)
+    engine = get_engine(DATABASE_URL)
     inspector = inspect(engine)  # 使用 inspect() 方法获取表信息
     tables = inspector.get_table_names()
 
@@ -85,6 +89,44 @@ def test_sample_data_inserted(setup_database):
     logger.info("Sample data insertion test passed.")
 
 
+def test_engine_is_shared_and_tuned(setup_database):
+    """
+    测试同一 URL 共用引擎，SQLite 连接启用 WAL。
+    """
+    engine = get_engine(DATABASE_URL)
+    assert get_engine(DATABASE_URL) is engine
+    assert create_session_factory(DATABASE_URL) is create_session_factory(DATABASE_URL)
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+
+
+def test_concurrent_sessions_release_connections(setup_database):
+    """
+    测试多个线程并发使用会话后，连接全部归还连接池。
+    """
+    engine = get_engine(DATABASE_URL)
+    checked_out = engine.pool.checkedout()  # fixture 的会话可能占用一个连接
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(5):
+                with session_scope(create_session_factory(DATABASE_URL)) as session:
+                    session.query(Email).count()
+                    session.query(Attachment).count()
+        except Exception as e:  # pragma: no cover - 失败时在主线程断言
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert engine.pool.checkedout() == checked_out
+
+
 if os.path.exists("./test_database.db"):
     # os.remove("./test_database.db")  # 删除测试数据库文件
     logger.info("Test database cleaned up.")
@@ -0,0 +1,74 @@
+# ./test_db_query.py
+import os
+import sys
+from datetime import datetime, timedelta
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+from database.db_init import create_session_factory
+from database.db_operations import decode_cursor, query_emails, set_email_tags
+from database.models import Email
+
+
+@pytest.fixture
+def session():
+    Session = create_session_factory("sqlite://")
+    session = Session()
+    base = datetime(2025, 1, 1)
+    for i in range(9):
+        # 每两封邮件同一时间，验证 id 作为第二排序键
+        email = Email(
+            sender="bank@example.com" if i % 2 else "friend@example.com",
+            recipients="[]",
+            subject=str(i),
+            sent_at=base + timedelta(days=i // 2),
+        )
+        session.add(email)
+        session.flush()
+        if i % 3 == 0:
+            set_email_tags(session, email, ["账单", "账单", " "])
+    session.commit()
+    yield session
+    session.close()
+
+
+def _all_pages(session, **filters):
+    pages, cursor = [], None
+    while True:
+        emails, cursor = query_emails(session, cursor=cursor, limit=2, **filters)
+        pages.append([email.subject for email in emails])
+        if cursor is None:
+            return pages
+
+
+def test_keyset_pages_cover_all_rows_once(session):
+    pages = _all_pages(session)
+    subjects = [subject for page in pages for subject in page]
+    assert len(pages) == 5
+    assert sorted(subjects) == [str(i) for i in range(9)]
+    assert subjects[0] == "8"
+
+    ascending = _all_pages(session, descending=False)
+    assert [s for page in ascending for s in page] == subjects[::-1]
+
+
+def test_filters(session):
+    emails, _ = query_emails(session, tag="账单")
+    assert sorted(email.subject for email in emails) == ["0", "3", "6"]
+    assert emails[0].tags == '["账单"]'
+
+    emails, _ = query_emails(
+        session,
+        sender="bank@example.com",
+        since=datetime(2025, 1, 2),
+        until=datetime(2025, 1, 4),
+    )
+    assert sorted(email.subject for email in emails) == ["3", "5"]
+
+
+def test_invalid_cursor():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
@@ -0,0 +1,64 @@
+# ./test_diagnostics.py
+import os
+import sys
+import threading
+import time
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.db_init import create_session_factory
+from imap.sync import sync_new_messages
+from tests.test_imap_sync import FakeClient, make_raw
+from utils.diagnostics import SamplingProfiler, SlowMessageTracker, run_diagnostics
+
+
+def test_slow_tracker_keeps_slowest():
+    tracker = SlowMessageTracker(limit=3)
+    for uid, seconds in enumerate([0.5, 0.1, 0.9, 0.3, 0.7]):
+        tracker.record(seconds, uid=uid, size=100 * uid)
+    assert [r["uid"] for r in tracker.slowest()] == [2, 4, 0]
+
+
+def test_sync_records_parse_times():
+    session = create_session_factory("sqlite://")()
+    client = FakeClient({1: make_raw("a"), 2: make_raw("b")})
+    tracker = SlowMessageTracker()
+
+    sync_new_messages(client, session, "qq", slow_tracker=tracker)
+
+    records = tracker.slowest()
+    assert sorted(r["uid"] for r in records) == [1, 2]
+    assert all(r["content_type"] == "text/plain" for r in records)
+    assert all(r["size"] == len(client.messages[r["uid"]]) for r in records)
+    session.close()
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_profiler_writes_collapsed_stacks(tmp_path):
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,), name="worker")
+    worker.start()
+    profiler = SamplingProfiler(interval=0.001).start()
+    time.sleep(0.1)
+    profiler.stop()
+    stop.set()
+    worker.join()
+
+    path = profiler.write_collapsed(str(tmp_path / "run.collapsed"))
+    lines = open(path, encoding="utf-8").read().splitlines()
+    assert any(line.startswith("worker;") and "busy_loop" in line for line in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+
+
+def test_run_diagnostics_writes_profile(tmp_path):
+    with run_diagnostics("fetch", profile=True, profile_dir=str(tmp_path)) as tracker:
+        tracker.record(0.2, uid=1)
+        time.sleep(0.05)
+    files = os.listdir(tmp_path)
+    assert len(files) == 1 and files[0].startswith("fetch-")
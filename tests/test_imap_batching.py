@@ -0,0 +1,114 @@
+# ./test_imap_batching.py
+import os
+import sys
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from imap.batching import AdaptiveBatcher
+from imap.client import EmailClient, parse_uid_set
+
+KB = 1024
+
+
+def test_take_packs_by_byte_budget():
+    batcher = AdaptiveBatcher(target_seconds=10, budget=100 * KB)
+    sizes = {1: 40 * KB, 2: 40 * KB, 3: 40 * KB, 4: 500 * KB, 5: 5 * KB}
+    uids = sorted(sizes)
+    assert batcher.take(uids, sizes) == [1, 2]
+    assert batcher.take(uids, sizes, 2) == [3]
+    # 超过预算的大邮件单独一批
+    assert batcher.take(uids, sizes, 3) == [4]
+    assert batcher.take(uids, sizes, 4) == [5]
+
+
+def test_aimd_budget():
+    batcher = AdaptiveBatcher(
+        target_seconds=10, budget=1024 * KB, step=512 * KB, min_budget=64 * KB
+    )
+    # 快速完成：加性增大
+    batcher.record(1024 * KB, 0.1)
+    assert batcher.budget == 1536 * KB
+    # 超过目标耗时：减半
+    batcher.record(1536 * KB, 12)
+    assert batcher.budget == 768 * KB
+    batcher.record_timeout(768 * KB)
+    assert batcher.budget == 384 * KB
+    # 超时批次大小的 3/4 成为上限
+    batcher.record(384 * KB, 0.01)
+    assert batcher.budget == 576 * KB
+
+
+def test_budget_capped_by_measured_throughput():
+    batcher = AdaptiveBatcher(target_seconds=2, budget=1024 * KB, step=4096 * KB)
+    batcher.record(1024 * KB, 1.0)  # 1 MB/s，目标 2 秒
+    assert batcher.budget == 2048 * KB
+
+
+class FakeMail:
+    """模拟 imaplib 的 UID FETCH，批次总大小超过 timeout_bytes 时超时"""
+
+    def __init__(self, sizes, timeout_bytes=None):
+        self.sizes = sizes
+        self.timeout_bytes = timeout_bytes
+        self.batches = []
+
+    def uid(self, command, uid_set, items):
+        uids = parse_uid_set(uid_set)
+        if "RFC822.SIZE" in items:
+            return "OK", [
+                f"{i} (UID {uid} RFC822.SIZE {self.sizes[uid]})".encode()
+                for i, uid in enumerate(uids, 1)
+                if uid in self.sizes
+            ]
+        if self.timeout_bytes and sum(self.sizes[uid] for uid in uids) > (
+            self.timeout_bytes
+        ):
+            raise TimeoutError("timed out")
+        self.batches.append(uids)
+        data = []
+        for i, uid in enumerate(uids, 1):
+            body = b"x" * self.sizes[uid]
+            data.append((f"{i} (UID {uid} BODY[] {{{len(body)}}}".encode(), body))
+            data.append(b")")
+        return "OK", data
+
+
+class ReconnectingClient(EmailClient):
+    def __init__(self, mail, **kwargs):
+        super().__init__("me", "x", **kwargs)
+        self.mail = mail
+        self.reconnects = 0
+
+    def reconnect(self):
+        self.reconnects += 1
+
+
+def test_adaptive_fetch_skips_missing_and_packs():
+    sizes = {uid: 10 * KB for uid in range(1, 21)}
+    del sizes[7]  # 已被服务器删除
+    client = ReconnectingClient(FakeMail(sizes))
+    client.batcher.budget = 50 * KB
+
+    uids = [uid for uid, _ in client.fetch_messages(range(1, 21), batch_size=2)]
+    assert uids == [uid for uid in range(1, 21) if uid != 7]
+    assert len(client.mail.batches[0]) == 5
+    assert len(client.mail.batches) < 10
+
+
+def test_timeout_shrinks_batch_and_reconnects():
+    sizes = {uid: 100 * KB for uid in range(1, 11)}
+    client = ReconnectingClient(FakeMail(sizes, timeout_bytes=300 * KB))
+    client.batcher.budget = 1000 * KB
+
+    uids = [uid for uid, _ in client.fetch_messages(range(1, 11))]
+    assert uids == list(range(1, 11))
+    assert client.reconnects == 2  # 1000 KB -> 500 KB -> 250 KB
+    assert all(len(batch) <= 3 for batch in client.mail.batches)
+
+
+def test_fixed_batches_when_adaptive_disabled():
+    sizes = {uid: KB for uid in range(1, 8)}
+    client = ReconnectingClient(FakeMail(sizes), adaptive=False)
+    list(client.fetch_messages(range(1, 8), batch_size=3))
+    assert [len(batch) for batch in client.mail.batches] == [3, 3, 1]
@@ -0,0 +1,219 @@
+# ./test_imap_flags.py
+import json
+import os
+import re
+import sys
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.db_init import create_session_factory
+from database.models import Email, SyncState
+from imap.client import parse_uid_set
+from imap.flags import sync_flags
+
+
+class FakeModseqServer:
+    """模拟支持 CONDSTORE/QRESYNC 的文件夹：每次修改标记或删除都递增 modseq"""
+
+    def __init__(self, count):
+        self.modseq = 1
+        self.messages = {uid: [set(), 1] for uid in range(1, count + 1)}
+        self.expunged = {}  # uid -> 删除时的 modseq
+
+    def set_flags(self, uid, *flags):
+        self.modseq += 1
+        self.messages[uid] = [set(flags), self.modseq]
+
+    def expunge(self, uid):
+        self.modseq += 1
+        del self.messages[uid]
+        self.expunged[uid] = self.modseq
+
+
+class FakeFlagClient:
+    def __init__(self, server, condstore=True, qresync=True):
+        self.server = server
+        self.condstore = condstore
+        self.qresync = qresync
+        self.folder = None
+        self.mailbox = {}
+        self.fetched_uids = 0
+        self.searches = 0
+        self.selects = 0
+        self._vanished = set()
+
+    def select(self, folder="INBOX", readonly=True):
+        self.selects += 1
+        self.folder = folder
+        self.mailbox = {
+            "exists": len(self.server.messages),
+            "uidvalidity": 1,
+            "highestmodseq": self.server.modseq if self.condstore else None,
+        }
+        return self.mailbox
+
+    def uid_fetch(self, uids, items, modifiers=None):
+        if isinstance(uids, str):
+            low, high = uids.split(":")
+            uids = range(int(low), int(high) + 1)
+        since = 0
+        if modifiers:
+            since = int(re.search(r"CHANGEDSINCE (\d+)", modifiers).group(1))
+            if "VANISHED" in modifiers:
+                self._vanished = {
+                    uid
+                    for uid, modseq in self.server.expunged.items()
+                    if modseq > since
+                }
+        data = []
+        for i, uid in enumerate(uids, 1):
+            if uid in self.server.messages:
+                flags, modseq = self.server.messages[uid]
+                if modseq > since:
+                    self.fetched_uids += 1
+                    data.append(
+                        b"%d (UID %d FLAGS (%s) MODSEQ (%d))"
+                        % (i, uid, " ".join(sorted(flags)).encode(), modseq)
+                    )
+        return data
+
+    def vanished(self):
+        uids, self._vanished = self._vanished, set()
+        return uids
+
+    def uid_search(self, criteria="ALL"):
+        self.searches += 1
+        return sorted(self.server.messages)
+
+
+def make_session(count):
+    session = create_session_factory("sqlite://")()
+    for uid in range(1, count + 1):
+        session.add(
+            Email(
+                sender="bank@example.com",
+                recipients="[]",
+                subject=f"账单 {uid}",
+                account="qq",
+                folder="INBOX",
+                uid=uid,
+            )
+        )
+    session.add(SyncState(account="qq", folder="INBOX", uidvalidity=1, last_uid=count))
+    session.commit()
+    return session
+
+
+def flags_of(session, uid):
+    email = session.query(Email).filter_by(uid=uid).one()
+    return json.loads(email.flags), email.expunged_at is not None
+
+
+def test_parse_uid_set():
+    assert parse_uid_set("41,43:45, 50") == [41, 43, 44, 45, 50]
+
+
+def test_qresync_fetches_only_changes():
+    server = FakeModseqServer(200)
+    session = make_session(200)
+    client = FakeFlagClient(server)
+
+    assert sync_flags(client, session, "qq") == {"flags": 200, "expunged": 0}
+    assert client.fetched_uids == 200  # 首次同步需要全部标记
+
+    client.fetched_uids = 0
+    assert sync_flags(client, session, "qq") == {"flags": 0, "expunged": 0}
+    assert client.fetched_uids == 0  # HIGHESTMODSEQ 未变化
+
+    server.set_flags(7, "\\Seen", "\\Flagged")
+    server.expunge(9)
+    assert sync_flags(client, session, "qq") == {"flags": 1, "expunged": 1}
+    assert client.fetched_uids == 1
+    assert flags_of(session, 7) == (["\\Flagged", "\\Seen"], False)
+    assert flags_of(session, 9)[1]
+    session.close()
+
+
+def test_condstore_without_qresync_detects_expunge():
+    server = FakeModseqServer(50)
+    session = make_session(50)
+    client = FakeFlagClient(server, qresync=False)
+    sync_flags(client, session, "qq")
+
+    server.expunge(3)
+    server.set_flags(4, "\\Seen")
+    assert sync_flags(client, session, "qq") == {"flags": 1, "expunged": 1}
+    session.close()
+
+
+def test_unstored_message_does_not_force_search_every_poll():
+    # 服务器上的第 21 封邮件解析失败，从未入库
+    server = FakeModseqServer(21)
+    session = make_session(20)
+    client = FakeFlagClient(server, qresync=False)
+    sync_flags(client, session, "qq")  # 首次同步取得基准 modseq
+    sync_flags(client, session, "qq")
+    assert client.searches == 1
+    assert session.query(SyncState).one().unstored == 1
+
+    for _ in range(3):
+        sync_flags(client, session, "qq")
+    assert client.searches == 1
+
+    server.expunge(2)
+    assert sync_flags(client, session, "qq")["expunged"] == 1
+    assert client.searches == 2
+    session.close()
+
+
+def test_fallback_compares_all_flags():
+    server = FakeModseqServer(30)
+    session = make_session(30)
+    client = FakeFlagClient(server, condstore=False, qresync=False)
+    sync_flags(client, session, "qq")
+
+    server.set_flags(2, "\\Seen")
+    server.expunge(5)
+    assert sync_flags(client, session, "qq", full_interval=0) == {
+        "flags": 1,
+        "expunged": 1,
+    }
+    assert session.query(SyncState).one().highestmodseq is None
+    session.close()
+
+
+def test_fallback_full_diff_runs_once_per_interval():
+    server = FakeModseqServer(30)
+    session = make_session(30)
+    client = FakeFlagClient(server, condstore=False, qresync=False)
+    sync_flags(client, session, "qq")
+    assert client.fetched_uids == 30
+    assert session.query(SyncState).one().flags_full_sync_at is not None
+
+    # 间隔内不再比对全部标记，EXISTS 与 COUNT(*) 一致时也不 SEARCH
+    client.fetched_uids = 0
+    server.set_flags(2, "\\Seen")
+    assert sync_flags(client, session, "qq") == {"flags": 0, "expunged": 0}
+    assert client.fetched_uids == 0
+    assert client.searches == 0
+
+    # 删除仍然通过 EXISTS 与 COUNT(*) 之差发现
+    server.expunge(5)
+    assert sync_flags(client, session, "qq") == {"flags": 0, "expunged": 1}
+    assert client.fetched_uids == 0
+    assert client.searches == 1
+    session.close()
+
+
+def test_reuses_mailbox_from_caller():
+    server = FakeModseqServer(10)
+    session = make_session(10)
+    client = FakeFlagClient(server)
+    mailbox = client.select("INBOX")
+    sync_flags(client, session, "qq", mailbox=mailbox)
+    assert client.selects == 1
+
+    sync_flags(client, session, "qq")
+    assert client.selects == 2
+    session.close()
@@ -0,0 +1,147 @@
+# ./test_imap_folders.py
+import os
+import sys
+import threading
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.db_init import create_session_factory
+from database.models import Email, SyncState
+from imap.folders import (
+    decode_modified_utf7,
+    encode_modified_utf7,
+    parse_list_response,
+    parse_status_response,
+)
+from imap.scheduler import FolderScheduler
+from tests.test_imap_parallel import make_account
+from tests.test_imap_sync import make_raw
+
+
+def test_modified_utf7_round_trip():
+    assert encode_modified_utf7("已发送") == "&XfJT0ZAB-"
+    assert decode_modified_utf7("&XfJT0ZAB-") == "已发送"
+    for name in ("INBOX", "银行/招商 & Co", "A&B", "其他文件夹/2024"):
+        assert decode_modified_utf7(encode_modified_utf7(name)) == name
+
+
+def test_parse_list_and_status():
+    folders = parse_list_response(
+        [
+            b'(\\HasNoChildren \\Sent) "/" "&XfJT0ZAB-"',
+            (b'(\\Noselect) "/" {4}', b"Bank"),
+            b"() NIL INBOX",
+        ]
+    )
+    assert [f.name for f in folders] == ["已发送", "Bank", "INBOX"]
+    assert [f.priority() for f in folders] == [30, 10, 0]
+    assert not folders[1].selectable
+
+    status = parse_status_response([b'"INBOX" (MESSAGES 3 UIDNEXT 10 UIDVALIDITY 1)'])
+    assert status == {"messages": 3, "uidnext": 10, "uidvalidity": 1}
+
+
+class FakeFolderServer:
+    """模拟多文件夹服务器，记录 SELECT 过的文件夹和同时存在的连接数"""
+
+    def __init__(self, folders):
+        self.folders = folders  # {名称: (flags, {uid: 原始邮件})}
+        self.selected = []
+        self.connections = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def connect(self, account):
+        return FakeFolderClient(self)
+
+
+class FakeFolderClient:
+    condstore = qresync = False
+
+    def __init__(self, server):
+        self.server = server
+        self.folder = None
+        self.mailbox = {}
+
+    def login(self):
+        with self.server.lock:
+            self.server.connections += 1
+            self.server.peak = max(self.server.peak, self.server.connections)
+
+    def logout(self):
+        with self.server.lock:
+            self.server.connections -= 1
+
+    def list_folders(self):
+        lines = [
+            f'({" ".join(flags)}) "/" "{encode_modified_utf7(name)}"'.encode()
+            for name, (flags, _) in self.server.folders.items()
+        ]
+        return parse_list_response(lines)
+
+    def status(self, folder):
+        messages = self.server.folders[folder][1]
+        return {
+            "messages": len(messages),
+            "uidnext": max(messages, default=0) + 1,
+            "uidvalidity": 1,
+        }
+
+    def select(self, folder, readonly=True):
+        self.folder = folder
+        with self.server.lock:
+            self.server.selected.append(folder)
+        self.mailbox = {"exists": len(self.server.folders[folder][1]), "uidvalidity": 1}
+        return self.mailbox
+
+    def uid_fetch(self, uids, items, modifiers=None):
+        messages = self.server.folders[self.folder][1]
+        return [
+            b"%d (UID %d FLAGS (\\Seen))" % (i, uid)
+            for i, uid in enumerate(uids, 1)
+            if uid in messages
+        ]
+
+    def uids_after(self, last_uid):
+        return sorted(u for u in self.server.folders[self.folder][1] if u > last_uid)
+
+    def fetch_messages(self, uids, batch_size=50):
+        for uid in uids:
+            yield uid, self.server.folders[self.folder][1][uid]
+
+
+def test_scheduler_skips_unchanged_folders(tmp_path):
+    Session = create_session_factory(f"sqlite:///{tmp_path / 'folders.db'}")
+    server = FakeFolderServer(
+        {
+            "INBOX": ([], {1: make_raw("i1"), 2: make_raw("i2")}),
+            "银行/招商": ([], {1: make_raw("b1")}),
+            "已发送": (["\\Sent"], {1: make_raw("s1")}),
+            "垃圾邮件": (["\\Junk"], {1: make_raw("j1")}),
+            "Bank": (["\\Noselect"], {}),
+        }
+    )
+    account = make_account(max_connections=2)
+    scheduler = FolderScheduler(
+        [account], Session, budget=3, client_factory=server.connect
+    )
+
+    results = scheduler.run()
+    assert results == {("qq", "INBOX"): 2, ("qq", "银行/招商"): 1, ("qq", "已发送"): 1}
+    assert server.peak <= 2 and server.connections == 0
+
+    # 没有变化时不再 SELECT 任何文件夹
+    server.selected.clear()
+    assert scheduler.run() == {}
+    assert server.selected == []
+
+    server.folders["银行/招商"][1][2] = make_raw("b2")
+    assert scheduler.run() == {("qq", "银行/招商"): 1}
+    assert set(server.selected) == {"银行/招商"}
+
+    session = Session()
+    assert session.query(Email).count() == 5
+    state = session.query(SyncState).filter_by(folder="银行/招商").one()
+    assert (state.last_uid, state.uidnext, state.messages) == (2, 3, 2)
+    session.close()
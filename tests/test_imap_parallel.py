@@ -0,0 +1,118 @@
+# ./test_imap_parallel.py
+import os
+import sys
+import threading
+import time
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+from database.db_init import create_session_factory
+from database.models import Email, SyncState
+from imap.client import IMAPClientError
+from imap.parallel import ParallelFetcher, partition_uids
+from imap.sync import sync_new_messages
+from tests.test_imap_sync import FakeClient, make_raw
+from utils.config import AccountConfig
+
+
+class FakeServer:
+    """模拟服务器：记录同时存在的连接数，超过 limit 时拒绝登录"""
+
+    def __init__(self, messages, limit=10):
+        self.messages = messages
+        self.limit = limit
+        self.connections = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def connect(self, account):
+        return FakeConnection(self)
+
+
+class FakeConnection(FakeClient):
+    def __init__(self, server):
+        super().__init__(server.messages)
+        self.server = server
+
+    def login(self):
+        with self.server.lock:
+            if self.server.connections >= self.server.limit:
+                raise IMAPClientError("Too many connections")
+            self.server.connections += 1
+            self.server.peak = max(self.server.peak, self.server.connections)
+        self.logged_in = True
+
+    def logout(self):
+        if getattr(self, "logged_in", False):
+            with self.server.lock:
+                self.server.connections -= 1
+            self.logged_in = False
+
+    def fetch_messages(self, uids, batch_size=50):
+        time.sleep(0.005)  # 模拟网络延迟，让多个连接的下载时间重叠
+        yield from super().fetch_messages(uids, batch_size)
+
+
+def make_account(max_connections=4):
+    return AccountConfig(
+        name="qq",
+        username="me@qq.com",
+        password="x",
+        imap_server="imap.qq.com",
+        max_connections=max_connections,
+    )
+
+
+def test_partition_uids():
+    assert partition_uids([5, 1, 2, 9, 3], 2) == [[1, 2], [3, 5], [9]]
+
+
+def test_parallel_fetch_preserves_order():
+    server = FakeServer({uid: make_raw(str(uid)) for uid in range(1, 101)})
+    fetcher = ParallelFetcher(make_account(), workers=8, client_factory=server.connect)
+
+    uids = [uid for uid, _ in fetcher.fetch_messages(range(1, 101), batch_size=7)]
+
+    assert uids == list(range(1, 101))
+    assert 1 < server.peak <= 4
+    assert server.connections == 0
+
+
+def test_parallel_fetch_continues_at_server_limit():
+    server = FakeServer({uid: make_raw(str(uid)) for uid in range(1, 41)}, limit=2)
+    fetcher = ParallelFetcher(make_account(), client_factory=server.connect)
+
+    uids = [uid for uid, _ in fetcher.fetch_messages(range(1, 41), batch_size=5)]
+
+    assert uids == list(range(1, 41))
+    assert server.peak == 2
+
+
+def test_parallel_fetch_raises_when_no_connection():
+    server = FakeServer({1: make_raw("a"), 2: make_raw("b")}, limit=0)
+    fetcher = ParallelFetcher(make_account(), client_factory=server.connect)
+    with pytest.raises(IMAPClientError):
+        list(fetcher.fetch_messages([1, 2], batch_size=1))
+
+
+def test_sync_with_parallel_fetcher():
+    messages = {uid: make_raw(str(uid)) for uid in range(1, 31)}
+    server = FakeServer(messages)
+    client = FakeClient(messages)
+    fetcher = ParallelFetcher(
+        make_account(), client=client, client_factory=server.connect
+    )
+    session = create_session_factory("sqlite://")()
+
+    saved = sync_new_messages(
+        client, session, "qq", batch_size=4, commit_interval=5, fetcher=fetcher
+    )
+
+    assert saved == 30
+    assert session.query(SyncState).one().last_uid == 30
+    assert session.query(Email).count() == 30
+    assert client.fetched  # 已登录的主连接也参与下载
+    session.close()
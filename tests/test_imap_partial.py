@@ -0,0 +1,107 @@
+# ./test_imap_partial.py
+import base64
+import os
+import sys
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from imap.bodystructure import parse_bodystructure, select_body_parts
+from imap.partial import fetch_partial_messages
+from imap.response import fetch_by_uid, parse_response
+
+HEADER = (
+    b"From: =?utf-8?b?5bel5ZWG6ZO26KGM?= <bank@icbc.com.cn>\r\n"
+    b"To: me@qq.com\r\n"
+    b"Subject: =?utf-8?b?6LSm5Y2V?=\r\n"
+    b"Date: Mon, 06 Jan 2025 10:00:00 +0800\r\n\r\n"
+)
+PLAIN = base64.b64encode("账单正文".encode("gb2312"))
+HTML = b"<p>=E8=B4=A6=E5=8D=95</p>"
+BODYSTRUCTURE = (
+    b'((("TEXT" "PLAIN" ("CHARSET" "gb2312") NIL NIL "BASE64" 12 1 NIL NIL NIL)'
+    b'("TEXT" "HTML" ("CHARSET" "utf-8") NIL NIL "QUOTED-PRINTABLE" 30 1 NIL NIL NIL)'
+    b' "ALTERNATIVE" ("BOUNDARY" "b1") NIL NIL)'
+    b'("APPLICATION" "PDF" ("NAME" "statement.pdf") NIL NIL "BASE64" 40000 NIL'
+    b' ("ATTACHMENT" ("FILENAME" "statement.pdf")) NIL)'
+    b' "MIXED" ("BOUNDARY" "b0") NIL NIL)'
+)
+
+
+class FakeClient:
+    """按 imaplib 的返回格式模拟 UID FETCH"""
+
+    def __init__(self):
+        self.commands = []
+
+    def uid_fetch(self, uids, items):
+        self.commands.append(items)
+        if "BODYSTRUCTURE" in items:
+            return [
+                (
+                    b"1 (UID 12 RFC822.SIZE 56000 BODYSTRUCTURE "
+                    + BODYSTRUCTURE
+                    + b" BODY[HEADER] {%d}" % len(HEADER),
+                    HEADER,
+                ),
+                b")",
+            ]
+        return [
+            (b"1 (UID 12 BODY[1.1] {%d}" % len(PLAIN), PLAIN),
+            (b" BODY[1.2] {%d}" % len(HTML), HTML),
+            b")",
+        ]
+
+
+def test_parse_response_handles_literals_and_brackets():
+    data = [
+        (b"3 (UID 7 BODY[HEADER.FIELDS (SUBJECT)] {9}", b"Subject\r\n"),
+        b" FLAGS (\\Seen))",
+    ]
+    assert parse_response(data) == [
+        b"3",
+        [
+            b"UID",
+            b"7",
+            b"BODY[HEADER.FIELDS (SUBJECT)]",
+            b"Subject\r\n",
+            b"FLAGS",
+            [b"\\Seen"],
+        ],
+    ]
+    assert fetch_by_uid(data)[7][b"FLAGS"] == [b"\\Seen"]
+
+
+def test_parse_bodystructure_sections():
+    parts = parse_bodystructure(parse_response(BODYSTRUCTURE)[0])
+
+    assert [(p.section, p.content_type) for p in parts] == [
+        ("1.1", "text/plain"),
+        ("1.2", "text/html"),
+        ("2", "application/pdf"),
+    ]
+    pdf = parts[2]
+    assert pdf.is_attachment and pdf.filename == "statement.pdf"
+    assert pdf.decoded_size == 30000
+    assert set(select_body_parts(parts)) == {"text/plain", "text/html"}
+
+
+def test_single_part_message_section():
+    node = parse_response(b'("TEXT" "PLAIN" ("CHARSET" "utf-8") NIL NIL "7BIT" 5 1)')[0]
+    (part,) = parse_bodystructure(node)
+    assert part.section == "1" and part.is_body
+
+
+def test_fetch_partial_downloads_only_bodies():
+    client = FakeClient()
+    ((uid, parsed),) = list(fetch_partial_messages(client, [12]))
+
+    assert uid == 12
+    assert client.commands[1] == "(UID BODY.PEEK[1.1] BODY.PEEK[1.2])"
+    assert parsed["subject"] == "账单"
+    assert parsed["sender"] == "bank@icbc.com.cn"
+    assert parsed["text_content"] == "账单正文"
+    assert parsed["html_content"] == "<p>账单</p>"
+    assert parsed["size"] == 56000
+    (attachment,) = parsed["attachments"]
+    assert attachment["section"] == "2" and attachment["payload"] is None
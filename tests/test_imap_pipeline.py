@@ -0,0 +1,105 @@
+# ./test_imap_pipeline.py
+import os
+import random
+import sys
+import time
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+from database.db_init import create_session_factory
+from database.models import Email, SyncState
+from imap.pipeline import pipelined
+from imap.sync import sync_new_messages
+from tests.test_imap_sync import FakeClient, make_raw
+
+
+def test_results_keep_fetch_order():
+    def parse(item):
+        time.sleep(random.random() / 500)
+        return item * 2
+
+    results = list(pipelined(lambda: iter(range(100)), parse, workers=4))
+    assert results == [i * 2 for i in range(100)]
+
+
+def test_backpressure_bounds_memory():
+    fetched = []
+
+    def fetch():
+        for i in range(50):
+            fetched.append(i)
+            yield i
+
+    for consumed, _ in enumerate(pipelined(fetch, lambda i: i, queue_size=5), 1):
+        time.sleep(0.002)
+        assert len(fetched) - consumed <= 5 + 1
+
+
+def test_backpressure_bounds_bytes():
+    fetched = []
+
+    def fetch():
+        for i in range(30):
+            fetched.append(i)
+            yield b"x" * 1000
+
+    stream = pipelined(fetch, lambda item: item, max_bytes=4000, sizeof=len)
+    for consumed, _ in enumerate(stream, 1):
+        time.sleep(0.002)
+        # 队列中最多 4 封 1000 字节的邮件，另有一封等待放入
+        assert len(fetched) - consumed <= 4 + 1
+
+    # 单封超过上限的邮件也能通过
+    big = [b"x" * 10000, b"y" * 10000]
+    assert list(pipelined(lambda: iter(big), len, max_bytes=4000, sizeof=len)) == [
+        10000,
+        10000,
+    ]
+
+
+def test_stages_overlap():
+    def fetch():
+        for i in range(20):
+            time.sleep(0.01)  # 网络
+            yield i
+
+    def parse(item):
+        time.sleep(0.01)  # 解析
+        return item
+
+    started = time.perf_counter()
+    for _ in pipelined(fetch, parse, workers=2):
+        time.sleep(0.01)  # 写库
+    # 顺序执行约 0.6 秒，流水线约 0.2 秒
+    assert time.perf_counter() - started < 0.45
+
+
+def test_fetch_error_propagates_and_early_exit():
+    def fetch():
+        yield 1
+        raise ConnectionError("断线")
+
+    with pytest.raises(ConnectionError):
+        list(pipelined(fetch, lambda i: i))
+
+    stream = pipelined(lambda: iter(range(1000)), lambda i: i, queue_size=3)
+    assert next(stream) == 0
+    stream.close()  # 下载线程随之退出，不会阻塞
+
+
+def test_sync_with_parse_workers():
+    session = create_session_factory("sqlite://")()
+    client = FakeClient({uid: make_raw(str(uid)) for uid in range(1, 41)})
+
+    saved = sync_new_messages(
+        client, session, "qq", batch_size=7, commit_interval=5, parse_workers=3
+    )
+
+    assert saved == 40
+    assert session.query(SyncState).one().last_uid == 40
+    uids = [uid for (uid,) in session.query(Email.uid).order_by(Email.id)]
+    assert uids == list(range(1, 41))
+    session.close()
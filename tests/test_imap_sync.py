@@ -0,0 +1,158 @@
+# ./test_imap_sync.py
+import os
+import socket
+import sys
+import threading
+from email.mime.text import MIMEText
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.db_init import create_session_factory
+from database.models import Email, SyncState
+from imap.client import format_uid_set
+from imap.idle import has_changes, has_new_mail, idle_wait
+from imap.sync import sync_new_messages
+
+
+def make_raw(subject):
+    msg = MIMEText(f"{subject} 正文", "plain", "utf-8")
+    msg["Subject"] = subject
+    msg["From"] = "bank@example.com"
+    msg["To"] = "me@example.com"
+    msg["Message-ID"] = f"<{subject}@example.com>"
+    return msg.as_bytes()
+
+
+class FakeClient:
+    """模拟 EmailClient，服务器上的邮件保存在 messages 字典中"""
+
+    def __init__(self, messages, uidvalidity=1):
+        self.messages = messages
+        self.uidvalidity = uidvalidity
+        self.folder = None
+        self.fetched = []
+
+    def select(self, folder="INBOX", readonly=True):
+        self.folder = folder
+        return {"exists": len(self.messages), "uidvalidity": self.uidvalidity}
+
+    def uids_after(self, last_uid):
+        return sorted(uid for uid in self.messages if uid > last_uid)
+
+    def fetch_messages(self, uids, batch_size=50):
+        for uid in uids:
+            self.fetched.append(uid)
+            yield uid, self.messages[uid]
+
+
+def test_format_uid_set():
+    assert format_uid_set([7, 1, 2, 3, 9, 10]) == "1:3,7,9:10"
+    assert format_uid_set([5]) == "5"
+
+
+def test_sync_fetches_only_new_uids():
+    Session = create_session_factory("sqlite://")
+    session = Session()
+    client = FakeClient({1: make_raw("a"), 2: make_raw("b")})
+
+    assert sync_new_messages(client, session, "qq", commit_interval=1) == 2
+
+    client.messages[5] = make_raw("c")
+    client.fetched.clear()
+    assert sync_new_messages(client, session, "qq") == 1
+    assert client.fetched == [5]
+
+    state = session.query(SyncState).one()
+    assert state.last_uid == 5
+    assert session.query(Email).filter(Email.account == "qq").count() == 3
+    session.close()
+
+
+def test_uidvalidity_change_remaps_by_message_id():
+    Session = create_session_factory("sqlite://")
+    session = Session()
+    sync_new_messages(FakeClient({1: make_raw("a")}), session, "qq")
+
+    # 服务器重建了文件夹：同一封邮件换了新的 UID
+    client = FakeClient({10: make_raw("a")}, uidvalidity=2)
+    sync_new_messages(client, session, "qq")
+
+    emails = session.query(Email).all()
+    assert len(emails) == 1
+    assert emails[0].uid == 10
+    session.close()
+
+
+class FakeIdleConnection:
+    """通过 socketpair 模拟处于 IDLE 状态的 imaplib 连接"""
+
+    def __init__(self):
+        self.client_sock, self.server_sock = socket.socketpair()
+
+    def _new_tag(self):
+        return b"A001"
+
+    def send(self, data):
+        self.client_sock.sendall(data)
+
+    def socket(self):
+        return self.client_sock
+
+
+def test_idle_wait_returns_on_exists():
+    conn = FakeIdleConnection()
+
+    def server():
+        assert conn.server_sock.recv(100) == b"A001 IDLE\r\n"
+        # 故意把一行拆成两段发送
+        conn.server_sock.sendall(b"+ idling\r\n* 4 EXI")
+        conn.server_sock.sendall(b"STS\r\n")
+        assert conn.server_sock.recv(100) == b"DONE\r\n"
+        conn.server_sock.sendall(b"A001 OK IDLE terminated\r\n")
+
+    thread = threading.Thread(target=server)
+    thread.start()
+    responses = idle_wait(conn, timeout=5)
+    thread.join()
+
+    assert responses == [b"* 4 EXISTS"]
+    assert has_new_mail(responses)
+
+
+def test_idle_wait_returns_on_flag_change():
+    conn = FakeIdleConnection()
+
+    def server():
+        conn.server_sock.recv(100)
+        conn.server_sock.sendall(b"+ idling\r\n* 3 FETCH (FLAGS (\\Seen))\r\n")
+        assert conn.server_sock.recv(100) == b"DONE\r\n"
+        conn.server_sock.sendall(b"A001 OK IDLE terminated\r\n")
+
+    thread = threading.Thread(target=server)
+    thread.start()
+    responses = idle_wait(conn, timeout=5)
+    thread.join()
+
+    assert responses == [b"* 3 FETCH (FLAGS (\\Seen))"]
+    assert has_changes(responses) and not has_new_mail(responses)
+    assert has_changes([b"* 2 EXPUNGE"]) and has_changes([b"* VANISHED 5:7"])
+
+
+def test_idle_wait_stops_on_event():
+    conn = FakeIdleConnection()
+    stop_event = threading.Event()
+
+    def server():
+        conn.server_sock.recv(100)
+        conn.server_sock.sendall(b"+ idling\r\n")
+        stop_event.set()
+        assert conn.server_sock.recv(100) == b"DONE\r\n"
+        conn.server_sock.sendall(b"A001 OK IDLE terminated\r\n")
+
+    thread = threading.Thread(target=server)
+    thread.start()
+    responses = idle_wait(conn, timeout=30, stop_event=stop_event, tick=0.05)
+    thread.join()
+
+    assert not has_new_mail(responses)
@@ -0,0 +1,146 @@
+# ./test_imap_transport.py
+import base64
+import imaplib
+import io
+import os
+import quopri
+import socket
+import sys
+import threading
+import zlib
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from imap.client import EmailClient
+from imap.partial import TransferDecodingWriter
+from imap.transport import TransportMixin
+
+PAYLOAD = "信用卡账单 statement line\r\n".encode("utf-8") * 4000
+
+
+class PlainTransport(TransportMixin, imaplib.IMAP4):
+    """测试用：不加密的 IMAP4，行为与 IMAP4Transport 相同"""
+
+
+class FakeCompressServer:
+    """支持 COMPRESS DEFLATE 和 UID FETCH 的最小 IMAP 服务器"""
+
+    def __init__(self):
+        self.listener = socket.socket()
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(1)
+        self.port = self.listener.getsockname()[1]
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        conn, _ = self.listener.accept()
+        compressor = decompressor = None
+        buffer = b""
+
+        def send(data):
+            if compressor is not None:
+                data = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            conn.sendall(data)
+
+        send(b"* OK ready\r\n")
+        while True:
+            while b"\r\n" not in buffer:
+                data = conn.recv(65536)
+                if not data:
+                    conn.close()
+                    return
+                if decompressor is not None:
+                    data = decompressor.decompress(data)
+                buffer += data
+            line, buffer = buffer.split(b"\r\n", 1)
+            tag, command = line.split(b" ", 1)
+            command = command.upper()
+            if command.startswith(b"CAPABILITY"):
+                send(
+                    b"* CAPABILITY IMAP4rev1 COMPRESS=DEFLATE\r\n"
+                    + tag
+                    + b" OK done\r\n"
+                )
+            elif command.startswith(b"COMPRESS"):
+                send(tag + b" OK compression active\r\n")
+                compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+                decompressor = zlib.decompressobj(-15)
+            elif command.startswith(b"SELECT"):
+                send(b"* 1 EXISTS\r\n" + tag + b" OK [READ-ONLY] done\r\n")
+            elif command.startswith(b"UID FETCH") and b"BODY.PEEK[]" in command:
+                response = b""
+                for seq, uid in ((1, 7), (2, 8)):
+                    body = PAYLOAD[: len(PAYLOAD) // seq]
+                    response += b"* %d FETCH (UID %d BODY[] {%d}\r\n" % (
+                        seq,
+                        uid,
+                        len(body),
+                    )
+                    response += body + b")\r\n"
+                send(response + tag + b" OK done\r\n")
+            elif command.startswith(b"UID FETCH"):
+                head = b"* 1 FETCH (UID 7 BODY[2] {%d}\r\n" % len(PAYLOAD)
+                send(head + PAYLOAD + b")\r\n" + tag + b" OK done\r\n")
+            elif command.startswith(b"LOGOUT"):
+                send(b"* BYE\r\n" + tag + b" OK done\r\n")
+                conn.close()
+                return
+            else:
+                send(tag + b" OK done\r\n")
+
+
+def test_compressed_fetch_streams_literal():
+    server = FakeCompressServer()
+    mail = PlainTransport("127.0.0.1", server.port)
+    mail.login("me", "x")
+    assert mail.start_compression()
+    mail.select("INBOX", readonly=True)
+
+    _, data = mail.uid("FETCH", "7", "(UID BODY.PEEK[2])")
+    assert data[0][1] == PAYLOAD
+    assert mail.compression_ratio() > 10
+
+    client = EmailClient("me", "x")
+    client.mail = mail
+    sink = io.BytesIO()
+    assert client.fetch_to_file(7, "2", sink) == len(PAYLOAD)
+    assert sink.getvalue() == PAYLOAD
+    mail.logout()
+
+
+def test_fetch_messages_spools_each_literal():
+    server = FakeCompressServer()
+    mail = PlainTransport("127.0.0.1", server.port)
+    mail.login("me", "x")
+    mail.select("INBOX", readonly=True)
+
+    client = EmailClient("me", "x", adaptive=False)
+    client.mail = mail
+    messages = list(client.fetch_messages([7, 8]))
+    assert messages == [(7, PAYLOAD), (8, PAYLOAD[: len(PAYLOAD) // 2])]
+    # 两封邮件的正文都经 LiteralSpool 分块写入，而不是由 imaplib 整块缓存
+    assert mail.streamed_bytes == len(PAYLOAD) + len(PAYLOAD) // 2
+    assert mail.literal_sink is None
+    mail.logout()
+
+
+def write_in_chunks(writer, data, size=1000):
+    for start in range(0, len(data), size):
+        writer.write(data[start : start + size])
+    writer.close()
+
+
+def test_transfer_decoding_writer():
+    encoded = base64.encodebytes(PAYLOAD)
+    out = io.BytesIO()
+    write_in_chunks(TransferDecodingWriter(out, "base64"), encoded, 777)
+    assert out.getvalue() == PAYLOAD
+
+    text = ("账单=明细 " * 50 + "\n").encode("utf-8") * 20
+    out = io.BytesIO()
+    write_in_chunks(
+        TransferDecodingWriter(out, "quoted-printable"), quopri.encodestring(text), 333
+    )
+    assert out.getvalue() == text
@@ -0,0 +1,184 @@
+# ./test_importers.py
+import json
+import os
+import sys
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.db_init import create_session_factory
+from database.models import Email, ImportState
+from importers.base import import_messages
+from importers.maildir import iter_maildir, parse_flags
+from importers.mbox import iter_mbox
+from tests.test_imap_sync import make_raw
+
+
+def write_mbox(path, subjects):
+    with open(path, "wb") as f:
+        for subject in subjects:
+            f.write(b"From bank@example.com Mon Jan  1 00:00:00 2024\n")
+            f.write(make_raw(subject).replace(b"\r\n", b"\n"))
+            f.write(b"\n")
+
+
+def test_mbox_scan_yields_views_and_offsets(tmp_path):
+    path = tmp_path / "Bank.mbox"
+    write_mbox(path, ["a", "b", "c"])
+    size = os.path.getsize(path)
+
+    messages = list(iter_mbox(str(path)))
+    assert [m.folder for m in messages] == ["Bank"] * 3
+    assert all(isinstance(m.data, memoryview) for m in messages)
+    assert bytes(messages[0].data).startswith(b"Content-Type")
+    assert not bytes(messages[0].data).endswith(b"\n\n")
+    assert messages[-1].next_position == size
+
+    # 从第二封邮件的偏移继续
+    rest = list(iter_mbox(str(path), start=messages[0].next_position))
+    assert [bytes(m.data) for m in rest] == [bytes(m.data) for m in messages[1:]]
+    for message in messages + rest:
+        message.data.release()
+
+
+def test_mbox_unquotes_from_lines(tmp_path):
+    path = tmp_path / "quoted.mbox"
+    path.write_bytes(
+        b"From x Mon Jan  1 00:00:00 2024\n"
+        b"Subject: q\n\n>From the bank\n>>From nested\n\n"
+        b"From y Mon Jan  1 00:00:00 2024\nSubject: r\n\nbody\n"
+    )
+    first, second = iter_mbox(str(path))
+    assert bytes(first.data) == b"Subject: q\n\nFrom the bank\n>From nested\n"
+    assert bytes(second.data) == b"Subject: r\n\nbody\n"
+    second.data.release()
+
+
+def test_import_mbox_resumes_from_checkpoint(tmp_path):
+    path = tmp_path / "archive.mbox"
+    write_mbox(path, ["a", "b"])
+    Session = create_session_factory("sqlite://")
+    session = Session()
+
+    scan = lambda start, seen: iter_mbox(str(path), start)
+    assert import_messages(session, str(path), scan, account="local") == 2
+
+    # 归档追加了新邮件：只导入新增部分
+    with open(path, "ab") as f:
+        f.write(b"From bank@example.com Mon Jan  1 00:00:00 2024\n")
+        f.write(make_raw("c").replace(b"\r\n", b"\n"))
+    assert import_messages(session, str(path), scan, account="local") == 1
+
+    state = session.query(ImportState).one()
+    assert state.position == os.path.getsize(path)
+    assert state.imported == 3
+    subjects = sorted(email.subject for email in session.query(Email))
+    assert subjects == ["a", "b", "c"]
+    session.close()
+
+
+def make_maildir(root, files):
+    for sub in ("cur", "new", "tmp"):
+        os.makedirs(os.path.join(root, sub), exist_ok=True)
+    for name, subject in files:
+        with open(os.path.join(root, name), "wb") as f:
+            f.write(make_raw(subject))
+
+
+def test_parse_maildir_flags():
+    assert parse_flags("1700000000.M1P2.host:2,FS") == {"\\Flagged", "\\Seen"}
+    assert parse_flags("1700000000.M1P2.host") == frozenset()
+
+
+def test_import_maildir_folders_and_flags(tmp_path):
+    root = str(tmp_path / "Maildir")
+    make_maildir(root, [("cur/1.a.host:2,S", "a"), ("new/2.b.host", "b")])
+    make_maildir(
+        os.path.join(root, ".&XfJT0ZAB-"), [("cur/3.c.host:2,RS", "c")]
+    )  # 已发送
+
+    messages = list(iter_maildir(root))
+    assert [(m.folder, m.key) for m in messages] == [
+        ("INBOX", "INBOX/1.a.host"),
+        ("INBOX", "INBOX/2.b.host"),
+        ("已发送", "已发送/3.c.host"),
+    ]
+
+    Session = create_session_factory("sqlite://")
+    session = Session()
+    scan = lambda start, seen: iter_maildir(root, seen)
+    assert import_messages(session, root, scan, parse_workers=0) == 3
+    assert import_messages(session, root, scan, parse_workers=0) == 0
+
+    emails = {email.subject: email for email in session.query(Email)}
+    assert json.loads(emails["a"].flags) == ["\\Seen"]
+    assert json.loads(emails["b"].flags) == []
+    assert emails["c"].folder == "已发送"
+    assert json.loads(emails["c"].flags) == ["\\Answered", "\\Seen"]
+    session.close()
+
+
+def test_maildir_resume_survives_new_and_moved_files(tmp_path):
+    root = str(tmp_path / "Maildir")
+    make_maildir(root, [("new/2.b.host", "b")])
+    make_maildir(os.path.join(root, ".Bank"), [("cur/5.e.host:2,S", "e")])
+    Session = create_session_factory("sqlite://")
+    session = Session()
+    scan = lambda start, seen: iter_maildir(root, seen)
+    assert import_messages(session, root, scan, parse_workers=0) == 2
+
+    # 邮件从 new 移到 cur，同时较早的文件夹（INBOX）投递了排序更靠前的新邮件
+    os.rename(
+        os.path.join(root, "new", "2.b.host"),
+        os.path.join(root, "cur", "2.b.host:2,S"),
+    )
+    make_maildir(root, [("new/1.a.host", "a")])
+    assert import_messages(session, root, scan, parse_workers=0) == 1
+    assert sorted(email.subject for email in session.query(Email)) == ["a", "b", "e"]
+    session.close()
+
+
+def test_mbox_replaced_with_smaller_file_is_not_duplicated(tmp_path):
+    path = tmp_path / "archive.mbox"
+    write_mbox(path, ["a", "b", "c"])
+    Session = create_session_factory("sqlite://")
+    session = Session()
+    scan = lambda start, seen: iter_mbox(str(path), start)
+    assert import_messages(session, str(path), scan, parse_workers=0) == 3
+
+    # 文件被替换为更小的归档：从头扫描，已入库的邮件按 Message-ID 跳过
+    write_mbox(path, ["a", "d"])
+    assert import_messages(session, str(path), scan, parse_workers=0) == 1
+    assert import_messages(session, str(path), scan, restart=True) == 0
+    assert sorted(email.subject for email in session.query(Email)) == [
+        "a",
+        "b",
+        "c",
+        "d",
+    ]
+    session.close()
+
+
+def test_cli_import_reports_slow_messages(tmp_path, monkeypatch):
+    import main
+    from utils import diagnostics
+
+    path = tmp_path / "archive.mbox"
+    write_mbox(path, ["a", "b", "c"])
+    trackers = []
+    tracker_class = diagnostics.SlowMessageTracker
+
+    def make_tracker(limit):
+        trackers.append(tracker_class(limit))
+        return trackers[-1]
+
+    monkeypatch.setattr(diagnostics, "SlowMessageTracker", make_tracker)
+    monkeypatch.chdir(tmp_path)
+    db_url = f"sqlite:///{tmp_path / 'mail.db'}"
+    argv = ["--db-url", db_url, "--log-file", str(tmp_path / "app.log")]
+    assert main.main(argv + ["--slow", "2", "import", str(path)]) == 0
+
+    (tracker,) = trackers
+    slowest = tracker.slowest()
+    assert len(slowest) == 2
+    assert all(record["size"] and record["subject"] for record in slowest)
@@ -0,0 +1,68 @@
+# ./test_main.py
+import os
+import subprocess
+import sys
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# 快速状态检查时不应被加载的重量级依赖
+HEAVY_MODULES = ["sqlalchemy", "html2text", "chardet", "pyzmail", "dotenv"]
+
+
+def run_python(code, cwd):
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def test_import_has_no_heavy_deps_or_side_effects(tmp_path):
+    """
+    导入 main 及各基础模块时不加载重量级依赖，也不创建任何文件。
+    """
+    code = (
+        "import sys\n"
+        f"sys.path.insert(0, {PROJECT_ROOT!r})\n"
+        "import main, utils.config, utils.logger\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    result = run_python(code, cwd=tmp_path)
+    assert result.stdout.strip() == "", f"意外加载了: {result.stdout.strip()}"
+    assert list(tmp_path.iterdir()) == [], "导入模块时产生了文件"
+
+
+def test_status_does_not_load_heavy_modules(tmp_path):
+    """
+    导入 main 并执行 status 子命令后，sqlalchemy、pandas 和 database.* 都没有被加载。
+    """
+    db_url = f"sqlite:///{tmp_path / 'missing.db'}"
+    code = (
+        "import sys\n"
+        f"sys.path.insert(0, {PROJECT_ROOT!r})\n"
+        "import main\n"
+        f"main.main(['--db-url', {db_url!r}, 'status'])\n"
+        "heavy = [m for m in sys.modules\n"
+        "         if m in ('sqlalchemy', 'pandas') or m.split('.')[0] == 'database']\n"
+        "print(','.join(heavy), file=sys.stderr)\n"
+    )
+    result = run_python(code, cwd=tmp_path)
+    assert result.stderr.strip() == "", f"意外加载了: {result.stderr.strip()}"
+
+
+def test_sqlproc_import_is_lightweight(tmp_path):
+    """导入 MyTest/SQLProc.py 不加载 sqlalchemy 和 database 模块"""
+    code = (
+        "import sys\n"
+        f"sys.path.insert(0, {PROJECT_ROOT!r})\n"
+        "from MyTest import SQLProc\n"
+        "print(','.join(m for m in sys.modules\n"
+        "               if m == 'sqlalchemy' or m.split('.')[0] == 'database'))\n"
+    )
+    result = run_python(code, cwd=tmp_path)
+    assert result.stdout.strip() == "", f"意外加载了: {result.stdout.strip()}"
@@ -0,0 +1,216 @@
+# ./test_migrations.py
+import os
+import sqlite3
+import sys
+import uuid
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from sqlalchemy import inspect
+
+from database import migrations
+from database.db_init import create_session_factory, dispose_engines, get_engine
+from database.migrations import MIGRATIONS, current_version, migrate_legacy_emails
+from database.models import Email
+
+
+def _make_legacy_db(path, count):
+    """按 MyTest/PyEmailSQL.py 的表结构生成原型库"""
+    conn = sqlite3.connect(path)
+    conn.execute(
+        """
+        CREATE TABLE emails (
+            id TEXT PRIMARY KEY, uid TEXT UNIQUE NOT NULL, subject TEXT,
+            sender TEXT, body TEXT, format TEXT, sent_at TIMESTAMP, saved_at TIMESTAMP
+        )
+        """
+    )
+    conn.executemany(
+        "INSERT INTO emails VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                str(uuid.uuid4()),
+                str(i + 1),
+                f"邮件 {i}",
+                "bank@example.com",
+                f"<p>{i}</p>" if i % 2 else f"正文 {i}",
+                "html" if i % 2 else "text",
+                f"2025-01-01 08:00:{i % 60:02d}+08:00",
+                "2025-02-01 00:00:00",
+            )
+            for i in range(count)
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture(autouse=True)
+def _dispose():
+    yield
+    dispose_engines()
+
+
+def test_upgrade_converts_old_schema(tmp_path):
+    path = tmp_path / "old.db"
+    email_uuid = uuid.uuid4()
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE emails (id CHAR(32) PRIMARY KEY, sender VARCHAR NOT NULL,
+            recipients TEXT NOT NULL, cc TEXT, bcc TEXT, subject VARCHAR NOT NULL,
+            text_content TEXT, html_content TEXT, tags TEXT,
+            sent_at DATETIME NOT NULL, headers TEXT, created_at DATETIME NOT NULL,
+            updated_at DATETIME);
+        CREATE TABLE attachments (id INTEGER PRIMARY KEY, email_id CHAR(32) NOT NULL
+            REFERENCES emails(id), filename VARCHAR NOT NULL, filepath VARCHAR NOT NULL,
+            created_at DATETIME NOT NULL);
+        """
+    )
+    conn.execute(
+        "INSERT INTO emails (id, sender, recipients, subject, sent_at, created_at) "
+        "VALUES (?, 'a@example.com', '[]', '旧邮件', '2025-01-01 00:00:00', "
+        "'2025-01-01 00:00:00')",
+        (email_uuid.hex,),
+    )
+    conn.execute(
+        "INSERT INTO attachments VALUES (7, ?, 'a.pdf', './a.pdf', "
+        "'2025-01-01 00:00:00')",
+        (email_uuid.hex,),
+    )
+    conn.commit()
+    conn.close()
+
+    db_url = f"sqlite:///{path}"
+    engine = get_engine(db_url)
+    inspector = inspect(engine)
+    columns = {column["name"] for column in inspector.get_columns("emails")}
+    assert {"uuid", "account", "uid", "message_id", "extracted_at"} <= columns
+    assert "ix_emails_sent_at_id" in {
+        index["name"] for index in inspector.get_indexes("emails")
+    }
+    assert not [name for name in inspector.get_table_names() if name.startswith("_old")]
+    assert current_version(engine) == MIGRATIONS[-1][0]
+
+    session = create_session_factory(db_url)()
+    email = session.query(Email).one()
+    assert email.uuid == email_uuid and isinstance(email.id, int)
+    assert [attachment.id for attachment in email.attachments] == [7]
+    session.close()
+
+    # UUID 以 16 字节存储
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT length(uuid) FROM emails").fetchone() == (16,)
+    conn.close()
+
+
+def test_integer_key_conversion_resumes_after_interrupt(tmp_path, monkeypatch):
+    path = tmp_path / "old.db"
+    uuids = sorted(uuid.uuid4() for _ in range(5))
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE emails (id CHAR(32) PRIMARY KEY, sender VARCHAR NOT NULL,
+            recipients TEXT NOT NULL, subject VARCHAR NOT NULL,
+            sent_at DATETIME NOT NULL, created_at DATETIME NOT NULL);
+        CREATE TABLE attachments (id INTEGER PRIMARY KEY, email_id CHAR(32) NOT NULL
+            REFERENCES emails(id), filename VARCHAR NOT NULL, filepath VARCHAR NOT NULL,
+            created_at DATETIME NOT NULL);
+        """
+    )
+    for i, email_uuid in enumerate(uuids):
+        conn.execute(
+            "INSERT INTO emails VALUES (?, 'a@example.com', '[]', ?, "
+            "'2025-01-01 00:00:00', '2025-01-01 00:00:00')",
+            (email_uuid.hex, f"旧邮件 {i}"),
+        )
+        conn.execute(
+            "INSERT INTO attachments VALUES (?, ?, 'a.pdf', './a.pdf', "
+            "'2025-01-01 00:00:00')",
+            (i + 1, email_uuid.hex),
+        )
+    conn.commit()
+    conn.close()
+
+    class Interrupt(Exception):
+        pass
+
+    save_position = migrations._save_position
+    calls = []
+
+    def fail_on_second_batch(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 2:
+            raise Interrupt
+        return save_position(*args, **kwargs)
+
+    monkeypatch.setattr(migrations, "_CONVERT_BATCH_SIZE", 2)
+    monkeypatch.setattr(migrations, "_save_position", fail_on_second_batch)
+    db_url = f"sqlite:///{path}"
+    with pytest.raises(Interrupt):
+        get_engine(db_url)
+    # 第一批已经提交
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM emails").fetchone() == (2,)
+    conn.close()
+
+    monkeypatch.setattr(migrations, "_save_position", save_position)
+    engine = get_engine(db_url)
+    assert current_version(engine) == MIGRATIONS[-1][0]
+    session = create_session_factory(db_url)()
+    emails = session.query(Email).order_by(Email.id).all()
+    assert [email.uuid for email in emails] == uuids
+    assert [email.subject for email in emails] == [f"旧邮件 {i}" for i in range(5)]
+    assert [[a.id for a in email.attachments] for email in emails] == [
+        [i + 1] for i in range(5)
+    ]
+    session.close()
+
+
+def test_resumable_legacy_migration(tmp_path):
+    legacy = tmp_path / "raw_email.db"
+    _make_legacy_db(legacy, 25)
+    db_url = f"sqlite:///{tmp_path / 'database.db'}"
+
+    class Interrupt(Exception):
+        pass
+
+    def stop_after_two_batches(copied, total):
+        assert total == 25
+        if copied >= 20:
+            raise Interrupt
+
+    with pytest.raises(Interrupt):
+        migrate_legacy_emails(
+            str(legacy), db_url, batch_size=10, progress=stop_after_two_batches
+        )
+    # 中断后二级索引已经重建
+    inspector = inspect(get_engine(db_url))
+    assert "ix_emails_sent_at_id" in {
+        index["name"] for index in inspector.get_indexes("emails")
+    }
+    # 断点续传：只复制剩余的 5 封，不重复
+    assert migrate_legacy_emails(str(legacy), db_url, batch_size=10) == 25
+
+    session = create_session_factory(db_url)()
+    assert session.query(Email).count() == 25
+    email = session.query(Email).filter_by(uid=2).one()
+    assert email.html_content == "<p>1</p>" and email.text_content is None
+    assert email.sent_at.hour == 0  # +08:00 转换为 UTC
+    session.close()
+
+
+def test_in_place_migration_consumes_source(tmp_path):
+    legacy = tmp_path / "raw_email.db"
+    _make_legacy_db(legacy, 12)
+
+    assert migrate_legacy_emails(str(legacy), batch_size=5, account="qq") == 12
+
+    conn = sqlite3.connect(legacy)
+    assert conn.execute("SELECT COUNT(*) FROM legacy_emails").fetchone() == (0,)
+    assert conn.execute(
+        "SELECT COUNT(*) FROM emails WHERE account = 'qq'"
+    ).fetchone() == (12,)
+    conn.close()
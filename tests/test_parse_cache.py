@@ -0,0 +1,80 @@
+# ./test_parse_cache.py
+import os
+import sys
+from email.message import EmailMessage
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from parsers.parse_cache import ParseCache
+
+
+def make_email(subject, body="账单正文", attachment=None):
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = "bank@example.com"
+    msg["To"] = "me@example.com"
+    msg["Date"] = "Mon, 02 Jan 2023 10:00:00 +0800"
+    msg.set_content(body)
+    if attachment:
+        msg.add_attachment(
+            attachment, maintype="application", subtype="pdf", filename="对账单.pdf"
+        )
+    return msg.as_bytes()
+
+
+def test_second_parse_hits_cache(tmp_path):
+    path = str(tmp_path / "cache.db")
+    raw = make_email("信用卡账单", attachment=b"%PDF" * 100)
+    cache = ParseCache(path)
+    first = cache.parse(raw)
+    second = cache.parse(raw)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert second == first
+    assert first["subject"] == "信用卡账单"
+    assert first["sent_at"].year == 2023
+    # 缓存只保存附件元信息
+    assert first["attachments"][0]["filename"] == "对账单.pdf"
+    assert "payload" not in first["attachments"][0]
+    cache.close()
+
+    # 其他进程（新实例）按内容哈希直接命中
+    other = ParseCache(path)
+    assert other.parse(bytearray(raw)) == first
+    assert (other.hits, other.misses) == (1, 0)
+    other.close()
+
+
+def test_lru_eviction_keeps_recent_entries(tmp_path):
+    cache = ParseCache(str(tmp_path / "cache.db"), max_bytes=2000)
+    raws = [make_email(f"邮件 {i}", body=os.urandom(200).hex()) for i in range(10)]
+    for raw in raws:
+        cache.parse(raw)
+        cache.parse(raws[0])  # 第一封一直在使用
+    assert cache._stored_bytes() <= 2000
+    cache.hits = cache.misses = 0
+    cache.parse(raws[0])
+    cache.parse(raws[-1])
+    cache.parse(raws[1])
+    assert (cache.hits, cache.misses) == (2, 1)
+    cache.close()
+
+
+def test_hits_batch_last_used_updates(tmp_path):
+    path = str(tmp_path / "cache.db")
+    raw = make_email("信用卡账单")
+    cache = ParseCache(path)
+    cache.parse(raw)
+    changes = cache._conn.total_changes
+    for _ in range(5):
+        cache.parse(raw)
+    # 命中只记录在内存中，不执行 UPDATE
+    assert cache._conn.total_changes == changes
+    assert len(cache._touched) == 1
+    used = next(iter(cache._touched.values()))
+    cache.close()
+
+    other = ParseCache(path)
+    stored = other._conn.execute("SELECT last_used FROM parsed_messages").fetchone()
+    assert stored[0] == used
+    other.close()
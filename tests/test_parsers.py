@@ -0,0 +1,49 @@
+# ./test_parsers.py
+import os
+import sys
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from parsers.eml_parser import parse_email_bytes
+
+
+def build_statement_email():
+    """构造一封带 PDF 附件的中文账单邮件"""
+    msg = MIMEMultipart("mixed")
+    msg["Subject"] = "=?utf-8?b?5bel5ZWG6ZO26KGM5L+h55So5Y2h55S15a2Q6LSm5Y2V?="
+    msg["From"] = "工商银行 <bank@icbc.com.cn>"
+    msg["To"] = "me@qq.com, other@qq.com"
+    msg["Date"] = "Mon, 06 Jan 2025 10:00:00 +0800"
+    msg["Message-ID"] = "<statement-1@icbc.com.cn>"
+
+    alternative = MIMEMultipart("alternative")
+    alternative.attach(MIMEText("账单正文", "plain", "gb2312"))
+    alternative.attach(MIMEText("<p>账单正文</p>", "html", "utf-8"))
+    msg.attach(alternative)
+
+    pdf = MIMEApplication(b"%PDF-1.4" + b"0" * 1000, "pdf")
+    pdf.add_header("Content-Disposition", "attachment", filename="statement.pdf")
+    msg.attach(pdf)
+    return msg.as_bytes()
+
+
+def test_parse_email_bytes():
+    parsed = parse_email_bytes(build_statement_email())
+
+    assert parsed["subject"] == "工商银行信用卡电子账单"
+    assert parsed["sender"] == "bank@icbc.com.cn"
+    assert parsed["recipients"] == ["me@qq.com", "other@qq.com"]
+    assert parsed["message_id"] == "<statement-1@icbc.com.cn>"
+    assert parsed["sent_at"].isoformat() == "2025-01-06T02:00:00"
+    assert parsed["text_content"] == "账单正文"
+    assert parsed["html_content"] == "<p>账单正文</p>"
+    (attachment,) = parsed["attachments"]
+    assert attachment["filename"] == "statement.pdf"
+    assert attachment["content_type"] == "application/pdf"
+    assert attachment["size"] == 1008
+    assert attachment["section"] == "2"
+    assert attachment["encoding"] == "base64"
@@ -0,0 +1,143 @@
+# ./test_read_eml.py
+import os
+import sys
+import zipfile
+from email.message import EmailMessage
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+from database.db_init import create_session_factory
+from database.models import EmlManifest
+from MyTest import ReadEml
+
+
+def make_eml(subject):
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = "bank@example.com"
+    msg["Date"] = "Mon, 02 Jan 2023 10:00:00 +0800"
+    msg.set_content(f"{subject} 正文")
+    return msg.as_bytes()
+
+
+def write_zip(path, members):
+    with zipfile.ZipFile(path, "w") as zip_file:
+        for name, data in members.items():
+            zip_file.writestr(name, data)
+    return str(path)
+
+
+@pytest.fixture
+def manifest(tmp_path, monkeypatch):
+    # 解析缓存写在当前目录下
+    monkeypatch.chdir(tmp_path)
+    session = create_session_factory("sqlite://")()
+    yield session
+    session.close()
+
+
+def test_unchanged_zip_is_skipped(tmp_path, manifest):
+    zip_path = write_zip(
+        tmp_path / "a.zip", {"1.eml": make_eml("一月"), "2.eml": make_eml("二月")}
+    )
+    assert ReadEml.process_zip(manifest, zip_path) == 2
+    assert ReadEml.process_zip(manifest, zip_path) == 0
+
+    # 只修改了时间：按 SHA-256 判断内容未变化
+    os.utime(zip_path, (1, 1))
+    assert ReadEml.archive_unchanged(manifest, zip_path, os.path.getsize(zip_path), 1)[
+        0
+    ]
+    assert ReadEml.process_zip(manifest, zip_path) == 0
+
+
+def test_interrupted_zip_resumes(tmp_path, manifest):
+    zip_path = write_zip(
+        tmp_path / "a.zip", {"1.eml": make_eml("一月"), "2.eml": make_eml("二月")}
+    )
+    assert ReadEml.process_zip(manifest, zip_path) == 2
+    # 模拟处理第二个文件时中断
+    row = ReadEml.get_manifest(manifest, zip_path)
+    ReadEml.set_manifest(
+        manifest,
+        zip_path,
+        "",
+        row.size,
+        row.mtime,
+        row.digest,
+        ReadEml.STATUS_PROCESSING,
+    )
+    manifest.query(EmlManifest).filter_by(member="2.eml").delete()
+    manifest.commit()
+    assert ReadEml.process_zip(manifest, zip_path) == 1
+    assert ReadEml.get_manifest(manifest, zip_path).status == ReadEml.STATUS_DONE
+
+
+def test_only_changed_members_are_reprocessed(tmp_path, manifest):
+    zip_path = tmp_path / "a.zip"
+    write_zip(zip_path, {"1.eml": make_eml("一月"), "2.eml": make_eml("二月")})
+    assert ReadEml.process_zip(manifest, str(zip_path)) == 2
+
+    write_zip(
+        zip_path,
+        {
+            "1.eml": make_eml("一月"),
+            "2.eml": make_eml("二月（更正）"),
+            "3.eml": make_eml("三月"),
+        },
+    )
+    assert ReadEml.process_zip(manifest, str(zip_path)) == 2
+
+
+def test_failed_member_is_retried(tmp_path, manifest, monkeypatch):
+    zip_path = write_zip(
+        tmp_path / "a.zip", {"1.eml": make_eml("一月"), "2.eml": make_eml("二月")}
+    )
+    parse_eml_file = ReadEml.parse_eml_file
+    monkeypatch.setattr(
+        ReadEml,
+        "parse_eml_file",
+        lambda path, max_lines: (
+            (None, None, None)
+            if path.endswith("2.eml")
+            else parse_eml_file(path, max_lines)
+        ),
+    )
+    assert ReadEml.process_zip(manifest, zip_path) == 2
+    assert ReadEml.get_manifest(manifest, zip_path).status == ReadEml.STATUS_DONE
+    assert ReadEml.failed_members(manifest, zip_path) == {"2.eml"}
+
+    # ZIP 未变化：不重新计算 SHA-256，只重试上次失败的文件
+    def no_hash(path):
+        raise AssertionError("未变化的 ZIP 不应重新计算哈希")
+
+    monkeypatch.setattr(ReadEml, "file_sha256", no_hash)
+    assert ReadEml.process_zip(manifest, zip_path) == 1  # 仍然失败
+    monkeypatch.setattr(ReadEml, "parse_eml_file", parse_eml_file)
+    assert ReadEml.process_zip(manifest, zip_path) == 1
+    assert ReadEml.failed_members(manifest, zip_path) == set()
+    assert ReadEml.process_zip(manifest, zip_path) == 0
+
+
+def test_legacy_manifest_is_imported(tmp_path, manifest):
+    import sqlite3
+
+    legacy = str(tmp_path / "eml_manifest.db")
+    conn = sqlite3.connect(legacy)
+    conn.execute(
+        "CREATE TABLE manifest (path TEXT, member TEXT, size INTEGER, mtime REAL, "
+        "sha256 TEXT, status TEXT, processed_at TEXT)"
+    )
+    conn.execute(
+        "INSERT INTO manifest VALUES ('/a.zip', '', 10, 1.0, 'abc', 'done', NULL)"
+    )
+    conn.commit()
+    conn.close()
+
+    assert ReadEml.import_legacy_manifest(manifest, legacy) == 1
+    assert ReadEml.get_manifest(manifest, "/a.zip").digest == "abc"
+    assert not os.path.exists(legacy)
+    assert ReadEml.import_legacy_manifest(manifest, legacy) == 0
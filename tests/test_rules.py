@@ -0,0 +1,40 @@
+# ./test_rules.py
+import os
+import sys
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from parsers.rules import AhoCorasick, Rule, RuleEngine
+
+
+def test_automaton_finds_overlapping_keywords():
+    automaton = AhoCorasick(["工商", "工商银行", "银行", "he", "she", "hers"])
+    assert automaton.find("中国工商银行信用卡") == {0, 1, 2}
+    assert automaton.find("USHERS") == {3, 4, 5}
+    assert automaton.find("招商") == set()
+
+
+def test_rules_respect_fields():
+    engine = RuleEngine(
+        [
+            Rule("icbc", ("工商", "@icbc.com.cn"), target="a@example.com"),
+            Rule("card", ("尾号1234",), fields=("body",), tags=("信用卡",)),
+            Rule("cmb", ("招商",), fields=("subject",), tags=("招商银行",)),
+        ]
+    )
+    fields = {
+        "subject": "您的信用卡账单",
+        "sender": "Service@ICBC.com.cn",
+        "body": "招商 尾号1234 本期应还",
+    }
+    assert [rule.name for rule in engine.match(fields)] == ["icbc", "card"]
+    assert engine.tags(fields) == ["信用卡"]
+    assert engine.match({"subject": "其他"}) == []
+
+
+def test_many_rules_share_one_automaton():
+    rules = [Rule(f"r{i}", (f"卡号{i:04d}",), tags=(f"t{i}",)) for i in range(500)]
+    engine = RuleEngine(rules)
+    matched = engine.match({"body": "交易卡号0042和卡号0499"})
+    assert [rule.name for rule in matched] == ["r42", "r499"]
@@ -0,0 +1,180 @@
+# ./test_statement_export.py
+import os
+import sqlite3
+import sys
+from datetime import datetime
+from decimal import Decimal
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+from database.archive import BodyArchive
+from database.db_init import create_session_factory, dispose_engines
+from database.db_operations import archive_old_bodies, extract_transactions
+from database.models import Email, Transaction
+from MyTest import SQLProc
+from parsers.statement_parser import parse_amount, parse_statement
+from tests.test_migrations import _make_legacy_db
+
+BODY = """
+| 1234 | 2025-01-03 | 2025-01-04 | 消费 | 星巴克/北京 | 38.00/RMB | 38.00/RMB |
+| 1234 | 2025-02-10 | 2025-02-11 | 消费 | AMAZON/SEATTLE | 1,020.50/USD | 7,400.12/RMB |
+| 5678 | 2025-01-15 | 2025-01-15 | 还款 | 还款 | -500.00/RMB | -500.00/RMB |
+无关的一行
+"""
+
+
+def test_parse_amount():
+    assert parse_amount("1,020.50/USD") == (Decimal("1020.50"), "USD")
+    assert parse_amount("-500.00/rmb") == (Decimal("-500.00"), "RMB")
+    assert parse_amount("abc") == (None, None)
+
+
+def test_parse_statement_types():
+    records = parse_statement(BODY, source_email_id="e1")
+    assert len(records) == 3
+    assert records[1]["trade_date"].isoformat() == "2025-02-10"
+    assert records[1]["amount"] == Decimal("1020.50")
+    assert records[1]["posted_currency"] == "RMB"
+    assert records[2]["source_email_id"] == "e1"
+
+
+def test_invalid_date_row_is_skipped(caplog):
+    body = (
+        BODY
+        + "| 1234 | 2025-02-30 | 2025-03-01 | 消费 | 无效日期 | 1.00/RMB | 1.00/RMB |"
+    )
+    Session = create_session_factory("sqlite://")
+    session = Session()
+    email = Email(sender="bank", recipients="[]", subject="账单", text_content=body)
+    session.add(email)
+    session.commit()
+
+    with caplog.at_level("WARNING"):
+        assert extract_transactions(session) == (1, 3)
+    assert f"邮件 {email.id} " in caplog.text
+    assert session.query(Transaction).filter_by(merchant="无效日期").count() == 0
+    session.close()
+
+
+def test_extract_transactions_is_idempotent():
+    Session = create_session_factory("sqlite://")
+    session = Session()
+    # 同一账单发送了两次，且第一笔交易在账单中出现两次
+    body = BODY + BODY.splitlines()[1]
+    for _ in range(2):
+        session.add(
+            Email(sender="bank", recipients="[]", subject="账单", text_content=body)
+        )
+    session.commit()
+
+    assert extract_transactions(session) == (2, 8)
+    assert session.query(Transaction).count() == 4
+    # 已提取过的邮件不再扫描；强制重扫也不会产生重复记录
+    assert extract_transactions(session) == (0, 0)
+    assert extract_transactions(session, force=True) == (2, 8)
+    assert session.query(Transaction).count() == 4
+
+    usd = session.query(Transaction).filter_by(currency="USD").one()
+    assert usd.amount == Decimal("1020.50")
+    assert usd.email is not None
+    session.close()
+
+
+def test_export_appends_partitions(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.dataset as ds
+
+    from analytics.parquet_export import export_transactions, load_transactions
+
+    session = create_session_factory("sqlite://")()
+    first = Email(sender="bank", recipients="[]", subject="账单", text_content=BODY)
+    session.add(first)
+    session.commit()
+    extract_transactions(session)
+
+    root = str(tmp_path / "transactions")
+    assert export_transactions(session, root) == 3
+    # 没有新交易时不导出
+    assert export_transactions(session, root) == 0
+
+    # 新账单的交易追加为新文件
+    session.add(
+        Email(
+            sender="bank",
+            recipients="[]",
+            subject="账单",
+            text_content="| 1234 | 2025-01-20 | 2025-01-21 | 消费 | 全家/上海 "
+            "| 12.00/RMB | 12.00/RMB |",
+        )
+    )
+    session.commit()
+    extract_transactions(session)
+    assert export_transactions(session, root) == 1
+
+    assert sorted(os.listdir(root)) == ["month=2025-01", "month=2025-02"]
+    january = os.path.join(root, "month=2025-01", "card_last4=1234")
+    assert len(os.listdir(january)) == 2
+
+    table = load_transactions(
+        root,
+        columns=["card_last4", "amount", "source_email_id"],
+        filter=ds.field("month") == "2025-01",
+    )
+    assert table.num_rows == 3
+    assert str(table.schema.field("amount").type) == "decimal128(18, 2)"
+    assert str(first.uuid) in table.column("source_email_id").to_pylist()
+    assert (
+        load_transactions(root, columns=["occurrence"]).column("occurrence").to_pylist()
+        == [0] * 4
+    )
+    session.close()
+
+
+def test_extract_reads_archived_bodies(tmp_path):
+    archive = BodyArchive(str(tmp_path / "archive.db"))
+    session = create_session_factory("sqlite://")()
+    session.add(
+        Email(
+            sender="bank",
+            recipients="[]",
+            subject="账单",
+            text_content=BODY,
+            sent_at=datetime(2020, 1, 1),
+        )
+    )
+    session.commit()
+    assert archive_old_bodies(session, archive, datetime(2025, 1, 1))[0] == 1
+
+    # 没有存档库时不提取，也不记录 extracted_at
+    assert extract_transactions(session) == (0, 0)
+    assert session.query(Email).one().extracted_at is None
+    assert extract_transactions(session, archive=archive) == (1, 3)
+    assert session.query(Transaction).count() == 3
+    session.close()
+    archive.close()
+
+
+def test_sqlproc_writes_model_transactions(tmp_path):
+    legacy = str(tmp_path / "raw_email.db")
+    _make_legacy_db(legacy, 2)
+    conn = sqlite3.connect(legacy)
+    conn.execute("UPDATE emails SET body = ?, format = 'text' WHERE rowid = 1", (BODY,))
+    conn.commit()
+    conn.close()
+    db_url = f"sqlite:///{tmp_path / 'database.db'}"
+    output = tmp_path / "temp.csv"
+
+    SQLProc.main(legacy, str(output), db_url)
+    SQLProc.main(legacy, str(output), db_url)  # 再次运行不重复写入
+    lines = output.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 4
+    assert lines[2].endswith('"1,020.50/USD","7,400.12/RMB"')
+
+    session = create_session_factory(db_url)()
+    assert session.query(Transaction).count() == 3
+    assert session.query(Transaction).filter_by(currency="USD").one().email_id
+    session.close()
+    dispose_engines()
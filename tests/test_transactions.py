@@ -0,0 +1,95 @@
+# ./test_transactions.py
+import os
+import sys
+
+# 动态添加项目根目录到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+pytest.importorskip("pandas")
+
+from analytics.transactions import (
+    add_running_balance,
+    frame_from_records,
+    frame_from_rows,
+    mark_duplicates,
+    monthly_report,
+    split_amount,
+)
+from parsers.statement_parser import parse_statement
+
+ROWS = [
+    (
+        "1234",
+        "2025-01-03",
+        "2025-01-04",
+        "消费",
+        "星巴克/北京",
+        "38.00/RMB",
+        "38.00/RMB",
+    ),
+    ("1234", "2025-01-20", "2025-01-21", "消费", "AMAZON", "10.50/USD", "1,020.12/RMB"),
+    (
+        "1234",
+        "2025-01-03",
+        "2025-01-04",
+        "消费",
+        "星巴克/北京",
+        "38.00/RMB",
+        "38.00/RMB",
+    ),
+    ("5678", "2025-02-15", "2025-02-15", "还款", "还款", "-500.00/rmb", "-500.00/RMB"),
+]
+
+
+def test_split_amount_vectorized():
+    import pandas as pd
+
+    amount, currency = split_amount(pd.Series(["1,234.56/RMB", "-2/usd", "坏数据"]))
+    assert amount.tolist()[:2] == [1234.56, -2.0]
+    assert pd.isna(amount.iloc[2])
+    assert currency.tolist()[:2] == ["RMB", "USD"]
+
+
+def test_summaries_and_duplicates():
+    df = frame_from_rows(ROWS)
+    assert mark_duplicates(df).tolist() == [True, False, True, False]
+
+    report = monthly_report(df)
+    by_month = report["by_month"]
+    assert by_month.loc[("2025-01", "RMB"), "total"] == 1058.12
+    assert by_month.loc[("2025-01", "RMB"), "count"] == 2
+    assert len(report["duplicates"]) == 2
+
+
+def test_running_balance_per_card():
+    df = add_running_balance(frame_from_rows(ROWS))
+    balances = df[df["card_last4"] == "1234"]["running_balance"].tolist()
+    assert balances == [38.0, 76.0, 1096.12]
+
+
+def test_frame_from_parsed_records():
+    body = "| 1234 | 2025-01-03 | 2025-01-04 | 消费 | 星巴克 | 38.00/RMB | 38.00/RMB |"
+    df = frame_from_records(parse_statement(body, source_email_id="e1"))
+    assert df["posted_amount"].tolist() == [38.0]
+    assert str(df["month"].iloc[0]) == "2025-01"
+
+
+def test_identical_charges_in_one_statement_are_kept():
+    line = "| 1234 | 2025-01-03 | 2025-01-04 | 消费 | 星巴克 | 38.00/RMB | 38.00/RMB |"
+    body = f"{line}\n{line}"
+    # 同一账单中的两笔相同消费都计入；同一账单被另一封邮件重复发送时才去重
+    records = parse_statement(body, source_email_id="e1")
+    records += parse_statement(body, source_email_id="e2")
+    assert [record["occurrence"] for record in records] == [0, 1, 0, 1]
+
+    df = frame_from_records(records)
+    report = monthly_report(df)
+    assert report["by_month"].loc[("2025-01", "RMB"), "total"] == 76.0
+    assert report["by_card_month"].loc[("1234", "2025-01", "RMB"), "count"] == 2
+    assert len(report["duplicates"]) == 4
+
+    single = monthly_report(frame_from_records(records[:2]))
+    assert single["by_month"].loc[("2025-01", "RMB"), "total"] == 76.0
+    assert len(single["duplicates"]) == 0
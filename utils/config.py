@@ -1,43 +1,300 @@
+import copy
 import json
 import os
 import sys
+from dataclasses import asdict, dataclass, field, fields
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
 
 # 动态添加项目根目录到 sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from dotenv import load_dotenv
 
-# 加载 .env 文件
-load_dotenv()
+DEFAULT_CONFIG_FILE = "config.json"
 
+_dotenv_loaded = False
 
-def load_config(config_file="config.json"):
-    """加载公共配置"""
+
+def load_env():
+    """按需加载 .env 文件（只加载一次），避免导入本模块时产生文件 I/O"""
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        _dotenv_loaded = True
+
+
+class ConfigError(ValueError):
+    """配置缺失或取值非法"""
+
+
+# 常见邮箱服务商的默认参数，账户配置中的同名字段会覆盖这里的值
+PROVIDER_PRESETS = {
+    "126": {
+        "imap_server": "imap.126.com",
+        "smtp_server": "smtp.126.com",
+        "idle": False,  # 126/163 不支持 IDLE
+        "max_connections": 2,
+    },
+    "163": {
+        "imap_server": "imap.163.com",
+        "smtp_server": "smtp.163.com",
+        "idle": False,
+        "max_connections": 2,
+    },
+    "qq": {
+        "imap_server": "imap.qq.com",
+        "smtp_server": "smtp.qq.com",
+        "max_connections": 4,
+    },
+}
+
+
+@dataclass(frozen=True)
+class AccountConfig:
+    """
+    单个邮箱账户的配置，包括连接信息和性能调优参数。
+    """
+
+    name: str
+    username: str
+    password: str = field(repr=False)
+    imap_server: str
+    imap_port: int = 993
+    smtp_server: Optional[str] = None
+    smtp_port: int = 465
+    provider: Optional[str] = None
+    # 性能调优参数
+    fetch_batch_size: int = 50  # 每次 FETCH 的邮件数
+    max_connections: int = 2  # 同一账户允许的最大并发 IMAP 连接数
+    smtp_rate_limit: float = 1.0  # SMTP 每秒最多发送的邮件数
+    idle: bool = True  # 是否使用 IMAP IDLE 推送
+    commit_interval: int = 100  # 每写入多少封邮件提交一次数据库事务
+    # 是否按 BODYSTRUCTURE 只下载正文部分；配置了附件保存目录时同步总是部分下载
+    partial_fetch: bool = False
+    compress: bool = True  # 服务器支持时启用 COMPRESS=DEFLATE
+    parse_workers: int = 2  # 同步时的解析线程数，下载、解析、写库流水线并行
+    fetch_timeout: int = 120  # IMAP 连接读写超时（秒）
+    adaptive_fetch: bool = True  # 按邮件大小和实测吞吐量自适应调整每批下载量
+    # 服务器不支持 CONDSTORE 时，分块比对全部标记的最小间隔（秒）
+    flag_full_sync_interval: int = 3600
+
+    def credentials(self):
+        """返回与旧版 get_email_credentials 兼容的字典"""
+        return {
+            "username": self.username,
+            "password": self.password,
+            "smtp_server": self.smtp_server,
+            "smtp_port": self.smtp_port,
+            "imap_server": self.imap_server,
+            "imap_port": self.imap_port,
+        }
+
+
+@dataclass(frozen=True)
+class AppConfig:
+    """
+    应用全局配置。
+    """
+
+    database_url: str = "sqlite:///./database.db"
+    attachments_dir: str = "./attachments"
+    log_file: str = "./logs/app.log"
+    accounts: Dict[str, AccountConfig] = field(default_factory=dict)
+    # 附件策略：同步时只下载这些类型且不超过大小上限的附件，其余进入后台队列
+    attachment_types: Tuple[str, ...] = ("application/pdf",)
+    attachment_max_size: int = 20 * 1024 * 1024
+    attachment_workers: int = 1  # 后台附件下载的并发连接数
+    # 分层存储：超过保留天数的邮件正文压缩后移入冷存档库
+    archive_path: str = "./archive.db"
+    retention_days: int = 365
+
+    def attachment_policy(self):
+        from parsers.attachment import AttachmentPolicy
+
+        return AttachmentPolicy(
+            allowed_types=self.attachment_types, max_size=self.attachment_max_size
+        )
+
+    def get_account(self, name):
+        try:
+            return self.accounts[name]
+        except KeyError:
+            raise ConfigError(f"未配置邮箱账户: {name}") from None
+
+
+_ACCOUNT_FIELDS = {f.name: f for f in fields(AccountConfig)}
+_INT_FIELDS = {
+    "imap_port",
+    "smtp_port",
+    "fetch_batch_size",
+    "max_connections",
+    "commit_interval",
+    "parse_workers",
+    "fetch_timeout",
+    "flag_full_sync_interval",
+}
+_BOOL_FIELDS = {"idle", "partial_fetch", "compress", "adaptive_fetch"}
+_TRUE_VALUES = {"1", "true", "yes", "on"}
+_FALSE_VALUES = {"0", "false", "no", "off"}
+
+
+@lru_cache(maxsize=None)
+def _read_json(config_file):
+    with open(config_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_config(config_file=DEFAULT_CONFIG_FILE):
+    """加载公共配置（文件只读取一次，返回副本以免调用方修改缓存）"""
     try:
-        with open(config_file, "r") as f:
-            config = json.load(f)
-        return config
+        return copy.deepcopy(_read_json(config_file))
     except Exception as e:
         print(f"Error loading config file: {e}")
         return {}
 
 
+def _coerce(account_name, key, value):
+    """把配置值转换为字段要求的类型并校验"""
+    if key in _INT_FIELDS:
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise ConfigError(f"账户 {account_name} 的 {key} 必须是整数: {value!r}")
+        if value <= 0 or (key.endswith("_port") and value > 65535):
+            raise ConfigError(f"账户 {account_name} 的 {key} 超出范围: {value}")
+    elif key == "smtp_rate_limit":
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ConfigError(f"账户 {account_name} 的 {key} 必须是数字: {value!r}")
+        if value <= 0:
+            raise ConfigError(f"账户 {account_name} 的 {key} 必须大于 0: {value}")
+    elif key in _BOOL_FIELDS and not isinstance(value, bool):
+        text = str(value).strip().lower()
+        if text in _TRUE_VALUES:
+            value = True
+        elif text in _FALSE_VALUES:
+            value = False
+        else:
+            raise ConfigError(f"账户 {account_name} 的 {key} 取值非法: {value!r}")
+    return value
+
+
+def _env_account_names():
+    """
+    从环境变量中找出账户名：优先使用 EMAIL_ACCOUNTS（逗号分隔），
+    否则根据 EMAIL_<NAME>_USERNAME 自动发现。
+    """
+    names = os.getenv("EMAIL_ACCOUNTS")
+    if names:
+        return [name.strip() for name in names.split(",") if name.strip()]
+    found = []
+    for key in os.environ:
+        if key.startswith("EMAIL_") and key.endswith("_USERNAME"):
+            found.append(key[len("EMAIL_") : -len("_USERNAME")].lower())
+    return sorted(found)
+
+
+def _env_account(name):
+    """读取 EMAIL_<NAME>_<FIELD> 形式的环境变量"""
+    prefix = f"EMAIL_{name.upper()}_"
+    values = {}
+    for key in _ACCOUNT_FIELDS:
+        if key == "name":
+            continue
+        value = os.getenv(prefix + key.upper())
+        if value not in (None, ""):
+            values[key] = value
+    return values
+
+
+def build_account(name, values, defaults=None):
+    """
+    合并服务商预设、全局默认值和账户自身配置，生成校验过的 AccountConfig。
+    """
+    merged = {}
+    provider = values.get("provider") or (name if name in PROVIDER_PRESETS else None)
+    merged.update(PROVIDER_PRESETS.get(provider, {}))
+    merged.update(defaults or {})
+    merged.update(values)
+    merged["name"] = name
+    merged["provider"] = provider
+
+    unknown = set(merged) - set(_ACCOUNT_FIELDS)
+    if unknown:
+        raise ConfigError(f"账户 {name} 含有未知配置项: {', '.join(sorted(unknown))}")
+    for key in ("username", "password", "imap_server"):
+        if not merged.get(key):
+            raise ConfigError(f"账户 {name} 缺少必填项: {key}")
+
+    coerced = {key: _coerce(name, key, value) for key, value in merged.items()}
+    return AccountConfig(**coerced)
+
+
+@lru_cache(maxsize=None)
+def get_config(config_file=DEFAULT_CONFIG_FILE):
+    """
+    加载并校验全部配置，结果按配置文件缓存，整个进程只解析一次。
+
+    配置来源（后者覆盖前者）：
+    1. config.json 中的全局项、"defaults" 和 "accounts"；
+    2. 环境变量（含 .env）：DATABASE_URL 以及 EMAIL_<NAME>_<FIELD>。
+
+    :param config_file: JSON 配置文件路径，文件不存在时只使用环境变量。
+    :return: AppConfig
+    """
+    load_env()
+    raw = _read_json(config_file) if os.path.exists(config_file) else {}
+
+    account_values = {
+        name: dict(values) for name, values in raw.get("accounts", {}).items()
+    }
+    for name in _env_account_names():
+        account_values.setdefault(name, {}).update(_env_account(name))
+
+    defaults = raw.get("defaults", {})
+    accounts = {
+        name: build_account(name, values, defaults)
+        for name, values in account_values.items()
+    }
+
+    app_defaults = AppConfig()
+    return AppConfig(
+        database_url=os.getenv("DATABASE_URL")
+        or raw.get("database_url", app_defaults.database_url),
+        attachments_dir=raw.get("attachments_dir", app_defaults.attachments_dir),
+        log_file=raw.get("log_file", app_defaults.log_file),
+        accounts=accounts,
+        attachment_types=tuple(
+            raw.get("attachment_types", app_defaults.attachment_types)
+        ),
+        attachment_max_size=int(
+            raw.get("attachment_max_size", app_defaults.attachment_max_size)
+        ),
+        attachment_workers=int(
+            raw.get("attachment_workers", app_defaults.attachment_workers)
+        ),
+        archive_path=raw.get("archive_path", app_defaults.archive_path),
+        retention_days=int(raw.get("retention_days", app_defaults.retention_days)),
+    )
+
+
+def reload_config():
+    """清空配置缓存，下次调用 get_config 时重新读取"""
+    _read_json.cache_clear()
+    get_config.cache_clear()
+
+
 def get_email_credentials():
-    """从环境变量中获取邮箱凭据"""
+    """获取所有已配置邮箱账户的凭据（兼容旧接口）"""
     return {
-        "126": {
-            "username": os.getenv("EMAIL_126_USERNAME"),
-            "password": os.getenv("EMAIL_126_PASSWORD"),
-            "smtp_server": os.getenv("EMAIL_126_SMTP_SERVER"),
-            "smtp_port": int(os.getenv("EMAIL_126_SMTP_PORT")),
-            "imap_server": os.getenv("EMAIL_126_IMAP_SERVER"),
-            "imap_port": int(os.getenv("EMAIL_126_IMAP_PORT")),
-        },
-        "qq": {
-            "username": os.getenv("EMAIL_QQ_USERNAME"),
-            "password": os.getenv("EMAIL_QQ_PASSWORD"),
-            "smtp_server": os.getenv("EMAIL_QQ_SMTP_SERVER"),
-            "smtp_port": int(os.getenv("EMAIL_QQ_SMTP_PORT")),
-            "imap_server": os.getenv("EMAIL_QQ_IMAP_SERVER"),
-            "imap_port": int(os.getenv("EMAIL_QQ_IMAP_PORT")),
-        },
+        name: account.credentials() for name, account in get_config().accounts.items()
     }
+
+
+def describe_account(account):
+    """返回不含密码的账户配置字典，用于日志和命令行展示"""
+    values = asdict(account)
+    values.pop("password", None)
+    return values
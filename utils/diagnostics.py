@@ -0,0 +1,187 @@
+# ./diagnostics.py
+"""
+长时间运行任务的诊断工具（只依赖标准库）：
+
+- SIGUSR1 时打印所有线程的调用栈（kill -USR1 <pid>），不中断任务；
+- 可选的采样分析器，按固定间隔采样各线程调用栈，输出 collapsed stack 格式，
+  可直接交给 flamegraph.pl / speedscope 生成火焰图；
+- 记录解析最慢的 N 封邮件（耗时、大小、Content-Type），便于找出异常邮件。
+"""
+import faulthandler
+import heapq
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLE_INTERVAL = 0.01  # 秒
+DEFAULT_PROFILE_DIR = "./logs/profiles"
+DEFAULT_SLOW_MESSAGES = 20
+
+_dump_file = None
+
+
+def install_stack_dump(path=None):
+    """
+    注册 SIGUSR1：收到信号时把所有线程的调用栈写到 path（默认标准错误）。
+    不支持 SIGUSR1 的平台（Windows）直接返回 False。
+    """
+    global _dump_file
+    if not hasattr(signal, "SIGUSR1"):
+        logger.debug("当前平台不支持 SIGUSR1，跳过调用栈转储")
+        return False
+    if path is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # faulthandler 只保存文件描述符，文件对象需要在进程生命周期内保持打开
+        _dump_file = open(path, "a", encoding="utf-8")
+    faulthandler.register(
+        signal.SIGUSR1, file=_dump_file or sys.stderr, all_threads=True
+    )
+    logger.info(f"发送 SIGUSR1 可打印调用栈：kill -USR1 {os.getpid()}")
+    return True
+
+
+def _frame_stack(frame):
+    """从栈顶帧生成 collapsed stack 格式的调用链（根在前）"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(
+            f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        )
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    采样分析器：后台线程每隔 interval 秒读取一次 sys._current_frames()，
+    统计各调用链出现的次数。开销与采样频率有关，与被测代码无关。
+    """
+
+    def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            if len(names) != threading.active_count():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                thread_name = names.get(ident, str(ident)).replace(";", "_")
+                self.samples[f"{thread_name};{_frame_stack(frame)}"] += 1
+
+    def write_collapsed(self, path):
+        """按 "调用链 次数" 每行一条写出，供火焰图工具使用"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+class SlowMessageTracker:
+    """记录处理最慢的 N 封邮件，线程安全"""
+
+    def __init__(self, limit=DEFAULT_SLOW_MESSAGES):
+        self.limit = limit
+        self._heap = []  # 小顶堆，堆顶是目前记录中最快的一封
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, uid=None, size=None, content_type=None, subject=None):
+        item = (
+            seconds,
+            self._next(),
+            {
+                "seconds": seconds,
+                "uid": uid,
+                "size": size,
+                "content_type": content_type,
+                "subject": subject,
+            },
+        )
+        with self._lock:
+            if len(self._heap) < self.limit:
+                heapq.heappush(self._heap, item)
+            elif seconds > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+
+    def _next(self):
+        with self._lock:
+            self._counter += 1
+            return self._counter
+
+    def slowest(self):
+        """按耗时从长到短返回记录"""
+        with self._lock:
+            return [item[2] for item in sorted(self._heap, reverse=True)]
+
+    def log_report(self):
+        records = self.slowest()
+        if not records:
+            return
+        logger.info(f"解析最慢的 {len(records)} 封邮件：")
+        for record in records:
+            logger.info(
+                f"  {record['seconds'] * 1000:.1f} ms  UID {record['uid']}  "
+                f"{record['size']} 字节  {record['content_type']}  {record['subject']}"
+            )
+
+
+@contextmanager
+def run_diagnostics(
+    name,
+    profile=False,
+    profile_dir=DEFAULT_PROFILE_DIR,
+    slow_messages=DEFAULT_SLOW_MESSAGES,
+):
+    """
+    为一次运行启用诊断：注册 SIGUSR1 调用栈转储；profile=True 时启动采样分析器，
+    结束时写出 <profile_dir>/<name>-<时间>-<pid>.collapsed。
+
+    :param slow_messages: 结束时报告解析最慢的邮件数
+
+    :return: SlowMessageTracker，传给同步函数记录慢邮件，结束时写入日志
+    """
+    install_stack_dump()
+    tracker = SlowMessageTracker(slow_messages)
+    profiler = SamplingProfiler().start() if profile else None
+    try:
+        yield tracker
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            path = os.path.join(
+                profile_dir,
+                f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.collapsed",
+            )
+            profiler.write_collapsed(path)
+            logger.info(
+                f"采样结果已写入 {path}（{sum(profiler.samples.values())} 次采样）"
+            )
+        tracker.log_report()
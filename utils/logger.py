@@ -7,6 +7,20 @@ import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 
+class LazyFileHandler(logging.FileHandler):
+    """
+    延迟创建的文件日志处理器：第一次写日志时才创建目录并打开文件，
+    导入模块或只做快速检查时不会产生任何文件 I/O。
+    """
+
+    def __init__(self, filename, mode="a", encoding="utf-8"):
+        super().__init__(filename, mode, encoding, delay=True)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
 def setup_logger(log_level=logging.DEBUG, log_file="./logs/app.log"):
     """
     设置日志记录器。
@@ -15,9 +29,6 @@ def setup_logger(log_level=logging.DEBUG, log_file="./logs/app.log"):
     :param log_file: 日志文件路径，默认为 ./logs/app.log。
     :return: 配置好的日志记录器。
     """
-    # 创建日志文件夹
-    os.makedirs(os.path.dirname(log_file), exist_ok=True)
-
     # 配置日志格式
     log_format = "%(asctime)s - %(levelname)s - %(module)s - %(message)s"
 
@@ -32,7 +43,7 @@ def setup_logger(log_level=logging.DEBUG, log_file="./logs/app.log"):
         console_handler.setFormatter(logging.Formatter(log_format))
 
         # 文件日志处理器
-        file_handler = logging.FileHandler(log_file)
+        file_handler = LazyFileHandler(log_file)
         file_handler.setFormatter(logging.Formatter(log_format))
 
         # 添加处理器
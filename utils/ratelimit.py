@@ -0,0 +1,34 @@
+# ./ratelimit.py
+"""
+发送速率限制：按 AccountConfig.smtp_rate_limit（每秒最多发送的邮件数）
+控制相邻两次发送的最小间隔，避免触发邮箱服务商的发信频率限制。
+"""
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    线程安全的最小间隔限速器。
+
+    :param rate: 每秒允许的次数，必须大于 0
+    """
+
+    def __init__(self, rate, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError(f"rate 必须大于 0: {rate}")
+        self.interval = 1.0 / rate
+        self._clock = clock
+        self._sleep = sleep
+        self._next = None
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """阻塞到允许下一次操作为止，返回实际等待的秒数"""
+        with self._lock:
+            now = self._clock()
+            delay = 0.0 if self._next is None else max(0.0, self._next - now)
+            self._next = now + delay + self.interval
+        if delay:
+            self._sleep(delay)
+        return delay